@@ -1,26 +1,21 @@
+import config
 import instructions
-import display
+import tracefile
+from framescheduler import FrameScheduler
+from governor import Governor
+from machine import Machine, ROM_ADDRESS, STOP_BRK
 
-def FromHex(hexa: bytes) -> int:
-    """
-    Function to facilitate converting from hexadecimal to decimal.
-    The 6502 processor is little-endian, so the data has to be converted from that format as well
-    """
-    return int.from_bytes(hexa, byteorder="little")
 
+def PrintTrace(record: instructions.TraceRecord):
+    print(instructions.FormatTrace(record))
 
-NMI_VECTOR = 0xfffa #Position of the non-maskable interrupt vector in memory
-RESET_VECTOR = 0xfffc #Position of the reset vector in memory, which is where execution will start when the processor is powered on
-IRQ_VECTOR = 0xfffe #Position of the IRQ vector in memory
-
-#This is a dictionary holding the state of the machine, such as the memory, program counter and registers
-machineState = {"MEMORY":[0x00]*0x10000,
-                "PC":0x00,
-                "X": 0x00,
-                "Y": 0x00,
-                "ACC": 0x00,
-                "FLAGS": 0b00000000,
-                "SP": 0xFF}
+#The machine, which holds the state of the processor, such as the memory, program counter and registers.
+#Every instruction is printed as it runs if config.VERBOSE is set, otherwise the machine has no tracing in it at all
+#A binary trace is also written to config.TRACE_FILE if it is set, by a thread of its own so the processor does not wait on the disk
+traceWriter = None
+if config.TRACE_FILE is not None:
+    traceWriter = tracefile.BackgroundTraceWriter(open(config.TRACE_FILE, "wb"), policy=config.TRACE_POLICY)
+machine = Machine(trace=PrintTrace if config.VERBOSE else None, recorders=[traceWriter] if traceWriter else [])
 
 
 #Load the rom file
@@ -28,35 +23,51 @@ with open("rom.bin", "rb") as romFile:
     rom = romFile.read()
 
 
-#Move the rom file into memory at location 0x0000
-machineState["MEMORY"][0x0000:] = rom
+#Move the rom file into memory at the start of the rom section, so that its last bytes hold the vectors
+machine.LoadRom(rom, ROM_ADDRESS)
 
 #print(hex(len(rom)))
 
 #Get the Reset vector, and set the program counter to that location, to begin execution from that memory address
-machineState["PC"] = FromHex(machineState["MEMORY"][RESET_VECTOR:RESET_VECTOR+2])
-
-print(f"Reset vector: {hex(machineState['PC'])}")
-
-#Initialise a new screen
-#screen = display.Display()
-
-#Repeat forever
-while True:
-    #Get the instruction at the location of the program counter
-    instruction = machineState["MEMORY"][machineState["PC"]]
-
-    print(f"PC: {hex(machineState['PC'])}, ", end="")
-    print(f"Current Opcode: {hex(instruction)}, ", end="") #Show opcode
-    #print(f"Next memory: {' '.join([hex(x) for x in machineState['MEMORY'][machineState['PC']:machineState['PC']+16]])}") #Preview of next instructions
-
-
-    #If the instruction is a valid instruction
-    if instruction in instructions.switch_table:
-        #Then call it, passing in the current state of the machine
-        instructions.switch_table[instruction](machineState)
-    else:
-        instructions.Crash(machineState, "Invalid instruction (not in table)")
-
-    #Update the screen
-    #screen.UpdateScreen(machineState)
\ No newline at end of file
+machine.Reset()
+
+print(f"Reset vector: {hex(machine.state.PC)}")
+
+#Initialise a new screen, which is drawn once every frame of emulated time rather than after every instruction
+#A headless display draws into memory instead, and never imports Tk, which cannot start without a window system
+screen = None
+if config.HEADLESS:
+    import headless
+    screen = headless.HeadlessDisplay()
+elif config.DISPLAY:
+    import display
+    screen = display.Display()
+if screen is not None:
+    scheduler = FrameScheduler(machine, screen, config.CLOCK_RATE, config.REFRESH_RATE)
+
+#Keeps the machine running at the speed of the real processor
+governor = Governor(machine, config.CLOCK_RATE, config.SPEED, idleSleep=config.IDLE_SLEEP)
+
+#Run until the processor stops
+try:
+    reason = governor.Run()
+
+    #Update the screen, to show whatever was drawn since the last frame
+    if screen is not None:
+        screen.UpdateScreen(machine.state)
+        if config.SCREENSHOT is not None:
+            screen.Save(config.SCREENSHOT)
+
+    print(machine.stopMessage)
+    if reason == STOP_BRK and config.INPUT_ON_BRK:
+        input()
+finally:
+    print(machine.Report())
+    print(governor.Report())
+    if screen is not None:
+        print(scheduler.Report())
+        print(screen.Report())
+    if traceWriter is not None:
+        traceWriter.Close()
+        traceWriter.file.close()
+        print(traceWriter.Report())
@@ -0,0 +1,125 @@
+"""
+Lookup tables for the arithmetic instructions (ADC and SBC), in both binary and decimal (BCD) mode.
+Each table has an entry for every combination of carry, accumulator and operand, indexed by carry << 16 | A << 8 | operand.
+An entry holds the result in its low byte, and the carry, zero, overflow and negative flags in its high byte,
+so an instruction only needs one lookup to get both its result and all of its flags.
+The tables are arrays of 16 bit values, so that they take 256 KiB each and are shared by every machine in the process.
+Run "python alu.py" to check every entry of the tables against plain arithmetic
+"""
+from array import array
+
+#The bits of the processor status register set by the tables, the same as in instructions.py
+CARRY = 0b00000001
+ZERO = 0b00000010
+OVERFLOW = 0b01000000
+NEGATIVE = 0b10000000
+
+ALU_FLAGS = CARRY | ZERO | OVERFLOW | NEGATIVE #Every flag an ADC or SBC entry sets
+ALU_MASK = ~ALU_FLAGS & 0xff #Clears the flags set by an ADC or SBC
+
+
+def Flags(result: int, carry: bool, overflow: bool) -> int:
+    flags = result & NEGATIVE
+    if result == 0:
+        flags = flags | ZERO
+    if carry:
+        flags = flags | CARRY
+    if overflow:
+        flags = flags | OVERFLOW
+    return flags
+
+def AddBinary(a: int, b: int, carry: int) -> int:
+    total = a + b + carry
+    result = total & 0xff
+    overflow = ~(a ^ b) & (a ^ total) & 0x80 #Set when both inputs have the same sign, and the result has the other sign
+    return result | Flags(result, total > 0xff, overflow) << 8
+
+def AddDecimal(a: int, b: int, carry: int) -> int:
+    #This follows the NMOS 6502: the zero flag comes from the binary sum, and negative and overflow are taken before the high digit is adjusted
+    binary = (a + b + carry) & 0xff
+    low = (a & 0xf) + (b & 0xf) + carry
+    if low > 0x9:
+        low += 0x6
+    high = (a >> 4) + (b >> 4) + (low > 0xf)
+    negative = (high << 4) & 0x80
+    overflow = ~(a ^ b) & (a ^ (high << 4)) & 0x80
+    if high > 0x9:
+        high += 0x6
+    result = ((high << 4) | (low & 0xf)) & 0xff
+    flags = negative | (ZERO if binary == 0 else 0) | (CARRY if high > 0xf else 0) | (OVERFLOW if overflow else 0)
+    return result | flags << 8
+
+def SubtractDecimal(a: int, b: int, carry: int) -> int:
+    #On the NMOS 6502 all flags come from the binary subtraction, only the result is adjusted
+    flags = AddBinary(a, b ^ 0xff, carry) >> 8
+    low = (a & 0xf) - (b & 0xf) - (1 - carry)
+    if low & 0x10:
+        low -= 0x6
+    high = (a >> 4) - (b >> 4) - ((low & 0x10) >> 4)
+    if high & 0x10:
+        high -= 0x6
+    result = ((high << 4) | (low & 0xf)) & 0xff
+    return result | flags << 8
+
+def BuildTable(function) -> array:
+    return array("H", [function(a, b, carry) for carry in range(2) for a in range(0x100) for b in range(0x100)])
+
+
+"""
+Binary subtraction is the same as adding the ones complement of the operand, so binary SBC uses ADD_BINARY
+with the operand inverted
+"""
+ADD_BINARY = BuildTable(AddBinary)
+ADD_DECIMAL = BuildTable(AddDecimal)
+SUBTRACT_DECIMAL = BuildTable(SubtractDecimal)
+
+
+def VerifyAlu():
+    """
+    Checks every entry of the tables against plain integer arithmetic, and for decimal mode every valid BCD input against decimal arithmetic
+    """
+    def ToBcd(value: int) -> int:
+        return (value // 10) << 4 | value % 10
+
+    def FromBcd(value: int) -> int:
+        return (value >> 4) * 10 + (value & 0xf)
+
+    def Signed(value: int) -> int:
+        return value - 0x100 if value & 0x80 else value
+
+    failures = 0
+    for carry in range(2):
+        for a in range(0x100):
+            for b in range(0x100):
+                index = carry << 16 | a << 8 | b
+
+                #ADC and SBC in binary mode
+                total = a + b + carry
+                signedTotal = Signed(a) + Signed(b) + carry
+                expected = (total & 0xff) | Flags(total & 0xff, total > 0xff, not -128 <= signedTotal <= 127) << 8
+                failures += ADD_BINARY[index] != expected
+
+                difference = a - b - (1 - carry)
+                signedDifference = Signed(a) - Signed(b) - (1 - carry)
+                expected = (difference & 0xff) | Flags(difference & 0xff, difference >= 0, not -128 <= signedDifference <= 127) << 8
+                failures += ADD_BINARY[carry << 16 | a << 8 | (b ^ 0xff)] != expected
+
+                #Decimal mode only has a defined result for valid BCD inputs
+                if a & 0xf > 0x9 or a >> 4 > 0x9 or b & 0xf > 0x9 or b >> 4 > 0x9:
+                    continue
+                decimalTotal = FromBcd(a) + FromBcd(b) + carry
+                entry = ADD_DECIMAL[index]
+                failures += entry & 0xff != ToBcd(decimalTotal % 100)
+                failures += bool(entry >> 8 & CARRY) != (decimalTotal >= 100)
+
+                decimalDifference = FromBcd(a) - FromBcd(b) - (1 - carry)
+                entry = SUBTRACT_DECIMAL[index]
+                failures += entry & 0xff != ToBcd(decimalDifference % 100)
+                failures += bool(entry >> 8 & CARRY) != (decimalDifference >= 0)
+
+    print(f"ALU tables checked, {failures} failures")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    VerifyAlu()
@@ -0,0 +1,492 @@
+"""
+A set of benchmarks for measuring how fast the emulator runs.
+Each benchmark prints its results, so that the speed can be compared before and after a change.
+Run it with "python benchmark.py"
+"""
+import sys
+import tempfile
+import time
+
+import headless
+import instructions
+import jit
+import localcore
+import predecode
+import threaded
+import tracefile
+from cpu import CPU, LoadRom, MEMORY_SIZE
+from framescheduler import FrameScheduler
+from machine import Machine, INTERPRETER, PREDECODE
+
+PROGRAM_ADDRESS = 0x8800 #Where the benchmark program is loaded, the same place romWriter.py puts its program
+
+#The test program from romWriter.py, changed to reset the stack pointer and jump back to the start instead of hitting BRK,
+#so that it can run for as long as the benchmark needs
+BENCHMARK_PROGRAM = [0xa2, 0xff, #LDX #$ff
+                     0x9a, #TXS
+                     0xa2, 0x00, #LDX #$00
+                     0xa0, 0x4e, #LDY #$4e
+                     0x8a, #TXA
+                     0x9d, 0x00, 0x02, #STA $0200,X
+                     0x48, #PHA
+                     0xe8, #INX
+                     0x88, #DEY
+                     0xc0, 0x00, #CPY #$00
+                     0xd0, 0xf5, #BNE -11
+                     0x4c, 0x00, 0x88] #JMP $8800
+
+
+#More programs to measure with, each covering different kinds of instructions. They all loop forever
+BENCHMARK_ROMS = {
+    "romWriter": BENCHMARK_PROGRAM,
+    "memcopy": [0xa2, 0x00, #LDX #$00
+                0xbd, 0x00, 0x80, #LDA $8000,X
+                0x9d, 0x00, 0x03, #STA $0300,X
+                0xe8, #INX
+                0xd0, 0xf7, #BNE -9
+                0x4c, 0x00, 0x88], #JMP $8800
+    "arithmetic": [0x18, #CLC
+                   0xa5, 0x10, #LDA $10
+                   0x69, 0x01, #ADC #$01
+                   0x85, 0x10, #STA $10
+                   0xa5, 0x11, #LDA $11
+                   0x69, 0x00, #ADC #$00
+                   0x85, 0x11, #STA $11
+                   0x2a, #ROL A
+                   0x45, 0x12, #EOR $12
+                   0x85, 0x12, #STA $12
+                   0xc9, 0x80, #CMP #$80
+                   0x90, 0xea, #BCC -22
+                   0xf8, #SED
+                   0x18, #CLC
+                   0xa5, 0x13, #LDA $13
+                   0x69, 0x01, #ADC #$01
+                   0x85, 0x13, #STA $13
+                   0xd8, #CLD
+                   0x4c, 0x00, 0x88], #JMP $8800
+    "subroutine": [0xa0, 0x10, #LDY #$10
+                   0x20, 0x10, 0x88, #JSR $8810
+                   0x88, #DEY
+                   0xd0, 0xfa, #BNE -6
+                   0x4c, 0x00, 0x88, #JMP $8800
+                   0x00, 0x00, 0x00, 0x00, 0x00,
+                   0x48, #PHA
+                   0x98, #TYA
+                   0x0a, #ASL A
+                   0x85, 0x20, #STA $20
+                   0x68, #PLA
+                   0x60], #RTS
+}
+
+
+def MakeMachine(program: list = BENCHMARK_PROGRAM) -> CPU:
+    """
+    Creates a new machine with a benchmark program loaded, ready to be run
+    """
+    machineState = CPU()
+    LoadRom(machineState.MEMORY, bytes(program), PROGRAM_ADDRESS)
+    machineState.PC = PROGRAM_ADDRESS
+    return machineState
+
+
+def SameState(a: CPU, b: CPU) -> bool:
+    """
+    Checks that two machines have the same registers, cycle count and memory, for comparing another way of running code against the interpreter
+    """
+    return (a.PC, a.A, a.X, a.Y, a.SP, a.P, a.cycles) == (b.PC, b.A, b.X, b.Y, b.SP, b.P, b.cycles) and a.MEMORY == b.MEMORY
+
+
+def Timed(function, *args) -> float:
+    """
+    Calls the function with the given arguments, and returns how many seconds it took
+    """
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def RunInstructions(machineState: CPU, count: int):
+    switch_table = instructions.switch_table
+    memory = machineState.MEMORY
+    for _ in range(count):
+        switch_table[memory[machineState.PC]](machineState)
+
+
+def BenchmarkInstructions(count: int = 300000):
+    """
+    Measures how many instructions per second the interpreter can execute
+    """
+    machineState = MakeMachine()
+    seconds = Timed(RunInstructions, machineState, count)
+    print(f"Interpreter: {count / seconds:,.0f} instructions/sec")
+
+
+def BenchmarkPredecode(count: int = 300000):
+    """
+    Measures how many instructions per second run through the predecode cache, and how often it hits, one step at a time and
+    then with superinstructions on each of the benchmark roms, checking that those leave the machine the same as the interpreter
+    """
+    machineState = MakeMachine()
+    cache = predecode.PredecodeCache(machineState)
+
+    def Run():
+        for _ in range(count):
+            cache.Step(machineState)
+
+    seconds = Timed(Run)
+    print(f"Predecoded: {count / seconds:,.0f} instructions/sec. {cache.Report()}")
+
+    for name, program in BENCHMARK_ROMS.items():
+        machineState = MakeMachine(program)
+        cache = predecode.PredecodeCache(machineState)
+        executed = 0
+
+        def RunFused():
+            nonlocal executed
+            executed = cache.Run(count * 3)
+
+        fusedSeconds = Timed(RunFused)
+        check = MakeMachine(program)
+        RunInstructions(check, executed)
+        matches = "matches" if SameState(machineState, check) else "DOES NOT MATCH"
+        print(f"Superinstructions {name}: {executed / fusedSeconds:,.0f} instructions/sec, {matches} the interpreter. {cache.FusedReport()}")
+
+
+def BenchmarkJit(count: int = 300000):
+    """
+    Measures the block translator against the interpreter on each of the benchmark roms,
+    and checks that both leave the machine in the same state.
+    The translator is given a budget of cycles rather than instructions, so it is given three cycles for each instruction
+    """
+    for name, program in BENCHMARK_ROMS.items():
+        interpreted = MakeMachine(program)
+        interpreterSeconds = Timed(RunInstructions, interpreted, count)
+
+        machineState = MakeMachine(program)
+        translator = jit.Translator(machineState)
+        executed = 0
+
+        def Run():
+            nonlocal executed
+            executed = translator.Run(count * 3)
+
+        jitSeconds = Timed(Run)
+        check = MakeMachine(program)
+        RunInstructions(check, executed) #The translator finishes the block it is in, so it can run a few more instructions than asked
+        matches = "matches" if SameState(machineState, check) else "DOES NOT MATCH"
+        jitRate = executed / jitSeconds
+        interpreterRate = count / interpreterSeconds
+        print(f"JIT {name}: {jitRate:,.0f} instructions/sec, {jitRate / interpreterRate:.1f}x the interpreter, {matches} the interpreter. {translator.Report()}")
+
+
+def BenchmarkLocals(count: int = 300000):
+    """
+    Measures the interpreter with the registers in locals against the handlers in instructions.switch_table on each of
+    the benchmark roms, and checks that both leave the machine in the same state
+    """
+    for name, program in BENCHMARK_ROMS.items():
+        interpreted = MakeMachine(program)
+        interpreterSeconds = Timed(RunInstructions, interpreted, count)
+
+        machineState = MakeMachine(program)
+        executed = 0
+
+        def Run():
+            nonlocal executed
+            executed = localcore.Run(machineState, interpreted.cycles)
+
+        localSeconds = Timed(Run)
+        matches = "matches" if SameState(machineState, interpreted) and executed == count else "DOES NOT MATCH"
+        localRate = executed / localSeconds
+        interpreterRate = count / interpreterSeconds
+        print(f"Local core {name}: {localRate:,.0f} instructions/sec, {localRate / interpreterRate:.1f}x the interpreter, {matches} the interpreter")
+
+
+def BenchmarkThreaded(count: int = 300000):
+    """
+    Measures threaded code against the interpreter on each of the benchmark roms, and checks that both leave the machine
+    in the same state. Like the translator, it is given three cycles for each instruction
+    """
+    for name, program in BENCHMARK_ROMS.items():
+        interpreted = MakeMachine(program)
+        interpreterSeconds = Timed(RunInstructions, interpreted, count)
+
+        machineState = MakeMachine(program)
+        code = threaded.ThreadedCode(machineState)
+        executed = 0
+
+        def Run():
+            nonlocal executed
+            executed = code.Run(count * 3)
+
+        threadedSeconds = Timed(Run)
+        check = MakeMachine(program)
+        RunInstructions(check, executed)
+        matches = "matches" if SameState(machineState, check) else "DOES NOT MATCH"
+        threadedRate = executed / threadedSeconds
+        interpreterRate = count / interpreterSeconds
+        print(f"Threaded {name}: {threadedRate:,.0f} instructions/sec, {threadedRate / interpreterRate:.1f}x the interpreter, {matches} the interpreter. {code.Report()}")
+
+
+def BenchmarkIdle(cycles: int = 30000000):
+    """
+    Measures how much host processor time a program waiting in a polling loop takes, with the JIT and the predecode cache
+    skipping idle loops, against spinning through it in the interpreter
+    """
+    program = [0xad, 0x00, 0x02, #LDA $0200
+               0x29, 0x01, #AND #$01
+               0xf0, 0xf9] #BEQ -7
+    machineState = MakeMachine(program)
+    translator = jit.Translator(machineState)
+    start = time.process_time()
+    count = translator.Run(cycles)
+    idleSeconds = time.process_time() - start
+
+    machineState = MakeMachine(program)
+    cache = predecode.PredecodeCache(machineState)
+    start = time.process_time()
+    cache.Run(cycles)
+    predecodeSeconds = time.process_time() - start
+
+    spinSeconds = Timed(RunInstructions, MakeMachine(program), count // 100) * 100
+    print(f"Idle loop: {count:,} instructions took {idleSeconds * 1000:.1f} ms of host time when skipped by the JIT, "
+          f"{predecodeSeconds * 1000:.1f} ms when skipped by the predecode cache, against {spinSeconds * 1000:.0f} ms spinning in the interpreter")
+
+
+def BenchmarkTracing(cycles: int = 1000000):
+    """
+    Measures a machine built without tracing against one that records a trace of every instruction,
+    one that keeps a history, and one writing a binary trace file, directly and in the background
+    """
+    def Run(machine: Machine):
+        machine.state.Load(bytes(BENCHMARK_PROGRAM), PROGRAM_ADDRESS)
+        machine.state.PC = PROGRAM_ADDRESS
+        machine.Run(cycles)
+
+    fastSeconds = tracedSeconds = historySeconds = fileSeconds = backgroundSeconds = float("inf")
+    for _ in range(3): #Best of three, so the machine run first is not the only one paying for warming up
+        fastSeconds = min(fastSeconds, Timed(Run, Machine(INTERPRETER)))
+        records = []
+        tracedSeconds = min(tracedSeconds, Timed(Run, Machine(INTERPRETER, trace=records.append)))
+        historySeconds = min(historySeconds, Timed(Run, Machine(INTERPRETER, history=1024)))
+        with tempfile.TemporaryFile() as file:
+            writer = tracefile.TraceWriter(file)
+            fileSeconds = min(fileSeconds, Timed(Run, Machine(INTERPRETER, recorders=[writer])))
+            writer.Close()
+        with tempfile.TemporaryFile() as file:
+            background = tracefile.BackgroundTraceWriter(file)
+            backgroundSeconds = min(backgroundSeconds, Timed(Run, Machine(INTERPRETER, recorders=[background])))
+            background.Close()
+    print(f"Tracing: untraced {cycles / fastSeconds:,.0f} cycles/sec, traced {cycles / tracedSeconds:,.0f} cycles/sec ({len(records):,} records), "
+          f"ring buffer history {cycles / historySeconds:,.0f} cycles/sec, "
+          f"binary trace file {cycles / fileSeconds:,.0f} cycles/sec ({writer.bytesWritten / 1e6:.1f} MB), "
+          f"in the background {cycles / backgroundSeconds:,.0f} cycles/sec")
+
+
+def BenchmarkSlowDisk(cycles: int = 1000000, delay: float = 0.05):
+    """
+    Measures writing a trace file to a disk that takes delay seconds for every write, directly and through
+    a background writer with each policy
+    """
+    class SlowFile:
+        def __init__(self, file):
+            self.file = file
+
+        def write(self, data):
+            time.sleep(delay)
+            return self.file.write(data)
+
+        def flush(self):
+            self.file.flush()
+
+    def Run(machine: Machine):
+        machine.state.Load(bytes(BENCHMARK_PROGRAM), PROGRAM_ADDRESS)
+        machine.state.PC = PROGRAM_ADDRESS
+        machine.Run(cycles)
+
+    #Small chunks, so there are enough writes for the disk to fall behind
+    writers = [("direct", lambda file: tracefile.TraceWriter(file, 4096))]
+    writers.extend((policy, lambda file, policy=policy: tracefile.BackgroundTraceWriter(file, 4096, 4, policy))
+                   for policy in (tracefile.BLOCK, tracefile.DROP, tracefile.SAMPLE))
+    results = []
+    for name, MakeWriter in writers:
+        with tempfile.TemporaryFile() as file:
+            writer = MakeWriter(SlowFile(file))
+            seconds = Timed(Run, Machine(INTERPRETER, recorders=[writer]))
+            writer.Close()
+        dropped = getattr(writer, "recordsDropped", 0)
+        results.append(f"{name} {cycles / seconds:,.0f} cycles/sec ({dropped:,} records dropped)")
+    print(f"Slow disk ({delay * 1000:.0f} ms a write): {', '.join(results)}")
+
+
+def BenchmarkDisplay(cycles: int = 1000000, redraws: int = 100):
+    """
+    Measures redrawing the whole screen with the headless display, with and without numpy,
+    and running the romWriter program (which writes to the screen all the time) with and without a display drawn every frame
+    """
+    with open("characterRom.bin", "rb") as romFile:
+        characterRom = romFile.read()
+
+    def MakeDisplayMachine() -> Machine:
+        machine = Machine(PREDECODE)
+        machine.LoadRom(characterRom)
+        machine.state.Load(bytes(BENCHMARK_PROGRAM), PROGRAM_ADDRESS)
+        machine.state.PC = PROGRAM_ADDRESS
+        return machine
+
+    def Redraw(display: headless.HeadlessDisplay, machineState: CPU):
+        for _ in range(redraws):
+            display.Redraw()
+            display.UpdateScreen(machineState)
+
+    results = []
+    for useNumpy in (True, False) if headless.numpy is not None else (False,):
+        machine = MakeDisplayMachine()
+        seconds = Timed(Redraw, headless.HeadlessDisplay(useNumpy=useNumpy), machine.state)
+        results.append(f"full redraw {seconds / redraws * 1000:.2f} ms {'with' if useNumpy else 'without'} numpy")
+
+    plainSeconds = displaySeconds = float("inf")
+    for _ in range(3): #Best of three, since the first run also warms up the predecode cache
+        plainSeconds = min(plainSeconds, Timed(MakeDisplayMachine().Run, cycles))
+        machine = MakeDisplayMachine()
+        scheduler = FrameScheduler(machine, headless.HeadlessDisplay())
+        displaySeconds = min(displaySeconds, Timed(machine.Run, cycles))
+    print(f"Display: {', '.join(results)}, no display {cycles / plainSeconds:,.0f} cycles/sec, "
+          f"drawn every frame {cycles / displaySeconds:,.0f} cycles/sec ({scheduler.presented} frames drawn)")
+
+
+def BenchmarkStateAccess(count: int = 1000000):
+    """
+    Compares the cost of reading and writing registers in the old machineState dictionary against the CPU slots.
+    The status register is reached through flags, the slot the handlers use, rather than the P property, which puts it
+    together from flags and nz on every read and is only used outside the handlers
+    """
+    def DictAccess(state: dict):
+        for _ in range(count):
+            state["ACC"] = state["X"]
+            state["FLAGS"] = state["FLAGS"] | 0b00000001
+            state["PC"] += 1
+
+    def SlotAccess(state: CPU):
+        for _ in range(count):
+            state.A = state.X
+            state.flags = state.flags | 0b00000001 #Setting carry, as the zero flag is kept in nz
+            state.PC += 1
+
+    dictState = {"MEMORY": None, "PC": 0x00, "X": 0x00, "Y": 0x00, "ACC": 0x00, "FLAGS": 0b00000000, "SP": 0xFF}
+    dictSeconds = Timed(DictAccess, dictState)
+    slotSeconds = Timed(SlotAccess, CPU())
+    print(f"State access: dict {dictSeconds * 1e9 / count:.1f} ns/iteration, slots {slotSeconds * 1e9 / count:.1f} ns/iteration")
+
+
+def BenchmarkDispatch(count: int = 1000000):
+    """
+    Measures the cost of dispatch alone, using handlers that do nothing.
+    The old dictionary lookup (membership check then index) is compared against indexing the 256 slot list
+    """
+    def Handler(machineState):
+        pass
+
+    opcodes = [0xa2, 0x9a, 0xa0, 0x8a, 0x9d, 0x48, 0xe8, 0x88, 0xc0, 0xd0, 0x4c] #The opcodes in the benchmark program
+    sequence = opcodes * (count // len(opcodes))
+    table = dict.fromkeys(instructions.opcode_table, Handler)
+    dense = [Handler] * 0x100
+
+    def DictDispatch():
+        for instruction in sequence:
+            if instruction in table:
+                table[instruction](None)
+
+    def ListDispatch():
+        for instruction in sequence:
+            dense[instruction](None)
+
+    dictSeconds = Timed(DictDispatch)
+    listSeconds = Timed(ListDispatch)
+    print(f"Dispatch: dict {dictSeconds * 1e9 / len(sequence):.1f} ns/instruction, list {listSeconds * 1e9 / len(sequence):.1f} ns/instruction")
+
+
+def BenchmarkOpcodes(mnemonics: list, count: int = 100000):
+    """
+    Measures how long a single execution of each opcode with one of the given mnemonics takes.
+    The instruction is placed at the program address with operand bytes of zero, and the program counter is put back after each execution
+    """
+    machineState = CPU()
+    memory = machineState.MEMORY
+    results = []
+    for opcode, (mnemonic, mode, cycles) in instructions.opcode_table.items():
+        if mnemonic not in mnemonics:
+            continue
+        memory[PROGRAM_ADDRESS:PROGRAM_ADDRESS + 3] = bytes((opcode, 0x00, 0x00))
+        handler = instructions.switch_table[opcode]
+
+        def Run():
+            for _ in range(count):
+                machineState.PC = PROGRAM_ADDRESS
+                handler(machineState)
+
+        results.append(f"{mnemonic} {mode.name}: {Timed(Run) * 1e9 / count:.0f}")
+    print("Per opcode (ns): " + ", ".join(results))
+
+
+def BenchmarkFlags(count: int = 100000):
+    """
+    Compares setting the zero and negative flags with if/else blocks, looking them up in instructions.NZ_FLAGS,
+    and only storing the value they come from to be worked out later, as the instructions do.
+    The first two update the flags slot directly, since P is worked out every time it is read
+    """
+    values = list(range(0x100)) * (count // 0x100)
+
+    def Branches(machineState: CPU):
+        for value in values:
+            if value == 0x0:
+                machineState.flags = machineState.flags | 0b00000010
+            else:
+                machineState.flags = machineState.flags & 0b11111101
+            if value & 0b10000000 == 0b10000000:
+                machineState.flags = machineState.flags | 0b10000000
+            else:
+                machineState.flags = machineState.flags & 0b01111111
+
+    def Table(machineState: CPU):
+        NZ_MASK = instructions.NZ_MASK
+        NZ_FLAGS = instructions.NZ_FLAGS
+        for value in values:
+            machineState.flags = (machineState.flags & NZ_MASK) | NZ_FLAGS[value]
+
+    def Lazy(machineState: CPU):
+        for value in values:
+            machineState.nz = value
+
+    branchSeconds = Timed(Branches, CPU())
+    tableSeconds = Timed(Table, CPU())
+    lazySeconds = Timed(Lazy, CPU())
+    print(f"NZ flags: if/else {branchSeconds * 1e9 / len(values):.1f} ns/update, table {tableSeconds * 1e9 / len(values):.1f} ns/update, "
+          f"lazy {lazySeconds * 1e9 / len(values):.1f} ns/update")
+
+
+def BenchmarkMemorySize():
+    """
+    Compares how much host memory the address space takes up as a list of ints against a bytearray
+    """
+    listSize = sys.getsizeof([0x00]*MEMORY_SIZE)
+    bytearraySize = sys.getsizeof(CPU().MEMORY.obj)
+    print(f"Memory size: list {listSize // 1024} KiB, bytearray {bytearraySize // 1024} KiB")
+
+
+if __name__ == "__main__":
+    BenchmarkInstructions()
+    BenchmarkPredecode()
+    BenchmarkJit()
+    BenchmarkLocals()
+    BenchmarkThreaded()
+    BenchmarkIdle()
+    BenchmarkTracing()
+    BenchmarkSlowDisk()
+    BenchmarkDisplay()
+    BenchmarkStateAccess()
+    BenchmarkDispatch()
+    BenchmarkMemorySize()
+    BenchmarkFlags()
+    BenchmarkOpcodes(["LDA", "LDX", "LDY", "TAX", "TAY", "TXA", "TYA", "TSX", "PLA",
+                      "AND", "ORA", "EOR", "INC", "DEC", "INX", "INY", "DEX", "DEY", "ASL", "LSR", "ROL", "ROR"])
@@ -1,2 +1,11 @@
 VERBOSE = True
-INPUT_ON_BRK = False
\ No newline at end of file
+INPUT_ON_BRK = False
+IDLE_SLEEP = 0.01 #Seconds the host sleeps for when the program is in an idle loop, waiting on something outside of the processor
+CLOCK_RATE = 1000000 #Cycles per second of the processor being emulated
+SPEED = 1.0 #How many times the speed of the real processor to run at, 0 to run as fast as possible
+TRACE_FILE = None #A file to write a binary trace of every instruction to, in the background, see tracefile.py
+TRACE_POLICY = "block" #What to do when the disk cannot keep up with the trace: "block", "drop" or "sample"
+DISPLAY = True #Whether to show the screen in a window, see display.py
+HEADLESS = False #Whether to draw the screen in memory instead of a window, for when there is no window system, see headless.py
+SCREENSHOT = None #A file (.png or .ppm) to save the last frame to when the program stops, if it is set
+REFRESH_RATE = 60 #Frames a second the screen is drawn at, in emulated time, see framescheduler.py
@@ -0,0 +1,138 @@
+"""
+This file contains the state of the 6502 processor, such as the registers, flags and memory.
+The registers are stored in slots rather than a dictionary, so that the instructions can access them as fast as possible
+"""
+from collections.abc import MutableMapping
+
+MEMORY_SIZE = 0x10000 #The 6502 has a 16 bit address bus, so it can address 64 KiB of memory
+PAGE_COUNT = 0x100 #Memory is split into 256 pages of 256 bytes, the high byte of an address is its page
+
+#The bits of the processor status register that are worked out lazily, the same as in instructions.py
+ZERO = 0b00000010
+NEGATIVE = 0b10000000
+
+
+"""
+The zero and negative flags are set by almost every instruction, and are nearly always set again before anything looks at them.
+So instead of updating them in the status register, an instruction only stores the value they come from in nz,
+and they are worked out when something reads them: a branch, PHP, an interrupt, or anything reading the whole register as P.
+The zero flag is set when the low byte of nz is 0, and the negative flag when bit 7 (or bit 8) of it is set.
+Bit 8 is only used for a status register with both set, which no single byte could give (after PLP, BIT, or a decimal mode ADC or SBC).
+NZ_FLAGS holds the zero and negative bits for every value of nz, NZ_VALUES holds a value of nz giving the zero and negative
+bits of every status register, and NZ_MASK clears them
+"""
+NZ_MASK = ~(ZERO | NEGATIVE) & 0xff
+NZ_FLAGS = tuple((ZERO if value & 0xff == 0 else 0) | (NEGATIVE if value & 0x180 else 0) for value in range(0x200))
+NZ_VALUES = tuple((0x100 if flags & NEGATIVE else 0) | (0 if flags & ZERO else 0x01) for flags in range(0x100))
+
+
+def ReadWord(memory: memoryview, address: int) -> int:
+    """
+    Reads a 16 bit little-endian value from memory, wrapping around at the end of the address space
+    """
+    return memory[address] | memory[(address + 1) & 0xffff] << 8
+
+
+def LoadRom(memory: memoryview, rom: bytes, address: int):
+    """
+    Copies a rom image into memory, starting at the given address.
+    The rom has to fit entirely inside the address space, the memory is never resized
+    """
+    if address < 0 or address + len(rom) > MEMORY_SIZE:
+        raise ValueError(f"A rom of {hex(len(rom))} bytes does not fit in memory at {hex(address)}")
+    memory[address:address + len(rom)] = rom
+
+
+class CPU(MutableMapping):
+    """
+    The state of the machine. The registers are accessed as attributes (cpu.A, cpu.PC, ...) by the instructions.
+    It can also be indexed like the old machineState dictionary (cpu["ACC"], cpu["MEMORY"], ...), so that older code
+    such as display.Display.UpdateScreen still works.
+    The memory is a fixed size bytearray, exposed as a memoryview so that slices of it do not copy anything.
+    Every value stored into it has to fit into a byte.
+    Anything that needs to know when the processor writes to a page of memory (such as cached decoded instructions)
+    can watch that page, and the instructions call its watchers with the address of every write to the page.
+    cycles counts the clock cycles the processor has run for since it was created, so that anything which needs to
+    keep time (timers, the display, throttling) can use the time inside the machine.
+    history is the ringtrace.RingTrace recording the last instructions run, if there is one.
+    The status register is kept in two parts, flags and nz (see NZ_FLAGS), and put together whenever P is read.
+    The zero and negative bits of flags are left as they are by the instructions, and are ignored
+    """
+    __slots__ = ("PC", "A", "X", "Y", "SP", "flags", "nz", "MEMORY", "pageWatchers", "cycles", "history")
+
+    #Maps the old machineState dictionary keys onto the attributes of this class
+    keyNames = {"MEMORY": "MEMORY",
+                "PC": "PC",
+                "X": "X",
+                "Y": "Y",
+                "ACC": "A",
+                "FLAGS": "P",
+                "SP": "SP",
+                "CYCLES": "cycles"}
+
+    def __init__(self):
+        self.MEMORY = memoryview(bytearray(MEMORY_SIZE))
+        self.PC = 0x00
+        self.A = 0x00
+        self.X = 0x00
+        self.Y = 0x00
+        self.SP = 0xFF
+        self.flags = 0b00000000
+        self.nz = 0x01 #Neither zero nor negative
+        self.cycles = 0
+        self.history = None
+        self.pageWatchers = [()] * PAGE_COUNT #A tuple of watchers for each page, empty for pages nobody is watching
+
+    @property
+    def P(self) -> int:
+        return (self.flags & NZ_MASK) | NZ_FLAGS[self.nz]
+
+    @P.setter
+    def P(self, value: int):
+        self.flags = value
+        self.nz = NZ_VALUES[value]
+
+    def WatchPage(self, page: int, watcher):
+        """
+        Makes watcher(address) get called whenever the processor writes to the given page
+        """
+        if watcher not in self.pageWatchers[page]:
+            self.pageWatchers[page] = self.pageWatchers[page] + (watcher,)
+
+    def UnwatchPage(self, page: int, watcher):
+        self.pageWatchers[page] = tuple(x for x in self.pageWatchers[page] if x != watcher)
+
+    def Load(self, data: bytes, address: int):
+        """
+        Copies data (such as a rom image) into memory at the given address, letting the watchers of every page it covers know
+        """
+        LoadRom(self.MEMORY, data, address)
+        end = address + len(data)
+        for page in range(address >> 8, (end + 0xff) >> 8):
+            if not self.pageWatchers[page]:
+                continue
+            for written in range(max(address, page << 8), min(end, (page + 1) << 8)):
+                for watcher in self.pageWatchers[page]: #Looked up again each time, since a watcher can stop watching once it has been told
+                    watcher(written)
+
+    def __getitem__(self, key: str):
+        if key not in self.keyNames:
+            raise KeyError(key)
+        return getattr(self, self.keyNames[key])
+
+    def __setitem__(self, key: str, value):
+        if key not in self.keyNames:
+            raise KeyError(key)
+        setattr(self, self.keyNames[key], value)
+
+    def __delitem__(self, key: str):
+        raise TypeError("Machine state entries cannot be deleted")
+
+    def __iter__(self):
+        return iter(self.keyNames)
+
+    def __len__(self):
+        return len(self.keyNames)
+
+    def __repr__(self):
+        return f"CPU(PC={hex(self.PC)}, A={hex(self.A)}, X={hex(self.X)}, Y={hex(self.Y)}, SP={hex(self.SP)}, P={bin(self.P)}, cycles={self.cycles})"
@@ -1,8 +1,12 @@
 """
 Am example implementation of a display for the 6502.
-This code uses the graphics.py library for a simple way to display graphics
+This code uses the graphics.py library for a simple way to display graphics.
+The screen is drawn into a single image (a framebuffer) shown in the window, rather than as a canvas item per pixel.
+Each row of characters that changed is copied into it with one call, and the window is only updated once per frame.
+Which characters changed, and the cache of their pixels, is kept track of by screen.Screen
 """
 import graphics
+from screen import Screen, CHARACTER_SIZE, WIDTH, HEIGHT
 
 colours = {
     0x0: graphics.color_rgb(0, 0, 0),
@@ -24,38 +28,52 @@ colours = {
 } #A list of colours that can be displayed
 
 
-#32 x 32 screen = 1024 bytes of screen ram
-#256 bytes of character rom
+FOREGROUND = colours[0xf]
+BACKGROUND = colours[0x0]
 
-class Display:
+#The pixels of a line of a character, for every byte of the character rom, in the format PhotoImage.put takes.
+#The leftmost pixel is the highest bit, and a set bit is drawn in the foreground colour
+LINE_PIXELS = tuple(" ".join(FOREGROUND if data >> (7 - i) & 1 else BACKGROUND for i in range(CHARACTER_SIZE)) for data in range(0x100))
+
+
+class Display(Screen):
     def __init__(self):
-        self.screen = graphics.GraphWin("Memory view", 32*8, 32*8) #Initialise the window
-        self.oldScreenMemory = [0]*(0x600-0x200) #Create an empty list for the old memory, so that i dont redraw things that havent changed
-        colour = colours[0]
-        rect = graphics.Rectangle(graphics.Point(0, 0), graphics.Point(32*8, 32*8))
-        rect.setFill(colour)
-        rect.setOutline(colour)
-        rect.draw(self.screen) #Cover the window in black
-
-    def UpdateScreen(self, machineState: list):
-        screenMemory = machineState["MEMORY"][0x200:0x600] #Get the memory that is assigned to the screen
-
-        for y in range(0, 32):
-            for x in range(0, 32): #For every character on the screen
-                if screenMemory[y*32+x] != self.oldScreenMemory[y*32+x]: #If the data has changed
-                    CharacterOffset = screenMemory[y * 32 + x] * 8 #Get the offset to the character in character rom
-
-                    for line in range(8): 
-                        data = machineState["MEMORY"][0x8000 + CharacterOffset + line]
-                        for i in range(8):
-                            bit = data >> (8-i) & 1 #For every bit in the character
-
-                            if bit == 1: #Draw it
-                                self.screen.plotPixel(x * 8 + i, y * 8 + line, color="white")
-                            else:
-                                self.screen.plotPixel(x * 8 + i, y * 8 + line, color="black")
-
-        self.oldScreenMemory = screenMemory #Update the old memory
+        super().__init__()
+        self.screen = graphics.GraphWin("Memory view", WIDTH, HEIGHT, autoflush=False) #Initialise the window, only updating it when a frame is ready
+        self.framebuffer = graphics.Image(graphics.Point(WIDTH // 2, HEIGHT // 2), WIDTH, HEIGHT) #The image the screen is drawn into, anchored by its centre
+        self.framebuffer.img.put(BACKGROUND, to=(0, 0, WIDTH, HEIGHT)) #Cover the window in black
+        self.framebuffer.draw(self.screen)
+
+    def RenderGlyph(self, lines: bytes) -> tuple:
+        """
+        The pixels of a character are a line of pixels for PhotoImage.put for each line of the character
+        """
+        return tuple(LINE_PIXELS[data] for data in lines)
+
+    def DrawCharacters(self, x: int, y: int, characters: bytes):
+        """
+        Draws a run of characters into the framebuffer, starting at column x of row y, with a single put
+        """
+        glyphs = [self.Glyph(character) for character in characters]
+        lines = []
+        for line in range(CHARACTER_SIZE):
+            lines.append("{" + " ".join([glyph[line] for glyph in glyphs]) + "}")
+        self.framebuffer.img.put(" ".join(lines), to=(x * CHARACTER_SIZE, y * CHARACTER_SIZE))
+
+    def Present(self):
+        """
+        Shows the framebuffer in the window
+        """
+        graphics.update()
+
+    def PumpEvents(self):
+        graphics.update()
+
+    def Save(self, filename: str):
+        """
+        Writes the frame to a file, in the format given by the filename's extension (such as .png or .ppm)
+        """
+        self.framebuffer.save(filename)
 
     def Quit(self):
-        self.screen.close()
\ No newline at end of file
+        self.screen.close()
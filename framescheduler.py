@@ -0,0 +1,80 @@
+"""
+Frame pacing for the display, so that drawing the screen is decoupled from running instructions.
+Instead of the screen being updated after every instruction (or every batch), the scheduler is a device that schedules an event
+on the machine once every frame of emulated time, 16,667 cycles for 60 frames a second at 1 MHz, and the screen is drawn then.
+When the host cannot keep up, frames are skipped (up to a limit, so the screen still changes now and then) to let the processor
+catch up, and when the machine runs faster than the real processor (fast forward) frames are skipped so the window is not
+redrawn more often than it could show them.
+Events of the window (moving it, closing it, key presses) are handled at a bounded rate of their own, whether or not a frame
+was drawn, since an idle screen is never redrawn
+"""
+import time
+
+from governor import CLOCK_RATE
+from machine import Machine
+
+REFRESH_RATE = 60 #Frames a second, in emulated time
+MAX_FRAME_SKIP = 4 #The most frames in a row skipped because the host fell behind, before one is drawn anyway
+EVENT_RATE = 30 #The most times a second (in wall clock time) the window's events are handled
+
+
+class FrameScheduler:
+    """
+    Draws display (a display.Display, or anything with UpdateScreen, PumpEvents and frames) once every frame of the machine's time
+    """
+    def __init__(self, machine: Machine, display, clockRate: int = CLOCK_RATE, refreshRate: int = REFRESH_RATE,
+                 maxFrameSkip: int = MAX_FRAME_SKIP, eventRate: int = EVENT_RATE):
+        self.machine = machine
+        self.display = display
+        self.frameCycles = round(clockRate / refreshRate)
+        self.interval = 1 / refreshRate #Seconds of wall clock time a frame is shown for
+        self.maxFrameSkip = maxFrameSkip
+        self.eventInterval = 1 / eventRate
+        self.lag = 0.0 #Seconds the frames have fallen behind the wall clock by
+        self.skipped = 0 #Frames skipped in a row because the host fell behind
+        now = time.perf_counter()
+        self.lastFrame = now
+        self.lastPresent = now - self.interval
+        self.lastPump = now
+        self.frames = 0
+        self.presented = 0
+        self.skippedBehind = 0
+        self.skippedAhead = 0
+        self.pumps = 0
+        machine.AddDevice(self)
+        machine.Schedule(self.frameCycles, self.Frame)
+
+    def Frame(self, machine: Machine):
+        """
+        The event run at the end of every frame: draws the screen unless the frame is skipped, and handles the window's events
+        """
+        machine.Schedule(self.frameCycles, self.Frame)
+        self.frames += 1
+        now = time.perf_counter()
+        self.lag = max(0.0, self.lag + (now - self.lastFrame) - self.interval)
+        self.lastFrame = now
+
+        if now - self.lastPresent < self.interval / 2: #Running faster than the screen refreshes, allowing for the governor's slices not lining up with frames
+            self.skippedAhead += 1
+        elif self.lag > self.interval and self.skipped < self.maxFrameSkip: #Fallen behind, so give the processor the time instead
+            self.skipped += 1
+            self.skippedBehind += 1
+        else:
+            if self.skipped >= self.maxFrameSkip: #Could not catch up, so carry on from here
+                self.lag = 0.0
+            self.skipped = 0
+            frames = self.display.frames
+            self.display.UpdateScreen(machine.state)
+            self.lastPresent = now
+            self.presented += 1
+            if self.display.frames != frames: #Showing the frame handled the events too
+                self.lastPump = now
+
+        if now - self.lastPump >= self.eventInterval:
+            self.display.PumpEvents()
+            self.lastPump = now
+            self.pumps += 1
+
+    def Report(self) -> str:
+        return (f"Frame scheduler: {self.frames} frames of {self.frameCycles} cycles, {self.presented} drawn, "
+                f"{self.skippedBehind} skipped behind, {self.skippedAhead} skipped ahead, {self.pumps} event pumps")
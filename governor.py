@@ -0,0 +1,92 @@
+"""
+A speed governor, which keeps a machine running at the clock rate of the real processor instead of as fast as the host can go.
+It runs the machine in slices of cycles, and after each slice sleeps until the wall clock catches up with the time inside the machine,
+the same idea as the rate parameter of graphics.update, but worked out from the cycle count so that it keeps to the emulated clock.
+The speed can be multiplied (to run in turbo), or the throttling turned off altogether to fast forward.
+If the host cannot keep up, the governor lets the machine fall behind rather than trying to catch up with a burst of speed,
+and keeps count of the time lost.
+When the machine skips over an idle loop, its cycles run out straight away, so throttling sleeps for the rest of the slice.
+Running without throttling, the governor sleeps for idleSleep seconds instead, so that a machine with nothing to do does not spin the host
+"""
+import time
+
+from machine import Machine, STOP_BUDGET
+
+CLOCK_RATE = 1000000 #Cycles per second of the processor being emulated, 1 MHz
+SLICE_CYCLES = 10000 #Cycles run between checks of the wall clock, 10 ms at 1 MHz
+MAX_LAG = 0.1 #Seconds the machine can fall behind the wall clock before the governor gives up trying to catch up
+IDLE_SLEEP = 0.01 #Seconds the host sleeps for when the machine is waiting in an idle loop, and is not being throttled
+
+
+class Governor:
+    """
+    Runs a machine at clockRate cycles per second, times the multiplier
+    """
+    def __init__(self, machine: Machine, clockRate: int = CLOCK_RATE, multiplier: float = 1.0, sliceCycles: int = SLICE_CYCLES,
+                 idleSleep: float = IDLE_SLEEP):
+        self.machine = machine
+        self.idleSleep = idleSleep
+        self.clockRate = clockRate
+        self.sliceCycles = sliceCycles
+        self.multiplier = multiplier #How many times faster than the real processor to run, None to run as fast as possible
+        self.drift = 0.0 #Seconds the machine was behind the wall clock after the last slice, negative when it was ahead
+        self.lostTime = 0.0 #Seconds the machine fell behind by, and did not catch up
+        self.sleptTime = 0.0
+        self.Resync()
+
+    def Resync(self):
+        """
+        Starts keeping time again from now
+        """
+        self.startTime = time.perf_counter()
+        self.startCycles = self.machine.state.cycles
+
+    def SetMultiplier(self, multiplier: float):
+        """
+        Changes the speed, for example to 2.0 for turbo, or None to fast forward without throttling
+        """
+        self.multiplier = multiplier
+        self.Resync()
+
+    def Throttle(self):
+        """
+        Sleeps until the wall clock reaches the time the machine has run up to
+        """
+        if not self.multiplier:
+            return
+        now = time.perf_counter()
+        emulatedTime = (self.machine.state.cycles - self.startCycles) / (self.clockRate * self.multiplier)
+        self.drift = (now - self.startTime) - emulatedTime
+        if self.drift < 0:
+            time.sleep(-self.drift)
+            self.sleptTime -= self.drift
+        elif self.drift > MAX_LAG: #Too far behind to catch up, so carry on from here
+            self.lostTime += self.drift
+            self.Resync()
+
+    def Run(self, maxCycles: int = None) -> str:
+        """
+        Runs the machine at the governed speed until it stops for any reason other than running out of cycles,
+        or until it has run for maxCycles cycles if that is given. Returns why it stopped, like Machine.Run
+        """
+        machine = self.machine
+        end = None if maxCycles is None else machine.state.cycles + maxCycles
+        self.Resync()
+        while True:
+            cycles = self.sliceCycles if end is None else min(self.sliceCycles, end - machine.state.cycles)
+            if cycles <= 0:
+                return STOP_BUDGET
+            reason = machine.Run(cycles)
+            self.Throttle()
+            if machine.waiting and not self.multiplier and self.idleSleep:
+                time.sleep(self.idleSleep)
+                self.sleptTime += self.idleSleep
+            if reason != STOP_BUDGET:
+                return reason
+
+    def Report(self) -> str:
+        elapsed = time.perf_counter() - self.startTime
+        rate = (self.machine.state.cycles - self.startCycles) / elapsed if elapsed else 0.0
+        speed = "unthrottled" if not self.multiplier else f"{self.multiplier:g}x {self.clockRate:,} Hz"
+        return (f"Governor: {speed}, running at {rate:,.0f} Hz, drift {self.drift * 1000:.1f} ms, "
+                f"{self.lostTime:.3f} s lost, {self.sleptTime:.3f} s slept")
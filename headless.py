@@ -0,0 +1,142 @@
+"""
+A display that draws the screen into memory instead of a window, for running where there is no window system (tests, servers).
+It has the same interface as display.Display, but never imports graphics.py or Tk, which cannot start without a display.
+The frame is a greyscale image of one byte a pixel, 256 x 256 or scaled up by a whole number, and can be got as an array with Frame
+or written to a PNG or PPM file with Save.
+If numpy is installed, the frame is a numpy array, and each run of characters is drawn in one go by indexing a table of the
+pixels of every character with the characters' codes. Otherwise it is a bytearray, and the lines of pixels of each character are copied in
+"""
+import struct
+import zlib
+
+from cpu import CPU
+from screen import Screen, CHARACTER_ROM, CHARACTER_ROM_END, CHARACTER_SIZE, WIDTH, HEIGHT
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+FOREGROUND = 0xff #Brightness of a set pixel
+BACKGROUND = 0x00
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def PngChunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def EncodePng(pixels: bytes, width: int, height: int) -> bytes:
+    """
+    Encodes a greyscale image of one byte a pixel as a PNG, with no filtering
+    """
+    rows = b"".join(b"\x00" + pixels[y * width:(y + 1) * width] for y in range(height)) #Each row starts with its filter type, 0 for none
+    return (PNG_SIGNATURE + PngChunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+            + PngChunk(b"IDAT", zlib.compress(rows)) + PngChunk(b"IEND", b""))
+
+
+def EncodePpm(pixels: bytes, width: int, height: int) -> bytes:
+    """
+    Encodes a greyscale image of one byte a pixel as a binary (P6) PPM, with the same value for red, green and blue
+    """
+    rgb = bytearray(len(pixels) * 3)
+    rgb[0::3] = rgb[1::3] = rgb[2::3] = pixels
+    return b"P6\n%d %d\n255\n" % (width, height) + rgb
+
+
+class HeadlessDisplay(Screen):
+    """
+    Draws the screen into a framebuffer in memory, with every pixel scale x scale pixels.
+    numpy can be turned off with useNumpy, to get the same frames without it
+    """
+    name = "Headless display"
+
+    def __init__(self, scale: int = 1, useNumpy: bool = True):
+        super().__init__()
+        self.scale = scale
+        self.size = CHARACTER_SIZE * scale #Width and height of a character in pixels
+        self.width = WIDTH * scale
+        self.height = HEIGHT * scale
+        self.numpy = numpy if useNumpy else None
+        if self.numpy is not None:
+            self.framebuffer = numpy.full((self.height, self.width), BACKGROUND, dtype=numpy.uint8)
+            self.table = None #The pixels of every character, indexed by its code, or None if any have changed since it was made
+        else:
+            self.framebuffer = bytearray([BACKGROUND]) * (self.width * self.height)
+
+    def Attach(self, machineState: CPU):
+        super().Attach(machineState)
+        self.table = None
+
+    def CharacterWritten(self, address: int):
+        super().CharacterWritten(address)
+        self.table = None
+
+    def RenderGlyph(self, lines: bytes) -> tuple:
+        """
+        Without numpy, the pixels of a character are a row of bytes for every row of pixels in it
+        """
+        glyph = []
+        for data in lines:
+            row = bytes(FOREGROUND if data >> (7 - i) & 1 else BACKGROUND for i in range(CHARACTER_SIZE) for _ in range(self.scale))
+            glyph.extend([row] * self.scale)
+        return tuple(glyph)
+
+    def RenderTable(self):
+        """
+        Works out the pixels of every character at once from the character rom, as an array of 256 characters by size x size pixels
+        """
+        rom = numpy.frombuffer(bytes(self.machineState["MEMORY"][CHARACTER_ROM:CHARACTER_ROM_END]), dtype=numpy.uint8)
+        bits = numpy.unpackbits(rom.reshape(0x100, CHARACTER_SIZE), axis=1).reshape(0x100, CHARACTER_SIZE, CHARACTER_SIZE) #The highest bit is the leftmost pixel
+        table = numpy.where(bits, FOREGROUND, BACKGROUND).astype(numpy.uint8)
+        if self.scale > 1:
+            table = table.repeat(self.scale, axis=1).repeat(self.scale, axis=2)
+        self.table = table
+        self.glyphsRendered += 0x100
+
+    def DrawCharacters(self, x: int, y: int, characters: bytes):
+        size = self.size
+        if self.numpy is not None:
+            if self.table is None:
+                self.RenderTable()
+            pixels = self.table[numpy.frombuffer(characters, dtype=numpy.uint8)] #One character after another, each size x size
+            self.framebuffer[y * size:(y + 1) * size, x * size:(x + len(characters)) * size] = pixels.transpose(1, 0, 2).reshape(size, -1)
+            return
+
+        glyphs = [self.Glyph(character) for character in characters]
+        framebuffer = self.framebuffer
+        offset = y * size * self.width + x * size
+        length = len(characters) * size
+        for line in range(size):
+            framebuffer[offset:offset + length] = b"".join([glyph[line] for glyph in glyphs])
+            offset += self.width
+
+    def Pixels(self) -> bytes:
+        """
+        Returns the frame as height rows of width bytes
+        """
+        if self.numpy is not None:
+            return self.framebuffer.tobytes()
+        return bytes(self.framebuffer)
+
+    def Frame(self):
+        """
+        Returns a copy of the frame, as a height x width numpy array of uint8, or without numpy a memoryview of the same shape
+        """
+        if self.numpy is not None:
+            return self.framebuffer.copy()
+        return memoryview(bytes(self.framebuffer)).cast("B", (self.height, self.width))
+
+    def Save(self, filename: str):
+        """
+        Writes the frame to a file, a PNG or a PPM depending on the filename's extension
+        """
+        extension = filename.rsplit(".", 1)[-1].lower()
+        if extension == "png":
+            data = EncodePng(self.Pixels(), self.width, self.height)
+        elif extension in ("ppm", "pnm"):
+            data = EncodePpm(self.Pixels(), self.width, self.height)
+        else:
+            raise ValueError(f"Cannot save a frame as {filename}, only as .png or .ppm")
+        with open(filename, "wb") as file:
+            file.write(data)
@@ -0,0 +1,78 @@
+"""
+Detection of idle loops: loops that cannot make any progress until something outside of the processor changes memory.
+Two kinds are found, a branch or JMP to itself ("BNE *", "JMP *"), and a polling loop that reads memory (or a device register),
+compares or tests it, and branches back to its start, without writing anything.
+A loop is idle when it does not write to memory, and every register it changes is worked out again from memory (or from registers
+the loop never changes) each time round. Then once the loop has been round once, every later time round leaves the machine in exactly
+the same state, so the time it would spend spinning can be skipped
+"""
+import instructions
+from instructions import ZPX, ZPY, ABSX, ABSY, INDX, INDY, ABS
+
+MAX_LOOP_LENGTH = 16 #The most instructions looked at for the body of a loop
+
+#The instructions an idle loop can be made of, with the registers each one reads and writes.
+#None of them write to memory, or read anything other than memory and the registers
+LOOP_SAFE = {"LDA": ("", "A"), "LDX": ("", "X"), "LDY": ("", "Y"),
+             "CMP": ("A", ""), "CPX": ("X", ""), "CPY": ("Y", ""), "BIT": ("A", ""),
+             "AND": ("A", "A"), "ORA": ("A", "A"), "EOR": ("A", "A"),
+             "TAX": ("A", "X"), "TAY": ("A", "Y"), "TXA": ("X", "A"), "TYA": ("Y", "A"),
+             "CLC": ("", ""), "SEC": ("", ""), "CLV": ("", ""), "NOP": ("", "")}
+
+#The index register each addressing mode reads
+INDEX_REGISTER = {ZPX: "X", ABSX: "X", INDX: "X", ZPY: "Y", ABSY: "Y", INDY: "Y"}
+
+BRANCHES = {"BPL", "BMI", "BVC", "BVS", "BCC", "BCS", "BNE", "BEQ"}
+
+
+def IsIdleLoop(memory, entry: int, maxLength: int = MAX_LOOP_LENGTH) -> bool:
+    """
+    Returns whether the code at entry is an idle loop: straight-line code that only uses LOOP_SAFE instructions,
+    ending with a branch or JMP back to entry, that carries no value in a register from one time round the loop to the next
+    """
+    return IdleLoopLength(memory, entry, maxLength) > 0
+
+
+def IdleLoopLength(memory, entry: int, maxLength: int = MAX_LOOP_LENGTH) -> int:
+    """
+    Returns how many bytes long the idle loop at entry is, up to the end of the branch or JMP back to entry, or 0 if it is not an idle loop
+    """
+    body = []
+    pc = entry
+    for _ in range(maxLength):
+        opcode = memory[pc]
+        if opcode not in instructions.opcode_table:
+            return 0
+        mnemonic, mode, cycles = instructions.opcode_table[opcode]
+        if mnemonic in BRANCHES or (mnemonic == "JMP" and mode is ABS):
+            if mode.Decode(memory, pc) != entry or CarriesRegisters(body):
+                return 0
+            return (pc + mode.length - entry) & 0xffff
+        if mnemonic not in LOOP_SAFE:
+            return 0
+        body.append((mnemonic, mode))
+        pc = (pc + mode.length) & 0xffff
+    return 0
+
+
+def EndsLoop(memory, pc: int) -> bool:
+    """
+    Returns whether the instruction at pc is one that an idle loop can end with
+    """
+    mnemonic, mode, cycles = instructions.opcode_table[memory[pc]]
+    return mnemonic in BRANCHES or (mnemonic == "JMP" and mode is ABS)
+
+def CarriesRegisters(body: list) -> bool:
+    """
+    Returns whether the loop body reads a register that it also writes, before it has written it.
+    That register would then hold something different each time round, so the loop could be making progress
+    """
+    written = {register for mnemonic, mode in body for register in LOOP_SAFE[mnemonic][1]}
+    setSoFar = set()
+    for mnemonic, mode in body:
+        reads, writes = LOOP_SAFE[mnemonic]
+        for register in reads + INDEX_REGISTER.get(mode, ""):
+            if register in written and register not in setSoFar:
+                return True
+        setSoFar.update(writes)
+    return False
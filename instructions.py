@@ -1,2298 +1,757 @@
 """
 This file contains all the code for the individual instructions of the 6502 processor.
-The functions are named for their corresponding hex opcode, to make calling them easier to keep track of
+Every instruction is an operation (such as ORA or STA) combined with an addressing mode (such as ZP,X or (IND),Y).
+The addressing modes are written once and shared by every opcode that uses them, and the function for each opcode is
+built from its (operation, addressing mode) pair in opcode_table
 """
+from collections import namedtuple
 
-import config
+from alu import ADD_BINARY, ADD_DECIMAL, SUBTRACT_DECIMAL, ALU_MASK
+from cpu import CPU, ReadWord, NZ_MASK, NZ_FLAGS, NZ_VALUES
 
 
-def Crash(machineState: dict, Reason: str):
-    print(f"Crash while executing at {hex(machineState['PC'])}: \"{Reason}\"")
-    print(f"Opcode: {hex(machineState['MEMORY'][machineState['PC']])}")
-    print(f"ACC: {hex(machineState['ACC'])}, X: {hex(machineState['X'])}, Y: {hex(machineState['Y'])}, Flags: {bin(machineState['FLAGS'])}")
-    exit()
+#Why the processor stopped, see Halt
+STOP_BRK = "BRK"
+STOP_ILLEGAL_OPCODE = "illegal opcode"
 
-def FromHex(hexa: bytes) -> int:
+
+class Halt(Exception):
     """
-    Function to facilitate converting from hexadecimal to decimal.
-    The 6502 processor is little-endian, so the data has to be converted from that format as well
+    Raised by an instruction that stops the processor (BRK, or an opcode that does not exist), instead of exiting the program,
+    so that whatever is running the processor can decide what to do. reason is one of the STOP_ constants,
+    and the message describes the state of the processor when it stopped
     """
-    return int.from_bytes(hexa, byteorder="little")
-
-
-def opcode_00(machineState: dict):
-    #BRK Implied 1 7
-    if config.VERBOSE:
-        print("BRK hit, exiting")
-        print(f"ACC: {hex(machineState['ACC'])}, X: {hex(machineState['X'])}, Y: {hex(machineState['Y'])}, Flags: {bin(machineState['FLAGS'])}")
-    if config.INPUT_ON_BRK:
-        input()
-    exit()
-
-def opcode_01(machineState: dict):
-    #ORA (IND, X) 2 6
-    address = machineState["MEMORY"][machineState["PC"] + 1] + machineState["X"]
-    finalAddressLowByte = machineState["MEMORY"][address]
-    finalAddressHighByte = machineState["MEMORY"][address+1]
-    newAddress = FromHex(bytes([finalAddressHighByte, finalAddressLowByte]))
-    data = machineState["MEMORY"][newAddress]
-
-    machineState["ACC"] = machineState["ACC"] | data
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical OR ACC with {hex(data)} (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 2
-
-
-def opcode_05(machineState: dict):
-    #ORA ZP 2 6
-    data = machineState["MEMORY"][machineState["MEMORY"][machineState["PC"] + 1]]
-
-    machineState["ACC"] = machineState["ACC"] | data
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical OR ACC with {hex(data)} (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 2
-
-def opcode_06(machineState: dict):
-    #ASL ZP 2 5
-    address = machineState["MEMORY"][machineState["PC"] + 1]
-
-    machineState["MEMORY"][address] *= 2
-
-    if machineState["MEMORY"][address] > 0xff: #carry flag
-        machineState["MEMORY"][address] -= 0x100
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    if machineState["MEMORY"][address] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["MEMORY"][address] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Shifted {hex(address)} left once (now {machineState['MEMORY'][address]})")
-
-    machineState["PC"] += 2
-
-def opcode_08(machineState: dict):
-    #PHP Implied 1 3
-
-    address = 0x0100 + machineState["SP"]
-    machineState["MEMORY"][address] = machineState["FLAGS"]
-    machineState["SP"] -= 1
-
-    if config.VERBOSE:
-        print(f"Pushed processor flags ({bin(machineState['FLAGS'])} to stack)")
-
-    machineState["PC"] += 1
-
-def opcode_09(machineState: dict):
-    #ORA IMM 2 2
-    data = machineState["MEMORY"][machineState["PC"] + 1]
-    machineState["ACC"] = machineState["ACC"] | data
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical OR ACC with {hex(data)} (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 2
-
-def opcode_0a(machineState: dict):
-    #ASL accum 1 2
-    machineState["ACC"] *= 2
-
-    if machineState["ACC"] > 0xff: #carry flag
-        machineState["ACC"] -= 0x100
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Shifted acc left once (now {machineState['ACC']})")
-
-    machineState["PC"] += 1
-
-def opcode_0d(machineState: dict):
-    #ORA ABS 3 4
-
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3])
-    data = machineState["MEMORY"][address]
-
-    machineState["ACC"] = machineState["ACC"] | data
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical OR ACC with {hex(data)} (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 3
-
-def opcode_0e(machineState: dict):
-    #ASL ABS 3 6
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3])
-
-    machineState["MEMORY"][address] *= 2
-
-    if machineState["ACC"] > 0xff: #carry flag
-        machineState["ACC"] -= 0x100
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Shifted {hex(address)} left once (now {machineState['ACC']})")
-
-    machineState["PC"] += 3
-
-
-
-def opcode_10(machineState: dict):
-    #BPL Relative 2 2
-    #if negative flag clear, add offset to PC and resume execution
-    if machineState["FLAGS"] & 0b10000000 == 0b00000000:
-        offset = machineState["MEMORY"][machineState["PC"] + 1]
-        if offset & 0b10000000 == 0b10000000:
-            #offset is negative
-            decOffset = offset - 256
-        else:
-            decOffset = offset
-        machineState["PC"] += decOffset + 1
-        if config.VERBOSE:
-            print(f"Jumped to {hex(machineState['PC'])} because negative flag was clear")
-    else:
-        machineState["PC"] += 2
-        if config.VERBOSE:
-            print(f"Hit jump, but didnt jump because negative flag was not clear")
-
-def opcode_11(machineState: dict):
-    #ORA (IND), Y 2 5
-
-    address = machineState["MEMORY"][machineState["PC"] + 1]
-    finalAddressLowByte = machineState["MEMORY"][address]
-    finalAddressHighByte = machineState["MEMORY"][address+1]
-    newAddress = FromHex(bytes([finalAddressHighByte, finalAddressLowByte])) + machineState["Y"]
-    data = machineState["MEMORY"][newAddress]
-
-    machineState["ACC"] = machineState["ACC"] | data
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical OR ACC with {hex(data)} (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 2
-
-def opcode_15(machineState: dict):
-    #ORA ZP,X 2 5
-
-    address = machineState["MEMORY"][machineState["PC"] + 1] + machineState["X"]
-    data = machineState["MEMORY"][address]
-
-    machineState["ACC"] = machineState["ACC"] | data
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical OR ACC with {hex(data)} (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 2
-
-def opcode_16(machineState: dict):
-    #ASL ZP,X 2 6
-
-    address = machineState["MEMORY"][machineState["PC"] + 1] + machineState["X"]
-
-    machineState["MEMORY"][address] *= 2
-
-    if machineState["ACC"] > 0xff: #carry flag
-        machineState["ACC"] -= 0x100
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Shifted {hex(address)} left once (now {machineState['MEMORY'][address]})")
-
-    machineState["PC"] += 2
-
-def opcode_18(machineState: dict):
-    #CLC Implied 1 2
-    machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    if config.VERBOSE:
-        print("Cleared carry bit of processor flags")
-
-    machineState["PC"] += 1
-
-def opcode_19(machineState: dict):
-    #ORA ABS,Y 3 4
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3]) + machineState["Y"]
-    data = machineState["MEMORY"][address]
-
-    machineState["ACC"] = machineState["ACC"] | data
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical OR ACC with {hex(data)} (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 3
-
-def opcode_1d(machineState: dict):
-    #ORA ABS,X 3 4
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3]) + machineState["X"]
-    data = machineState["MEMORY"][address]
-
-    machineState["ACC"] = machineState["ACC"] | data
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical OR ACC with {hex(data)} (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 3
-
-def opcode_1e(machineState: dict):
-    #ASL ABS,X 3 4
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3]) + machineState["X"]
-
-    machineState["MEMORY"][address] *= 2
-
-    if machineState["ACC"] > 0xff: #carry flag
-        machineState["ACC"] -= 0x100
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Shifted {hex(address)} left once (now {machineState['MEMORY'][address]})")
-
-    machineState["PC"] += 3
-
-
-def opcode_20(machineState: dict):
-    #JSR ABS 3 6
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3])
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
 
-    machineState["PC"] += 3
 
-    machineState["MEMORY"][0x0100 + machineState["SP"]] = machineState["PC"] >> 8
-    machineState["SP"] -= 1
-    machineState["MEMORY"][0x0100 + machineState["SP"]] = machineState["PC"] & 0xFF
-    machineState["SP"] -= 1
+def Crash(machineState: CPU, Reason: str, stopReason: str = STOP_ILLEGAL_OPCODE):
+    message = (f"Crash while executing at {hex(machineState.PC)}: \"{Reason}\"\n"
+               f"Opcode: {hex(machineState.MEMORY[machineState.PC])}\n"
+               f"ACC: {hex(machineState.A)}, X: {hex(machineState.X)}, Y: {hex(machineState.Y)}, Flags: {bin(machineState.P)}")
+    if machineState.history is not None: #The instructions that led up to the crash
+        message = message + "\n" + machineState.history.Dump()
+    raise Halt(stopReason, message)
 
-    machineState["PC"] = address
 
-    if config.VERBOSE:
-        print(f"Jumped to subroutine {hex(address)}")
+#The bits of the processor status register
+CARRY = 0b00000001
+ZERO = 0b00000010
+INTERRUPT = 0b00000100
+DECIMAL = 0b00001000
+BREAK = 0b00010000 #Only exists in the copy of the flags pushed to the stack
+UNUSED = 0b00100000 #Only exists in the copy of the flags pushed to the stack
+OVERFLOW = 0b01000000
+NEGATIVE = 0b10000000
 
+STACK_PAGE = 0x0100 #The stack lives in page 1, and grows downwards from 0x01FF
 
-def opcode_21(machineState: dict):
-    #AND (IND, X) 2 6
-    address = machineState["MEMORY"][machineState["PC"] + 1] + machineState["X"]
-    finalAddressLowByte = machineState["MEMORY"][address]
-    finalAddressHighByte = machineState["MEMORY"][address+1]
-    newAddress = FromHex(bytes([finalAddressHighByte, finalAddressLowByte]))
-    data = machineState["MEMORY"][newAddress]
 
-    machineState["ACC"] = machineState["ACC"] & data
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical OR ACC with {hex(data)} (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 2
-
-def opcode_24(machineState: dict):
-    #BIT ZP 2 3
-    address = machineState["MEMORY"][machineState["PC"] + 1]
-    data = machineState["MEMORY"][address]
-    res = machineState["ACC"] & data
-
-    if res == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if res & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if res & 0b01000000 == 0b01000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b01000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b10111111
-
-    if config.VERBOSE:
-        print(f"Bit test on {hex(address)}")
-
-    machineState["PC"] += 2
-
-
-def opcode_25(machineState: dict):
-    #AND ZP 2 3
-    address = machineState["MEMORY"][machineState["PC"] + 1]
-    data = machineState["MEMORY"][address]
-
-    machineState["ACC"] = machineState["ACC"] & data
-
-    if machineState["ACC"] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical and between ACC and {hex(address)}")
-
-    machineState["PC"] += 2
-
-
-def opcode_26(machineState: dict):
-    #ROL ZP 2 5
-    address = machineState["MEMORY"][machineState["PC"] + 1]
-
-    machineState["MEMORY"][address] = machineState["MEMORY"][address] << 1
-    machineState["MEMORY"][address] = machineState["MEMORY"][address] | (machineState["FLAGS"] & 0b00000001)
-    if machineState["MEMORY"][address] & 0b100000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-        machineState["MEMORY"][address] -= 0b100000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    if machineState["MEMORY"][address] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["MEMORY"][address] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Rotated {hex(address)} by one step left")
-
-    machineState["PC"] += 2
-
-def opcode_28(machineState: dict):
-    #PLP Implied 1 3
-    #stack operation: write to 0x0100 + SP, dec SP
-    machineState["SP"] += 1
-    address = 0x0100 + machineState["SP"]
-    machineState["FLAGS"] = machineState["MEMORY"][address]
-
-    if config.VERBOSE:
-        print(f"Pulled processor flags ({bin(machineState['FLAGS'])} from stack)")
-
-    machineState["PC"] += 1
-
-def opcode_29(machineState: dict):
-    #AND IMMIDIATE 2 2
-    data = machineState["MEMORY"][machineState["PC"] + 1]
-
-    machineState["ACC"] = machineState["ACC"] & data
-
-    if machineState["ACC"] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical and between ACC and {hex(data)}")
-
-    machineState["PC"] += 2
-
-def opcode_2a(machineState: dict):
-    #ROL ACCUM 1 2
-
-    machineState["ACC"] = machineState["ACC"] << 1
-    machineState["ACC"] = machineState["ACC"] | (machineState["FLAGS"] & 0b00000001)
-    if machineState["ACC"] & 0b100000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-        machineState["ACC"] -= 0b100000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    if machineState["ACC"] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Rotated ACC by one step left")
-
-    machineState["PC"] += 1
-
-def opcode_2c(machineState: dict):
-    #BIT ABS 3 4
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3])
-    data = machineState["MEMORY"][address]
-    res = machineState["ACC"] & data
-
-    if res == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if res & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if res & 0b01000000 == 0b01000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b01000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b10111111
-
-    if config.VERBOSE:
-        print(f"Bit test on {hex(address)}")
-
-    machineState["PC"] += 3
-
-
-def opcode_2d(machineState: dict):
-    #AND ABS 3 4
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3])
-    data = machineState["MEMORY"][address]
-
-    machineState["ACC"] = machineState["ACC"] & data
-
-    if machineState["ACC"] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical and between ACC and {hex(address)}")
-
-    machineState["PC"] += 3
-
-def opcode_2e(machineState: dict):
-    #ROL ABS 3 6
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3])
-
-    machineState["MEMORY"][address] = machineState["MEMORY"][address] << 1
-    machineState["MEMORY"][address] = machineState["MEMORY"][address] | (machineState["FLAGS"] & 0b00000001)
-    if machineState["MEMORY"][address] & 0b100000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-        machineState["MEMORY"][address] -= 0b100000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    if machineState["MEMORY"][address] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["MEMORY"][address] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Rotated {hex(address)} by one step left")
-
-    machineState["PC"] += 3
-
-
-def opcode_30(machineState: dict):
-    #BMI Relative 2 2
-    #if negative flag set, add offset to PC and resume execution
-    if machineState["FLAGS"] & 0b10000000 == 0b10000000:
-        offset = machineState["MEMORY"][machineState["PC"] + 1]
-        if offset & 0b10000000 == 0b10000000:
-            #offset is negative
-            decOffset = offset - 256
-        else:
-            decOffset = offset
-        machineState["PC"] += decOffset + 1
-        if config.VERBOSE:
-            print(f"Jumped to {hex(machineState['PC'])} because negative flag was set")
-    else:
-        machineState["PC"] += 2
-        if config.VERBOSE:
-            print(f"Hit jump, but didnt jump because negative flag was not set")
-
-def opcode_31(machineState: dict):
-    #AND (IND),Y 2 6
-    address = machineState["MEMORY"][machineState["PC"] + 1]
-    finalAddressLowByte = machineState["MEMORY"][address]
-    finalAddressHighByte = machineState["MEMORY"][address+1]
-    newAddress = FromHex(bytes([finalAddressHighByte, finalAddressLowByte])) + machineState["Y"]
-    data = machineState["MEMORY"][newAddress]
-
-    machineState["ACC"] = machineState["ACC"] & data
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical OR ACC with {hex(data)} (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 2
-
-def opcode_35(machineState: dict):
-    #AND ZP,X 2 3
-    address = machineState["MEMORY"][machineState["PC"] + 1] + machineState["X"]
-    data = machineState["MEMORY"][address]
-
-    machineState["ACC"] = machineState["ACC"] & data
-
-    if machineState["ACC"] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
+"""
+The zero and negative flags are worked out lazily (see cpu.NZ_FLAGS), so the instructions that set them only store the value
+they come from: machineState.nz = value. The rest of the flags are in machineState.flags
+"""
 
-    if config.VERBOSE:
-        print(f"Logical and between ACC and {hex(address)}")
+def Store(machineState: CPU, address: int, value: int):
+    """
+    Writes a byte to memory, and lets anything watching that page of memory know about the write
+    """
+    machineState.MEMORY[address] = value
+    watchers = machineState.pageWatchers[address >> 8]
+    if watchers:
+        for watcher in watchers:
+            watcher(address)
 
-    machineState["PC"] += 2
+def Push(machineState: CPU, value: int):
+    Store(machineState, STACK_PAGE + machineState.SP, value)
+    machineState.SP = (machineState.SP - 1) & 0xff
 
-def opcode_36(machineState: dict):
-    #ROL ZP,X 2 5
-    address = machineState["MEMORY"][machineState["PC"] + 1] + machineState["X"]
+def Pull(machineState: CPU) -> int:
+    machineState.SP = (machineState.SP + 1) & 0xff
+    return machineState.MEMORY[STACK_PAGE + machineState.SP]
 
-    machineState["MEMORY"][address] = machineState["MEMORY"][address] << 1
-    machineState["MEMORY"][address] = machineState["MEMORY"][address] | (machineState["FLAGS"] & 0b00000001)
-    if machineState["MEMORY"][address] & 0b100000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-        machineState["MEMORY"][address] -= 0b100000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
 
-    if machineState["MEMORY"][address] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
+"""
+Addressing modes.
+Each mode has the length of the instruction, a Decode function that reads the operand from the bytes following the opcode,
+and an Address function that turns the operand into the effective address using the registers.
+Decode only depends on the instruction bytes, so its result stays the same for as long as the code is not changed.
+Address is None when the operand already is the effective address
+"""
+AddressingMode = namedtuple("AddressingMode", ["name", "length", "Decode", "Address"])
 
-    if machineState["MEMORY"][address] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
+def DecodeNone(memory: memoryview, pc: int):
+    return None
 
-    if config.VERBOSE:
-        print(f"Rotated {hex(address)} by one step left")
+def DecodeByte(memory: memoryview, pc: int) -> int:
+    return memory[(pc + 1) & 0xffff]
 
-    machineState["PC"] += 2
+def DecodeWord(memory: memoryview, pc: int) -> int:
+    return ReadWord(memory, (pc + 1) & 0xffff)
 
-def opcode_38(machineState: dict):
-    #SEC Implied 1 2
-    machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
+def DecodeRelative(memory: memoryview, pc: int) -> int:
+    #The offset is signed, and is relative to the address of the next instruction
+    offset = memory[(pc + 1) & 0xffff]
+    return (pc + 2 + offset - ((offset & 0b10000000) << 1)) & 0xffff
 
-    if config.VERBOSE:
-        print("Set carry bit of processor flags")
+def AddressZeroPageX(machineState: CPU, operand: int) -> int:
+    return (operand + machineState.X) & 0xff #Wraps around within the zero page
 
-    machineState["PC"] += 1
+def AddressZeroPageY(machineState: CPU, operand: int) -> int:
+    return (operand + machineState.Y) & 0xff
 
-def opcode_39(machineState: dict):
-    #AND ABS,Y 3 4
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3]) + machineState["Y"]
-    data = machineState["MEMORY"][address]
+def AddressAbsoluteX(machineState: CPU, operand: int) -> int:
+    return (operand + machineState.X) & 0xffff
 
-    machineState["ACC"] = machineState["ACC"] & data
+def AddressAbsoluteY(machineState: CPU, operand: int) -> int:
+    return (operand + machineState.Y) & 0xffff
 
-    if machineState["ACC"] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
+def AddressIndirectX(machineState: CPU, operand: int) -> int:
+    pointer = (operand + machineState.X) & 0xff
+    memory = machineState.MEMORY
+    return memory[pointer] | memory[(pointer + 1) & 0xff] << 8 #The pointer is read from the zero page, so it wraps around in it
 
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
+def AddressIndirectY(machineState: CPU, operand: int) -> int:
+    memory = machineState.MEMORY
+    return ((memory[operand] | memory[(operand + 1) & 0xff] << 8) + machineState.Y) & 0xffff
 
-    if config.VERBOSE:
-        print(f"Logical and between ACC and {hex(data)}")
+def AddressIndirect(machineState: CPU, operand: int) -> int:
+    #The 6502 never carries into the high byte of the pointer, so a pointer at 0x??FF reads its high byte from 0x??00
+    memory = machineState.MEMORY
+    return memory[operand] | memory[(operand & 0xff00) | ((operand + 1) & 0xff)] << 8
 
-    machineState["PC"] += 3
+"""
+Indexed reads take an extra cycle when adding the index register carries into the high byte of the address,
+since the processor first reads from the address without the carry and then has to read again.
+These work out whether that happens for each mode, from the low byte of the base address
+"""
+def CrossesPageX(machineState: CPU, operand: int) -> bool:
+    return (operand & 0xff) + machineState.X > 0xff
 
-def opcode_3d(machineState: dict):
-    #AND ABS,X 3 4
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3]) + machineState["X"]
-    data = machineState["MEMORY"][address]
+def CrossesPageY(machineState: CPU, operand: int) -> bool:
+    return (operand & 0xff) + machineState.Y > 0xff
 
-    machineState["ACC"] = machineState["ACC"] & data
+def CrossesPageIndirectY(machineState: CPU, operand: int) -> bool:
+    return machineState.MEMORY[operand] + machineState.Y > 0xff
 
-    if machineState["ACC"] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
+IMP = AddressingMode("Implied", 1, DecodeNone, None)
+ACC = AddressingMode("Accumulator", 1, DecodeNone, None)
+IMM = AddressingMode("Immediate", 2, DecodeByte, None)
+ZP = AddressingMode("ZP", 2, DecodeByte, None)
+ZPX = AddressingMode("ZP,X", 2, DecodeByte, AddressZeroPageX)
+ZPY = AddressingMode("ZP,Y", 2, DecodeByte, AddressZeroPageY)
+ABS = AddressingMode("ABS", 3, DecodeWord, None)
+ABSX = AddressingMode("ABS,X", 3, DecodeWord, AddressAbsoluteX)
+ABSY = AddressingMode("ABS,Y", 3, DecodeWord, AddressAbsoluteY)
+INDX = AddressingMode("(IND,X)", 2, DecodeByte, AddressIndirectX)
+INDY = AddressingMode("(IND),Y", 2, DecodeByte, AddressIndirectY)
+IND = AddressingMode("IND", 3, DecodeWord, AddressIndirect)
+REL = AddressingMode("Relative", 2, DecodeRelative, None)
 
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
+PAGE_CROSSING = {ABSX: CrossesPageX, ABSY: CrossesPageY, INDY: CrossesPageIndirectY} #The modes that take longer to read across a page
 
-    if config.VERBOSE:
-        print(f"Logical and between ACC and {hex(data)}")
 
-    machineState["PC"] += 3
+"""
+Operations.
+The kind of an operation decides what it is given and what is done with its result:
+READ operations are given the value at the effective address (or the immediate value),
+WRITE operations return the value to store at the effective address,
+MODIFY operations are given the value at the effective address (or the accumulator) and return the new value to store back,
+JUMP operations (including branches) are given the effective address,
+and IMPLIED operations are given nothing
+"""
+READ = "read"
+WRITE = "write"
+MODIFY = "modify"
+JUMP = "jump"
+IMPLIED = "implied"
+
+#Loads and stores
+def LDA(machineState: CPU, value: int):
+    machineState.A = value
+    machineState.nz = value
+
+def LDX(machineState: CPU, value: int):
+    machineState.X = value
+    machineState.nz = value
+
+def LDY(machineState: CPU, value: int):
+    machineState.Y = value
+    machineState.nz = value
+
+def STA(machineState: CPU) -> int:
+    return machineState.A
+
+def STX(machineState: CPU) -> int:
+    return machineState.X
+
+def STY(machineState: CPU) -> int:
+    return machineState.Y
+
+#Logical operations
+def AND(machineState: CPU, value: int):
+    machineState.A = machineState.A & value
+    machineState.nz = machineState.A
+
+def ORA(machineState: CPU, value: int):
+    machineState.A = machineState.A | value
+    machineState.nz = machineState.A
+
+def EOR(machineState: CPU, value: int):
+    machineState.A = machineState.A ^ value
+    machineState.nz = machineState.A
+
+def BIT(machineState: CPU, value: int):
+    #Zero comes from ACC & value, negative and overflow are copied from bits 7 and 6 of the value
+    machineState.flags = (machineState.flags & ~OVERFLOW) | (value & OVERFLOW)
+    machineState.nz = (value & NEGATIVE) << 1 | (machineState.A & value)
+
+#Arithmetic, which looks up the result and flags in the tables in alu.py
+#In decimal mode the zero and negative flags do not come from the result, so they are taken from the flags in the table entry
+def ADC(machineState: CPU, value: int):
+    flags = machineState.flags
+    if flags & DECIMAL:
+        entry = ADD_DECIMAL[(flags & CARRY) << 16 | machineState.A << 8 | value]
+        machineState.nz = NZ_VALUES[entry >> 8]
+    else:
+        entry = ADD_BINARY[(flags & CARRY) << 16 | machineState.A << 8 | value]
+        machineState.nz = entry & 0xff
+    machineState.A = entry & 0xff
+    machineState.flags = (flags & ALU_MASK) | (entry >> 8)
+
+def SBC(machineState: CPU, value: int):
+    flags = machineState.flags
+    if flags & DECIMAL:
+        entry = SUBTRACT_DECIMAL[(flags & CARRY) << 16 | machineState.A << 8 | value]
+        machineState.nz = NZ_VALUES[entry >> 8]
+    else: #Subtracting is the same as adding the ones complement, with the carry flag acting as "not borrow"
+        entry = ADD_BINARY[(flags & CARRY) << 16 | machineState.A << 8 | (value ^ 0xff)]
+        machineState.nz = entry & 0xff
+    machineState.A = entry & 0xff
+    machineState.flags = (flags & ALU_MASK) | (entry >> 8)
+
+def Compare(machineState: CPU, register: int, value: int):
+    #A compare is a subtraction with the carry set that only keeps the flags, and it is never done in decimal
+    machineState.flags = (machineState.flags & ~CARRY) | (register >= value)
+    machineState.nz = (register - value) & 0xff
+
+def CMP(machineState: CPU, value: int):
+    Compare(machineState, machineState.A, value)
+
+def CPX(machineState: CPU, value: int):
+    Compare(machineState, machineState.X, value)
+
+def CPY(machineState: CPU, value: int):
+    Compare(machineState, machineState.Y, value)
+
+#Increments and decrements
+def INC(machineState: CPU, value: int) -> int:
+    value = (value + 1) & 0xff
+    machineState.nz = value
+    return value
+
+def DEC(machineState: CPU, value: int) -> int:
+    value = (value - 1) & 0xff
+    machineState.nz = value
+    return value
+
+def INX(machineState: CPU):
+    machineState.X = value = (machineState.X + 1) & 0xff
+    machineState.nz = value
+
+def INY(machineState: CPU):
+    machineState.Y = value = (machineState.Y + 1) & 0xff
+    machineState.nz = value
+
+def DEX(machineState: CPU):
+    machineState.X = value = (machineState.X - 1) & 0xff
+    machineState.nz = value
+
+def DEY(machineState: CPU):
+    machineState.Y = value = (machineState.Y - 1) & 0xff
+    machineState.nz = value
+
+#Shifts and rotates
+def ASL(machineState: CPU, value: int) -> int:
+    result = (value << 1) & 0xff
+    machineState.flags = (machineState.flags & ~CARRY) | (value >> 7)
+    machineState.nz = result
+    return result
+
+def LSR(machineState: CPU, value: int) -> int:
+    result = value >> 1
+    machineState.flags = (machineState.flags & ~CARRY) | (value & CARRY)
+    machineState.nz = result
+    return result
+
+def ROL(machineState: CPU, value: int) -> int:
+    result = ((value << 1) | (machineState.flags & CARRY)) & 0xff
+    machineState.flags = (machineState.flags & ~CARRY) | (value >> 7)
+    machineState.nz = result
+    return result
+
+def ROR(machineState: CPU, value: int) -> int:
+    result = (value >> 1) | ((machineState.flags & CARRY) << 7)
+    machineState.flags = (machineState.flags & ~CARRY) | (value & CARRY)
+    machineState.nz = result
+    return result
+
+#Transfers
+def TAX(machineState: CPU):
+    machineState.X = machineState.A
+    machineState.nz = machineState.X
+
+def TAY(machineState: CPU):
+    machineState.Y = machineState.A
+    machineState.nz = machineState.Y
+
+def TXA(machineState: CPU):
+    machineState.A = machineState.X
+    machineState.nz = machineState.A
+
+def TYA(machineState: CPU):
+    machineState.A = machineState.Y
+    machineState.nz = machineState.A
+
+def TSX(machineState: CPU):
+    machineState.X = machineState.SP
+    machineState.nz = machineState.X
+
+def TXS(machineState: CPU):
+    machineState.SP = machineState.X
+
+#Stack operations
+def PHA(machineState: CPU):
+    Push(machineState, machineState.A)
+
+def PHP(machineState: CPU):
+    Push(machineState, machineState.P | BREAK | UNUSED)
+
+def PLA(machineState: CPU):
+    machineState.A = Pull(machineState)
+    machineState.nz = machineState.A
+
+def PLP(machineState: CPU):
+    machineState.P = Pull(machineState) & ~(BREAK | UNUSED)
+
+#Flag changes
+def CLC(machineState: CPU):
+    machineState.flags = machineState.flags & ~CARRY
+
+def SEC(machineState: CPU):
+    machineState.flags = machineState.flags | CARRY
+
+def CLI(machineState: CPU):
+    machineState.flags = machineState.flags & ~INTERRUPT
+
+def SEI(machineState: CPU):
+    machineState.flags = machineState.flags | INTERRUPT
+
+def CLV(machineState: CPU):
+    machineState.flags = machineState.flags & ~OVERFLOW
+
+def CLD(machineState: CPU):
+    machineState.flags = machineState.flags & ~DECIMAL
+
+def SED(machineState: CPU):
+    machineState.flags = machineState.flags | DECIMAL
+
+#Jumps and subroutines. The program counter has already been moved past the instruction when these run
+def JMP(machineState: CPU, address: int):
+    machineState.PC = address
+
+def JSR(machineState: CPU, address: int):
+    returnAddress = (machineState.PC - 1) & 0xffff #The address of the last byte of the JSR is pushed, RTS adds the 1 back
+    Push(machineState, returnAddress >> 8)
+    Push(machineState, returnAddress & 0xff)
+    machineState.PC = address
+
+def RTS(machineState: CPU):
+    low = Pull(machineState)
+    machineState.PC = ((Pull(machineState) << 8 | low) + 1) & 0xffff
+
+def RTI(machineState: CPU):
+    machineState.P = Pull(machineState) & ~(BREAK | UNUSED)
+    low = Pull(machineState)
+    machineState.PC = Pull(machineState) << 8 | low
+
+def BRK(machineState: CPU):
+    #Stops the processor, with the program counter left just past the BRK
+    raise Halt(STOP_BRK, f"BRK hit\nACC: {hex(machineState.A)}, X: {hex(machineState.X)}, Y: {hex(machineState.Y)}, Flags: {bin(machineState.P)}")
+
+def NOP(machineState: CPU):
+    pass
+
+#Branches, which jump to the target address when a flag is in the right state
+def Branch(machineState: CPU, address: int):
+    #A taken branch takes one more cycle, or two if the target is in a different page to the next instruction
+    machineState.cycles += 2 if (address ^ machineState.PC) & 0xff00 else 1
+    machineState.PC = address
+
+def BPL(machineState: CPU, address: int):
+    if not machineState.nz & 0x180:
+        Branch(machineState, address)
+
+def BMI(machineState: CPU, address: int):
+    if machineState.nz & 0x180:
+        Branch(machineState, address)
+
+def BVC(machineState: CPU, address: int):
+    if not machineState.flags & OVERFLOW:
+        Branch(machineState, address)
+
+def BVS(machineState: CPU, address: int):
+    if machineState.flags & OVERFLOW:
+        Branch(machineState, address)
+
+def BCC(machineState: CPU, address: int):
+    if not machineState.flags & CARRY:
+        Branch(machineState, address)
+
+def BCS(machineState: CPU, address: int):
+    if machineState.flags & CARRY:
+        Branch(machineState, address)
+
+def BNE(machineState: CPU, address: int):
+    if machineState.nz & 0xff:
+        Branch(machineState, address)
+
+def BEQ(machineState: CPU, address: int):
+    if not machineState.nz & 0xff:
+        Branch(machineState, address)
+
+#Each mnemonic, with the function that carries it out and what kind of operation it is
+operations = {
+    "LDA": (LDA, READ), "LDX": (LDX, READ), "LDY": (LDY, READ),
+    "STA": (STA, WRITE), "STX": (STX, WRITE), "STY": (STY, WRITE),
+    "AND": (AND, READ), "ORA": (ORA, READ), "EOR": (EOR, READ), "BIT": (BIT, READ),
+    "ADC": (ADC, READ), "SBC": (SBC, READ), "CMP": (CMP, READ), "CPX": (CPX, READ), "CPY": (CPY, READ),
+    "INC": (INC, MODIFY), "DEC": (DEC, MODIFY),
+    "INX": (INX, IMPLIED), "INY": (INY, IMPLIED), "DEX": (DEX, IMPLIED), "DEY": (DEY, IMPLIED),
+    "ASL": (ASL, MODIFY), "LSR": (LSR, MODIFY), "ROL": (ROL, MODIFY), "ROR": (ROR, MODIFY),
+    "TAX": (TAX, IMPLIED), "TAY": (TAY, IMPLIED), "TXA": (TXA, IMPLIED), "TYA": (TYA, IMPLIED), "TSX": (TSX, IMPLIED), "TXS": (TXS, IMPLIED),
+    "PHA": (PHA, IMPLIED), "PHP": (PHP, IMPLIED), "PLA": (PLA, IMPLIED), "PLP": (PLP, IMPLIED),
+    "CLC": (CLC, IMPLIED), "SEC": (SEC, IMPLIED), "CLI": (CLI, IMPLIED), "SEI": (SEI, IMPLIED),
+    "CLV": (CLV, IMPLIED), "CLD": (CLD, IMPLIED), "SED": (SED, IMPLIED),
+    "JMP": (JMP, JUMP), "JSR": (JSR, JUMP), "RTS": (RTS, IMPLIED), "RTI": (RTI, IMPLIED),
+    "BRK": (BRK, IMPLIED), "NOP": (NOP, IMPLIED),
+    "BPL": (BPL, JUMP), "BMI": (BMI, JUMP), "BVC": (BVC, JUMP), "BVS": (BVS, JUMP),
+    "BCC": (BCC, JUMP), "BCS": (BCS, JUMP), "BNE": (BNE, JUMP), "BEQ": (BEQ, JUMP),
+}
 
-def opcode_3e(machineState: dict):
-    #ROL ABS,X 3 6
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3]) + machineState["X"]
 
-    machineState["MEMORY"][address] = machineState["MEMORY"][address] << 1
-    machineState["MEMORY"][address] = machineState["MEMORY"][address] | (machineState["FLAGS"] & 0b00000001)
-    if machineState["MEMORY"][address] & 0b100000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-        machineState["MEMORY"][address] -= 0b100000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
+def MakeExecute(mnemonic: str, mode: AddressingMode):
+    """
+    Combines an operation with an addressing mode, returning a function that carries out the instruction given its decoded operand
+    """
+    operation, kind = operations[mnemonic]
+    Address = mode.Address
+
+    if kind == IMPLIED:
+        def Execute(machineState: CPU, operand):
+            operation(machineState)
+    elif kind == READ and mode is IMM:
+        def Execute(machineState: CPU, operand: int):
+            operation(machineState, operand)
+    elif kind == READ and Address is None:
+        def Execute(machineState: CPU, operand: int):
+            operation(machineState, machineState.MEMORY[operand])
+    elif kind == READ and mode in PAGE_CROSSING:
+        CrossesPage = PAGE_CROSSING[mode]
+        def Execute(machineState: CPU, operand: int):
+            if CrossesPage(machineState, operand):
+                machineState.cycles += 1
+            operation(machineState, machineState.MEMORY[Address(machineState, operand)])
+    elif kind == READ:
+        def Execute(machineState: CPU, operand: int):
+            operation(machineState, machineState.MEMORY[Address(machineState, operand)])
+    elif kind == WRITE and Address is None:
+        def Execute(machineState: CPU, operand: int):
+            Store(machineState, operand, operation(machineState))
+    elif kind == WRITE:
+        def Execute(machineState: CPU, operand: int):
+            Store(machineState, Address(machineState, operand), operation(machineState))
+    elif kind == MODIFY and mode is ACC:
+        def Execute(machineState: CPU, operand):
+            machineState.A = operation(machineState, machineState.A)
+    elif kind == MODIFY:
+        def Execute(machineState: CPU, operand: int):
+            address = operand if Address is None else Address(machineState, operand)
+            Store(machineState, address, operation(machineState, machineState.MEMORY[address]))
+    elif Address is None: #JUMP
+        def Execute(machineState: CPU, operand: int):
+            operation(machineState, operand)
+    else:
+        def Execute(machineState: CPU, operand: int):
+            operation(machineState, Address(machineState, operand))
+
+    return Execute
+
+def MakeHandler(mnemonic: str, mode: AddressingMode, cycles: int):
+    """
+    Builds the function for an opcode, which decodes the operand, moves the program counter past the instruction, counts its
+    base cycles and then executes it (which adds any extra cycles for crossing a page or taking a branch)
+    """
+    Execute = MakeExecute(mnemonic, mode)
+    operation, kind = operations[mnemonic]
+    Decode = mode.Decode
+    length = mode.length
 
-    if machineState["MEMORY"][address] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
+    if kind == IMPLIED: #No operand to decode, so the operation can be called directly
+        def handler(machineState: CPU):
+            machineState.PC = (machineState.PC + 1) & 0xffff
+            machineState.cycles += cycles
+            operation(machineState)
     else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
+        def handler(machineState: CPU):
+            pc = machineState.PC
+            operand = Decode(machineState.MEMORY, pc)
+            machineState.PC = (pc + length) & 0xffff
+            machineState.cycles += cycles
+            Execute(machineState, operand)
 
-    if machineState["MEMORY"][address] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
+    handler.__name__ = f"opcode_{mnemonic}_{mode.name}"
+    return handler
 
-    if config.VERBOSE:
-        print(f"Rotated {hex(address)} by one step left")
 
-    machineState["PC"] += 3
+"""
+This dictionary contains all implemented opcodes, indexed by their numerical value, with the operation, addressing mode and
+base number of cycles of each. for example, the opcode for ORA (IND,X) is 0x01 and takes 6 cycles, so the key 0x01 holds ("ORA", INDX, 6)
+"""
+opcode_table = {
+    0x00: ("BRK", IMP, 7),
+    0x01: ("ORA", INDX, 6),
+    0x05: ("ORA", ZP, 3),
+    0x06: ("ASL", ZP, 5),
+    0x08: ("PHP", IMP, 3),
+    0x09: ("ORA", IMM, 2),
+    0x0a: ("ASL", ACC, 2),
+    0x0d: ("ORA", ABS, 4),
+    0x0e: ("ASL", ABS, 6),
+
+    0x10: ("BPL", REL, 2),
+    0x11: ("ORA", INDY, 5),
+    0x15: ("ORA", ZPX, 4),
+    0x16: ("ASL", ZPX, 6),
+    0x18: ("CLC", IMP, 2),
+    0x19: ("ORA", ABSY, 4),
+    0x1d: ("ORA", ABSX, 4),
+    0x1e: ("ASL", ABSX, 7),
+
+    0x20: ("JSR", ABS, 6),
+    0x21: ("AND", INDX, 6),
+    0x24: ("BIT", ZP, 3),
+    0x25: ("AND", ZP, 3),
+    0x26: ("ROL", ZP, 5),
+    0x28: ("PLP", IMP, 4),
+    0x29: ("AND", IMM, 2),
+    0x2a: ("ROL", ACC, 2),
+    0x2c: ("BIT", ABS, 4),
+    0x2d: ("AND", ABS, 4),
+    0x2e: ("ROL", ABS, 6),
+
+    0x30: ("BMI", REL, 2),
+    0x31: ("AND", INDY, 5),
+    0x35: ("AND", ZPX, 4),
+    0x36: ("ROL", ZPX, 6),
+    0x38: ("SEC", IMP, 2),
+    0x39: ("AND", ABSY, 4),
+    0x3d: ("AND", ABSX, 4),
+    0x3e: ("ROL", ABSX, 7),
+
+    0x40: ("RTI", IMP, 6),
+    0x41: ("EOR", INDX, 6),
+    0x45: ("EOR", ZP, 3),
+    0x46: ("LSR", ZP, 5),
+    0x48: ("PHA", IMP, 3),
+    0x49: ("EOR", IMM, 2),
+    0x4a: ("LSR", ACC, 2),
+    0x4c: ("JMP", ABS, 3),
+    0x4d: ("EOR", ABS, 4),
+    0x4e: ("LSR", ABS, 6),
+
+    0x50: ("BVC", REL, 2),
+    0x51: ("EOR", INDY, 5),
+    0x55: ("EOR", ZPX, 4),
+    0x56: ("LSR", ZPX, 6),
+    0x58: ("CLI", IMP, 2),
+    0x59: ("EOR", ABSY, 4),
+    0x5d: ("EOR", ABSX, 4),
+    0x5e: ("LSR", ABSX, 7),
+
+    0x60: ("RTS", IMP, 6),
+    0x61: ("ADC", INDX, 6),
+    0x65: ("ADC", ZP, 3),
+    0x66: ("ROR", ZP, 5),
+    0x68: ("PLA", IMP, 4),
+    0x69: ("ADC", IMM, 2),
+    0x6a: ("ROR", ACC, 2),
+    0x6c: ("JMP", IND, 5),
+    0x6d: ("ADC", ABS, 4),
+    0x6e: ("ROR", ABS, 6),
+
+    0x70: ("BVS", REL, 2),
+    0x71: ("ADC", INDY, 5),
+    0x75: ("ADC", ZPX, 4),
+    0x76: ("ROR", ZPX, 6),
+    0x78: ("SEI", IMP, 2),
+    0x79: ("ADC", ABSY, 4),
+    0x7d: ("ADC", ABSX, 4),
+    0x7e: ("ROR", ABSX, 7),
+
+    0x81: ("STA", INDX, 6),
+    0x84: ("STY", ZP, 3),
+    0x85: ("STA", ZP, 3),
+    0x86: ("STX", ZP, 3),
+    0x88: ("DEY", IMP, 2),
+    0x8a: ("TXA", IMP, 2),
+    0x8c: ("STY", ABS, 4),
+    0x8d: ("STA", ABS, 4),
+    0x8e: ("STX", ABS, 4),
+
+    0x90: ("BCC", REL, 2),
+    0x91: ("STA", INDY, 6),
+    0x94: ("STY", ZPX, 4),
+    0x95: ("STA", ZPX, 4),
+    0x96: ("STX", ZPY, 4),
+    0x98: ("TYA", IMP, 2),
+    0x99: ("STA", ABSY, 5),
+    0x9a: ("TXS", IMP, 2),
+    0x9d: ("STA", ABSX, 5),
+
+    0xa0: ("LDY", IMM, 2),
+    0xa1: ("LDA", INDX, 6),
+    0xa2: ("LDX", IMM, 2),
+    0xa4: ("LDY", ZP, 3),
+    0xa5: ("LDA", ZP, 3),
+    0xa6: ("LDX", ZP, 3),
+    0xa8: ("TAY", IMP, 2),
+    0xa9: ("LDA", IMM, 2),
+    0xaa: ("TAX", IMP, 2),
+    0xac: ("LDY", ABS, 4),
+    0xad: ("LDA", ABS, 4),
+    0xae: ("LDX", ABS, 4),
+
+    0xb0: ("BCS", REL, 2),
+    0xb1: ("LDA", INDY, 5),
+    0xb4: ("LDY", ZPX, 4),
+    0xb5: ("LDA", ZPX, 4),
+    0xb6: ("LDX", ZPY, 4),
+    0xb8: ("CLV", IMP, 2),
+    0xb9: ("LDA", ABSY, 4),
+    0xba: ("TSX", IMP, 2),
+    0xbc: ("LDY", ABSX, 4),
+    0xbd: ("LDA", ABSX, 4),
+    0xbe: ("LDX", ABSY, 4),
+
+    0xc0: ("CPY", IMM, 2),
+    0xc1: ("CMP", INDX, 6),
+    0xc4: ("CPY", ZP, 3),
+    0xc5: ("CMP", ZP, 3),
+    0xc6: ("DEC", ZP, 5),
+    0xc8: ("INY", IMP, 2),
+    0xc9: ("CMP", IMM, 2),
+    0xca: ("DEX", IMP, 2),
+    0xcc: ("CPY", ABS, 4),
+    0xcd: ("CMP", ABS, 4),
+    0xce: ("DEC", ABS, 6),
+
+    0xd0: ("BNE", REL, 2),
+    0xd1: ("CMP", INDY, 5),
+    0xd5: ("CMP", ZPX, 4),
+    0xd6: ("DEC", ZPX, 6),
+    0xd8: ("CLD", IMP, 2),
+    0xd9: ("CMP", ABSY, 4),
+    0xdd: ("CMP", ABSX, 4),
+    0xde: ("DEC", ABSX, 7),
+
+    0xe0: ("CPX", IMM, 2),
+    0xe1: ("SBC", INDX, 6),
+    0xe4: ("CPX", ZP, 3),
+    0xe5: ("SBC", ZP, 3),
+    0xe6: ("INC", ZP, 5),
+    0xe8: ("INX", IMP, 2),
+    0xe9: ("SBC", IMM, 2),
+    0xea: ("NOP", IMP, 2),
+    0xec: ("CPX", ABS, 4),
+    0xed: ("SBC", ABS, 4),
+    0xee: ("INC", ABS, 6),
+
+    0xf0: ("BEQ", REL, 2),
+    0xf1: ("SBC", INDY, 5),
+    0xf5: ("SBC", ZPX, 4),
+    0xf6: ("INC", ZPX, 6),
+    0xf8: ("SED", IMP, 2),
+    0xf9: ("SBC", ABSY, 4),
+    0xfd: ("SBC", ABSX, 4),
+    0xfe: ("INC", ABSX, 7),
+}
 
+def opcode_illegal(machineState: CPU):
+    Crash(machineState, "Invalid instruction (not in table)")
 
-def opcode_40(machineState: dict):
-    #RTI Implied 1 6
-    machineState["SP"] += 1
-    address = 0x0100 + machineState["SP"]
-    machineState["FLAGS"] = machineState["MEMORY"][address]
-    machineState["SP"] += 1
-    address = 0x0100 + machineState["SP"]
-    machineState["PC"] = machineState["MEMORY"][address]
+def WithIllegalOpcodeHandler(table: list, handler) -> list:
+    """
+    Returns a copy of a table of handlers with every opcode that is not in opcode_table pointed at the given handler,
+    for example to skip over undefined opcodes instead of crashing. The table itself is left as it is, so that every machine
+    can have its own handler
+    """
+    table = list(table)
+    for opcode in range(0x100):
+        if opcode not in opcode_table:
+            table[opcode] = handler
+    return table
 
-    if config.VERBOSE:
-        print(f"Pulled processor flags ({bin(machineState['FLAGS'])} and PC from stack)")
+"""
+This list has a slot for every possible opcode, so that executing an instruction is a single index with no membership check.
+Opcodes that are not implemented point at the illegal opcode handler.
+decode_table has the parts needed to run an opcode from an operand that was decoded earlier: (Execute, Decode, length, cycles),
+and holds None for opcodes that are not implemented
+"""
+switch_table = [opcode_illegal] * 0x100
+decode_table = [None] * 0x100
+for opcode, (mnemonic, mode, cycles) in opcode_table.items():
+    switch_table[opcode] = MakeHandler(mnemonic, mode, cycles)
+    decode_table[opcode] = (MakeExecute(mnemonic, mode), mode.Decode, mode.length, cycles)
 
-    machineState["PC"] += 1
 
+"""
+Tracing.
+The handlers in switch_table have no tracing in them at all. A traced copy of the table wraps each of them, so that after every
+instruction it hands a TraceRecord to a function (such as list.append, or something that prints it).
+The registers in a record are the ones after the instruction has run
+"""
+TraceRecord = namedtuple("TraceRecord", ["pc", "opcode", "mnemonic", "mode", "operand", "A", "X", "Y", "SP", "P", "cycles"])
 
-def opcode_41(machineState: dict):
-    #EOR (IND,X) 2 6
-    address = machineState["MEMORY"][machineState["PC"] + 1] + machineState["X"]
-    finalAddressLowByte = machineState["MEMORY"][address]
-    finalAddressHighByte = machineState["MEMORY"][address+1]
-    newAddress = FromHex(bytes([finalAddressHighByte, finalAddressLowByte]))
-    data = machineState["MEMORY"][newAddress]
+def FormatTrace(record: TraceRecord) -> str:
+    return (f"PC: {hex(record.pc)}, {record.mnemonic} {record.mode} {'' if record.operand is None else hex(record.operand)} -> "
+            f"ACC: {hex(record.A)}, X: {hex(record.X)}, Y: {hex(record.Y)}, Flags: {bin(record.P)}")
 
-    machineState["ACC"] = machineState["ACC"] ^ data
+def MakeTracedHandler(handler, opcode: int, mnemonic: str, mode: AddressingMode, Record):
+    Decode = mode.Decode
+    modeName = mode.name
 
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
+    def traced(machineState: CPU):
+        pc = machineState.PC
+        operand = Decode(machineState.MEMORY, pc)
+        try:
+            handler(machineState)
+        finally: #Instructions that stop the processor (BRK) are recorded too
+            Record(TraceRecord(pc, opcode, mnemonic, modeName, operand, machineState.A, machineState.X, machineState.Y,
+                               machineState.SP, machineState.P, machineState.cycles))
 
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
+    traced.__name__ = f"traced_{handler.__name__}"
+    return traced
 
-    if config.VERBOSE:
-        print(f"Logical XOR ACC with {hex(data)} (now {hex(machineState['ACC'])})")
+def MakeTracedTable(Record) -> list:
+    """
+    Returns a copy of switch_table where every implemented opcode calls Record(TraceRecord) after it has run
+    """
+    table = list(switch_table)
+    for opcode, (mnemonic, mode, cycles) in opcode_table.items():
+        table[opcode] = MakeTracedHandler(switch_table[opcode], opcode, mnemonic, mode, Record)
+    return table
 
-    machineState["PC"] += 2
-
-
-def opcode_45(machineState: dict):
-    #EOR ZP 2 3
-    address = machineState["MEMORY"][machineState["PC"] + 1]
-    data = machineState["MEMORY"][address]
-
-    machineState["ACC"] = machineState["ACC"] ^ data
-
-    if machineState["ACC"] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical XOR ACC with {hex(data)} (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 2
-
-def opcode_46(machineState: dict):
-    #LSR ZP 2 6
-    address = machineState["MEMORY"][machineState["PC"] + 1]
-
-    if machineState["MEMORY"][address] & 0b1:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    machineState["MEMORY"][address] = machineState["MEMORY"][address] >> 1
-
-    if machineState["MEMORY"][address] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["MEMORY"][address] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical shift right on {hex(address)}")
-
-    machineState["PC"] += 2
-
-
-def opcode_48(machineState: dict):
-    #PHA IMPLIED 1 3
-    address = 0x0100 + machineState["SP"]
-    machineState["MEMORY"][address] = machineState["ACC"]
-    machineState["SP"] -= 1
-
-    if config.VERBOSE:
-        print(f"Pushed accumulator ({bin(machineState['ACC'])} to stack)")
-
-    machineState["PC"] += 1
-
-
-def opcode_49(machineState: dict):
-    #EOR IMM 2 2
-    data = machineState["MEMORY"][machineState["PC"] + 1]
-
-    machineState["ACC"] = machineState["ACC"] ^ data
-
-    if machineState["ACC"] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical XOR ACC with {hex(data)} (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 2
-
-def opcode_4a(machineState: dict):
-    #LSR ACCUM 1 2
-
-    if machineState["ACC"] & 0b1:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    machineState["ACC"] = machineState["ACC"] >> 1
-
-    if machineState["ACC"] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical shift right of ACC")
-
-    machineState["PC"] += 1
-
-def opcode_4c(machineState: dict):
-    #JMP ABS 3 3
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3])
-    machineState["PC"] = address
-
-    if config.VERBOSE:
-        print(f"Jumped to {hex(address)}")
-
-def opcode_4d(machineState: dict):
-    #EOR ABS 3 4
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3])
-    data = machineState["MEMORY"][address]
-
-    machineState["ACC"] = machineState["ACC"] ^ data
-
-    if machineState["ACC"] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical XOR ACC with {hex(data)} (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 3
-
-def opcode_4e(machineState: dict):
-    #LSR ABS 3 6
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3])
-
-    if machineState["MEMORY"][address] & 0b1:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    machineState["MEMORY"][address] = machineState["MEMORY"][address] >> 1
-
-    if machineState["MEMORY"][address] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["MEMORY"][address] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical shift right on {hex(address)}")
-
-    machineState["PC"] += 3
-
-
-def opcode_50(machineState: dict):
-    #BVC Relative 2 2
-
-
-    if machineState["FLAGS"] & 0b01000000 == 0b00000000:
-        offset = machineState["MEMORY"][machineState["PC"] + 1]
-        if offset & 0b10000000 == 0b10000000:
-            #offset is negative
-            decOffset = offset - 256
-        else:
-            decOffset = offset
-        machineState["PC"] += decOffset + 2
-        if config.VERBOSE:
-            print(f"Jumped to {hex(machineState['PC'])} because carry flag was clear")
-    else:
-        machineState["PC"] += 2
-        if config.VERBOSE:
-            print(f"Hit jump, but didnt jump because carry flag was not clear")
-
-
-
-def opcode_51(machineState: dict):
-    #EOR (IND),Y 2 5
-
-    address = machineState["MEMORY"][machineState["PC"] + 1]
-    finalAddressLowByte = machineState["MEMORY"][address]
-    finalAddressHighByte = machineState["MEMORY"][address+1]
-    newAddress = FromHex(bytes([finalAddressHighByte, finalAddressLowByte])) + machineState["Y"]
-    data = machineState["MEMORY"][newAddress]
-
-    machineState["ACC"] = machineState["ACC"] ^ data
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical XOR ACC with {hex(data)} (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 2
-
-
-def opcode_55(machineState: dict):
-    #EOR ZP,X 2 4
-
-    address = machineState["MEMORY"][machineState["PC"] + 1] + machineState["X"]
-    data = machineState["MEMORY"][address]
-
-    machineState["ACC"] = machineState["ACC"] ^ data
-
-    if machineState["ACC"] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical OR ACC with {hex(data)} (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 2
-
-
-
-def opcode_56(machineState: dict):
-    #LSR ZP,X 2 6
-    address = machineState["MEMORY"][machineState["PC"] + 1] + machineState["X"]
-
-    if machineState["MEMORY"][address] & 0b1:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    machineState["MEMORY"][address] = machineState["MEMORY"][address] >> 1
-
-    if machineState["MEMORY"][address] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["MEMORY"][address] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical shift right on {hex(address)}")
-
-    machineState["PC"] += 2
-
-def opcode_58(machineState: dict):
-    #CLI Implied 1 2
-
-    machineState["FLAGS"] = machineState["FLAGS"] & 0b11111011
-
-    if config.VERBOSE:
-        print(f"Cleared Interrupt flag")
-
-    machineState["PC"] += 1
-
-
-def opcode_59(machineState: dict):
-    #EOR ABS,Y 3 4
-
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3]) + machineState["Y"]
-    data = machineState["MEMORY"][address]
-
-    machineState["ACC"] = machineState["ACC"] ^ data
-
-    if machineState["ACC"] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical XOR ACC with {hex(data)} (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 3
-
-
-def opcode_5d(machineState: dict):
-    #EOR ABS,X 3 4
-
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3]) + machineState["X"]
-    data = machineState["MEMORY"][address]
-
-    machineState["ACC"] = machineState["ACC"] ^ data
-
-    if machineState["ACC"] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical XOR ACC with {hex(data)} (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 3
-
-
-
-def opcode_5e(machineState: dict):
-    #LSR ABS,X 3 7
-
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3]) + machineState["X"]
-
-    if machineState["MEMORY"][address] & 0b1:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    machineState["MEMORY"][address] = machineState["MEMORY"][address] >> 1
-
-    if machineState["MEMORY"][address] == 0b00000000:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["MEMORY"][address] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Logical shift right on {hex(address)}")
-
-    machineState["PC"] += 3
-
-
-def opcode_60(machineState: dict):
-    #RTS Implied 1 6
-
-    #pull pc from stack
-    #inc SP
-    pc = 0
-    machineState["SP"] += 1
-    pc += machineState["MEMORY"][0x0100 + machineState["SP"]]
-    machineState["SP"] += 1
-    pc += machineState["MEMORY"][0x0100 + machineState["SP"]] << 8
-
-    machineState["PC"] = pc
-
-    if config.VERBOSE:
-        print(f"Returned from subroutine to {hex(pc)}")
-
-def opcode_61(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_65(machineState: dict):
-    #ADC (ZP) 2 3
-    data = machineState["MEMORY"][machineState["MEMORY"][machineState["PC"]+1]]
-    machineState["ACC"] += data
-
-    if machineState["ACC"] > 0xff: #carry flag
-        machineState["ACC"] -= 0x100
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"{hex(data)} added to ACC (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 2
-
-
-
-def opcode_66(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_68(machineState: dict):
-    #PLA IMPLIED 1 4
-
-
-    machineState["SP"] += 1
-    address = 0x0100 + machineState["SP"]
-    machineState["ACC"] = machineState["MEMORY"][address]
-
-    if config.VERBOSE:
-        print(f"Pulled stack to accumulator ({bin(machineState['ACC'])})")
-
-    machineState["PC"] += 1
-
-
-
-def opcode_69(machineState: dict):
-    #ADC IMM 2 2
-    data = machineState["MEMORY"][machineState["PC"]+1]
-    machineState["ACC"] += data
-
-    if machineState["ACC"] > 0xff: #carry flag
-        machineState["ACC"] -= 0x100
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"{hex(data)} added to ACC (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 2
-
-def opcode_6a(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_6c(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_6d(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_6e(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-
-def opcode_70(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_71(machineState: dict):
-    #ADC (Indirect),Y 2 5
-
-    address = machineState["MEMORY"][machineState["PC"] + 1]
-    finalAddressLowByte = machineState["MEMORY"][address]
-    finalAddressHighByte = machineState["MEMORY"][address+1]
-    newAddress = FromHex(bytes([finalAddressHighByte, finalAddressLowByte])) + machineState["Y"]
-    data = machineState["MEMORY"][newAddress]
-
-    machineState["ACC"] += data + (machineState["FLAGS"] & 0b00000001)
-
-    if machineState["ACC"] > 0xff: #carry flag
-        machineState["ACC"] -= 0x100
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Performed ADC on ACC (Now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 2
-
-def opcode_75(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_76(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_78(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_79(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_7d(machineState: dict):
-    #ADC ABS,X 3 2
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3]) + machineState["X"]
-    data = machineState["MEMORY"][address]
-
-    machineState["ACC"] += data
-
-    if machineState["ACC"] > 0xff: #carry flag
-        machineState["ACC"] -= 0x100
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"{hex(data)} added to ACC (now {hex(machineState['ACC'])})")
-
-    machineState["PC"] += 3
-
-def opcode_7e(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-
-def opcode_81(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_84(machineState: dict):
-    #STY (ZP) 2 3
-
-    address = machineState["MEMORY"][machineState["PC"]+1]
-    machineState["MEMORY"][address] = machineState["Y"]
-
-    if config.VERBOSE:
-        print(f"Stored Y into memory at {hex(address)}")
-
-    machineState["PC"] += 2
-
-
-def opcode_85(machineState: dict):
-    #STA (ZP) 2 3
-
-    address = machineState["MEMORY"][machineState["PC"]+1]
-    machineState["MEMORY"][address] = machineState["ACC"]
-
-    if config.VERBOSE:
-        print(f"Stored ACC into memory at {hex(address)}")
-
-    machineState["PC"] += 2
-
-def opcode_86(machineState: dict):
-    #STX (ZP) 2 3
-
-    address = machineState["MEMORY"][machineState["PC"]+1]
-    machineState["MEMORY"][address] = machineState["X"]
-
-    if config.VERBOSE:
-        print(f"Stored X into memory at {hex(address)}")
-
-    machineState["PC"] += 2
-
-def opcode_88(machineState: dict):
-    #DEY Implied 1 2
-    machineState["Y"] -= 1
-    
-    if machineState["Y"] < 0:
-        machineState["Y"] += 0x100
-
-    if machineState["Y"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["Y"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Decremented Y to {hex(machineState['Y'])}")
-
-    machineState["PC"] += 1
-
-
-def opcode_8a(machineState: dict):
-    #TXA Implied 1 2
-    machineState["ACC"] = machineState["X"]
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Moved X ({hex(machineState['X'])}) to ACC")
-
-    machineState["PC"] += 1
-
-def opcode_8c(machineState: dict):
-    #STY ABS 3 4
-
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3])
-    machineState["MEMORY"][address] = machineState["Y"]
-
-    if config.VERBOSE:
-        print(f"Stored Y into memory at {hex(address)}")
-
-    machineState["PC"] += 3
-
-def opcode_8d(machineState: dict):
-    #STA ABS 3 4
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3])
-    machineState["MEMORY"][address] = machineState["ACC"]
-    if config.VERBOSE:
-        print(f"Stored ACC into memory at {hex(address)}")
-
-    machineState["PC"] += 3
-
-def opcode_8e(machineState: dict):
-    #STX ABS 3 4
-
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3])
-    machineState["MEMORY"][address] = machineState["X"]
-
-    if config.VERBOSE:
-        print(f"Stored X into memory at {hex(address)}")
-
-    machineState["PC"] += 3
-
-
-def opcode_90(machineState: dict):
-    #BCC Relative 2 2
-
-    if machineState["FLAGS"] & 0b00000001 == 0b00000000:
-        offset = machineState["MEMORY"][machineState["PC"] + 1]
-        if offset & 0b10000000 == 0b10000000:
-            #offset is negative
-            decOffset = offset - 256
-        else:
-            decOffset = offset
-        machineState["PC"] += decOffset + 2
-        if config.VERBOSE:
-            print(f"Jumped to {hex(machineState['PC'])} because carry flag was clear (relative jump by {decOffset})")
-    else:
-        machineState["PC"] += 2
-        if config.VERBOSE:
-            print(f"Hit jump, but didnt jump because carry flag was not clear")
-
-def opcode_91(machineState: dict):
-    #STA (IND),Y 2 6
-
-    address = machineState["MEMORY"][machineState["PC"] + 1]
-    dereferenced = machineState["MEMORY"][address]
-    newAddress = dereferenced + machineState["Y"]
-
-    machineState["MEMORY"][newAddress] = machineState["ACC"]
-
-    if config.VERBOSE:
-        print(f"Stored ACC at address {hex(newAddress)}")
-
-    machineState["PC"] += 2
-
-
-
-
-def opcode_94(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_95(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_96(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_98(machineState: dict):
-    #TYA IMPLIED 1 2
-    machineState["ACC"] = machineState["Y"]
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Moved Y ({hex(machineState['Y'])}) to ACC")
-
-    machineState["PC"] += 1
-
-
-def opcode_99(machineState: dict):
-    #STA ABS,Y 3 5
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3]) + machineState["Y"]
-
-    machineState["MEMORY"][address] = machineState["ACC"]
-
-    if config.VERBOSE:
-        print(f"Wrote to ram at address {hex(address)}: {hex(machineState['ACC'])}")
-
-    machineState["PC"] += 3
-
-
-def opcode_9a(machineState: dict):
-    #TXS Implied 1 2
-    machineState["SP"] = machineState["X"]
-
-    if config.VERBOSE:
-        print(f"Transferred X register to stack pointer")
-
-    machineState["PC"] += 1
-
-def opcode_9d(machineState: dict):
-    #STA ABS,X 3 5
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3]) + machineState["X"]
-
-    machineState["MEMORY"][address] = machineState["ACC"]
-
-    if config.VERBOSE:
-        print(f"Wrote to ram at address {hex(address)}: {hex(machineState['ACC'])}")
-
-    machineState["PC"] += 3
-
-def opcode_a0(machineState: dict):
-    #LDY IMM 2 2
-    data = machineState["MEMORY"][machineState["PC"] + 1]
-    machineState["Y"] = data
-
-    if machineState["Y"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["Y"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Loaded {hex(data)} into Y")
-
-    machineState["PC"] += 2
-
-def opcode_a1(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_a2(machineState: dict):
-    #LDX IMM 2 2
-    data = machineState["MEMORY"][machineState["PC"] + 1]
-    machineState["X"] = data
-
-    if machineState["X"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["X"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Loaded {hex(data)} into X")
-
-    machineState["PC"] += 2
-
-def opcode_a4(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_a5(machineState: dict):
-    #LDA ZP 2 3
-
-    data = machineState["MEMORY"][machineState["MEMORY"][machineState["PC"]+1]]
-    machineState["ACC"] = data
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Loaded {hex(data)} into ACC")
-
-    machineState["PC"] += 2
-
-def opcode_a6(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_a8(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_a9(machineState: dict):
-    # LDA IMM 2 2
-    data = machineState["MEMORY"][machineState["PC"]+1]
-    machineState["ACC"] = data
-
-    if config.VERBOSE:
-        print(f"Loaded {hex(data)} into ACC")
-
-    machineState["PC"] += 2
-
-def opcode_aa(machineState: dict):
-    #TAX Implied 1 2
-    data = machineState["ACC"]
-    machineState["X"] = data
-
-    if config.VERBOSE:
-        print(f"Set X to ACC ({hex(data)})")
-
-    machineState["PC"] += 1
-
-def opcode_ac(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_ad(machineState: dict):
-    #LDA ABS 3 4
-
-    address = FromHex(machineState["MEMORY"][machineState["PC"]+1:machineState["PC"]+3])
-    data = machineState["MEMORY"][address]
-    machineState["ACC"] = data
-
-    if config.VERBOSE:
-        print(f"Loaded {hex(data)} into ACC")
-
-    machineState["PC"] += 3
-
-def opcode_ae(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-
-def opcode_b0(machineState: dict):
-    #BCS Rel 2 2
-    if machineState["FLAGS"] & 0b00000001 == 0b00000001:
-        offset = machineState["MEMORY"][machineState["PC"] + 1]
-        if offset & 0b10000000 == 0b10000000:
-            #offset is negative
-            decOffset = offset - 256
-        else:
-            decOffset = offset
-        machineState["PC"] += decOffset + 2
-        if config.VERBOSE:
-            print(f"Jumped to {hex(machineState['PC'])} because carry flag was set (relative jump by {decOffset})")
-    else:
-        machineState["PC"] += 2
-        if config.VERBOSE:
-            print(f"Hit jump, but didnt jump because carry flag was clear")
-
-def opcode_b1(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_b4(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_b5(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_b6(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_b8(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_b9(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_ba(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_bc(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_bd(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_be(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-
-def opcode_c0(machineState: dict):
-    #CPY IMM 2 2
-    data = machineState["MEMORY"][machineState["PC"] + 1]
-
-    if machineState["Y"] >= data:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    if machineState["Y"] == data:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if (machineState["Y"] - data) & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Compared Y ({hex(machineState['Y'])}) to {hex(data)}")
-
-    machineState["PC"] += 2
-
-def opcode_c1(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_c4(machineState: dict):
-    #CPY ZP 2 3
-
-    address = machineState["MEMORY"][machineState["PC"] + 1]
-    data = machineState["MEMORY"][address]
-
-    if machineState["Y"] >= data:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    if machineState["Y"] == data:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if (machineState["Y"] - data) & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Compared Y ({hex(machineState['Y'])}) to {hex(data)}")
-
-    machineState["PC"] += 2
-
-
-
-def opcode_c5(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_c6(machineState: dict):
-    #DEC ZP 2 5
-    address = machineState["MEMORY"][machineState["PC"] + 1]
-    machineState["MEMORY"][address] -= 1
-
-    if machineState["MEMORY"][address] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["MEMORY"][address] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Decremented memory at {hex(address)}")
-
-    machineState["PC"] += 2
-
-def opcode_c8(machineState: dict):
-    #INY IMPLIED 1 2
-    machineState["Y"] += 1
-
-    if machineState["Y"] > 0xff:
-        machineState["Y"] -= 0x100
-
-    if machineState["Y"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["Y"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Incremented Y (to {hex(machineState['Y'])})")
-
-    machineState["PC"] += 1
-
-def opcode_c9(machineState: dict):
-    #CMP Immidiate 2 2
-
-    data = machineState["MEMORY"][machineState["PC"] + 1]
-
-    if machineState["ACC"] >= data: #carry flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    if machineState["ACC"] == data: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if (machineState["ACC"]-data) & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Compared ACC to {hex(data)}")
-
-    machineState["PC"] += 2
-
-
-def opcode_ca(machineState: dict):
-    #DEX Implied 1 2
-
-    machineState["X"] -= 1
-    if machineState["X"] < 0:
-        machineState["X"] += 0x100
-
-    if machineState["X"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["X"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Decremented X (to {hex(machineState['X'])})")
-
-    machineState["PC"] += 1
-
-
-
-def opcode_cc(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_cd(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_ce(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-
-def opcode_d0(machineState: dict):
-    #BNE Relative 2 2
-
-    if machineState["FLAGS"] & 0b00000010 == 0b00000000:
-        offset = machineState["MEMORY"][machineState["PC"] + 1]
-        if offset & 0b10000000 == 0b10000000:
-            #offset is negative
-            decOffset = offset - 256
-        else:
-            decOffset = offset
-        machineState["PC"] += decOffset + 2
-        if config.VERBOSE:
-            print(f"Jumped to {hex(machineState['PC'])} because zero flag was clear (relative jump by {decOffset})")
-    else:
-        machineState["PC"] += 2
-        if config.VERBOSE:
-            print(f"Hit jump, but didnt jump because zero flag was not clear")
-
-
-def opcode_d1(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_d5(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_d6(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_d8(machineState: dict):
-    #CLD Implied 1 2
-
-    machineState["FLAGS"] = machineState["FLAGS"] & 0b11110111
-
-    if config.VERBOSE:
-        print(f"Cleared Decimal flag")
-
-    machineState["PC"] += 1
-
-
-def opcode_d9(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_dd(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_de(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-
-def opcode_e0(machineState: dict):
-    #CPX IMM 2 2
-    data = machineState["MEMORY"][machineState["PC"] + 1]
-
-    if machineState["X"] >= data:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111110
-
-    if machineState["X"] == data:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if (machineState["X"] - data) & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Compared X ({hex(machineState['X'])}) to {hex(data)}")
-
-    machineState["PC"] += 2
-
-def opcode_e1(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_e4(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_e5(machineState: dict):
-    #SBC ZP 2 3
-
-    address = machineState["MEMORY"][machineState["PC"] + 1]
-    data = machineState["MEMORY"][address]
-
-    AccBit7 = (machineState["ACC"] & 0b10000000) >> 7
-    DataBit7 = (data & 0b10000000) >> 7
-
-    C = machineState["FLAGS"] & 0b00000001
-    machineState["ACC"] = machineState["ACC"] - data - (1-C)
-
-    ResBit7 = (machineState["ACC"] & 0b10000000) >> 7
-
-    if machineState["ACC"] < 0x00:
-        machineState["ACC"] += 0x100
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000001
-
-    if machineState["ACC"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["ACC"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111  
-
-    if ResBit7 == 1 and AccBit7 == 0 and DataBit7 == 0:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b01000000
-    elif ResBit7 == 0 and AccBit7 == 1 and DataBit7 == 1:
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b01000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b10111111
-
-    if config.VERBOSE:
-        print(f"Subtracted {hex(data)} from acc (now {machineState['ACC']})")
-
-    machineState["PC"] += 2
-
-    
-
-def opcode_e6(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_e8(machineState: dict):
-    #INX Implied 1 2
-    machineState["X"] += 1
-
-    if machineState["X"] > 0xff:
-        machineState["X"] -= 0x100
-
-    if machineState["X"] == 0x0: #zero flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b00000010
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b11111101
-
-    if machineState["X"] & 0b10000000 == 0b10000000: #negative flag
-        machineState["FLAGS"] = machineState["FLAGS"] | 0b10000000
-    else:
-        machineState["FLAGS"] = machineState["FLAGS"] & 0b01111111
-
-    if config.VERBOSE:
-        print(f"Incremented X (to {hex(machineState['X'])})")
-
-    machineState["PC"] += 1
-
-def opcode_e9(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_ea(machineState: dict):
-    #NOP implied 1 2
-    if config.VERBOSE:
-        print("NOP")
-
-    machineState["PC"] += 1
-
-def opcode_ec(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_ed(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_ee(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-
-def opcode_f0(machineState: dict):
-    #BEQ Rel 2 2
-    if machineState["FLAGS"] & 0b00000010 == 0b00000010:
-        offset = machineState["MEMORY"][machineState["PC"] + 1]
-        if offset & 0b10000000 == 0b10000000:
-            #offset is negative
-            decOffset = offset - 256
-        else:
-            decOffset = offset
-        machineState["PC"] += decOffset + 2
-        if config.VERBOSE:
-            print(f"Jumped to {hex(machineState['PC'])} because zero flag was set (relative jump by {decOffset})")
-    else:
-        machineState["PC"] += 2
-        if config.VERBOSE:
-            print(f"Hit jump, but didnt jump because zero flag was clear")
-
-def opcode_f1(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_f5(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_f6(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_f8(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_f9(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_fd(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-def opcode_fe(machineState: dict):
-    Crash(machineState, "Instruction not implemented")
-
-"""
-This dictionary contains all opcodes, indexed by their numerical value. for example, the opcode for ORA (IND,X) is 0x01, 
-and the opcode can be executed by calling the function at the key 0x02 in the dictionary
-"""
-switch_table = {
-    0x00: opcode_00,
-    0x01: opcode_01,
-    0x05: opcode_05,
-    0x06: opcode_06,
-    0x08: opcode_08,
-    0x09: opcode_09,
-    0x0a: opcode_0a,
-    0x0d: opcode_0d,
-    0x0e: opcode_0e,
-
-    0x10: opcode_10,
-    0x11: opcode_11,
-    0x15: opcode_15,
-    0x16: opcode_16,
-    0x18: opcode_18,
-    0x19: opcode_19,
-    0x1d: opcode_1d,
-    0x1e: opcode_1e,
-
-    0x20: opcode_20,
-    0x21: opcode_21,
-    0x24: opcode_24,
-    0x25: opcode_25,
-    0x26: opcode_26,
-    0x28: opcode_28,
-    0x29: opcode_29,
-    0x2a: opcode_2a,
-    0x2c: opcode_2c,
-    0x2d: opcode_2d,
-    0x2e: opcode_2e,
-
-    0x30: opcode_30,
-    0x31: opcode_31,
-    0x35: opcode_35,
-    0x36: opcode_36,
-    0x38: opcode_38,
-    0x39: opcode_39,
-    0x3d: opcode_3d,
-    0x3e: opcode_3e,
-
-    0x40: opcode_40,
-    0x41: opcode_41,
-    0x45: opcode_45,
-    0x46: opcode_46,
-    0x48: opcode_48,
-    0x49: opcode_49,
-    0x4a: opcode_4a,
-    0x4c: opcode_4c,
-    0x4d: opcode_4d,
-    0x4e: opcode_4e,
-
-    0x50: opcode_50,
-    0x51: opcode_51,
-    0x55: opcode_55,
-    0x56: opcode_56,
-    0x58: opcode_58,
-    0x59: opcode_59,
-    0x5d: opcode_5d,
-    0x5e: opcode_5e,
-
-    0x60: opcode_60,
-    0x61: opcode_61,
-    0x65: opcode_65,
-    0x66: opcode_66,
-    0x68: opcode_68,
-    0x69: opcode_69,
-    0x6a: opcode_6a,
-    0x6c: opcode_6c,
-    0x6d: opcode_6d,
-    0x6e: opcode_6e,
-
-    0x70: opcode_70,
-    0x71: opcode_71,
-    0x75: opcode_75,
-    0x76: opcode_76,
-    0x78: opcode_78,
-    0x79: opcode_79,
-    0x7d: opcode_7d,
-    0x7e: opcode_7e,
-
-    0x81: opcode_81,
-    0x84: opcode_84,
-    0x85: opcode_85,
-    0x86: opcode_86,
-    0x88: opcode_88,
-    0x8a: opcode_8a,
-    0x8c: opcode_8c,
-    0x8d: opcode_8d,
-    0x8e: opcode_8e,
-
-    0x90: opcode_90,
-    0x91: opcode_91,
-    0x94: opcode_94,
-    0x95: opcode_95,
-    0x96: opcode_96,
-    0x98: opcode_98,
-    0x99: opcode_99,
-    0x9a: opcode_9a,
-    0x9d: opcode_9d,
-
-    0xa0: opcode_a0,
-    0xa1: opcode_a1,
-    0xa2: opcode_a2,
-    0xa4: opcode_a4,
-    0xa5: opcode_a5,
-    0xa6: opcode_a6,
-    0xa8: opcode_a8,
-    0xa9: opcode_a9,
-    0xaa: opcode_aa,
-    0xac: opcode_ac,
-    0xad: opcode_ad,
-    0xae: opcode_ae,
-
-    0xb0: opcode_b0,
-    0xb1: opcode_b1,
-    0xb4: opcode_b4,
-    0xb5: opcode_b5,
-    0xb6: opcode_b6,
-    0xb8: opcode_b8,
-    0xb9: opcode_b9,
-    0xba: opcode_ba,
-    0xbc: opcode_bc,
-    0xbd: opcode_bd,
-    0xbe: opcode_be,
-
-    0xc0: opcode_c0,
-    0xc1: opcode_c1,
-    0xc4: opcode_c4,
-    0xc5: opcode_c5,
-    0xc6: opcode_c6,
-    0xc8: opcode_c8,
-    0xc9: opcode_c9,
-    0xca: opcode_ca,
-    0xcc: opcode_cc,
-    0xcd: opcode_cd,
-    0xce: opcode_ce,
-
-    0xd0: opcode_d0,
-    0xd1: opcode_d1,
-    0xd5: opcode_d5,
-    0xd6: opcode_d6,
-    0xd8: opcode_d8,
-    0xd9: opcode_d9,
-    0xdd: opcode_dd,
-    0xde: opcode_de,
-
-    0xe0: opcode_e0,
-    0xe1: opcode_e1,
-    0xe4: opcode_e4,
-    0xe5: opcode_e5,
-    0xe6: opcode_e6,
-    0xe8: opcode_e8,
-    0xe9: opcode_e9,
-    0xea: opcode_ea,
-    0xec: opcode_ec,
-    0xed: opcode_ed,
-    0xee: opcode_ee,
-
-    0xf0: opcode_f0,
-    0xf1: opcode_f1,
-    0xf5: opcode_f5,
-    0xf6: opcode_f6,
-    0xf8: opcode_f8,
-    0xf9: opcode_f9,
-    0xfd: opcode_fd,
-    0xfe: opcode_fe
-}
 
-#7582 ♥
\ No newline at end of file
+#7582 ♥
@@ -0,0 +1,506 @@
+"""
+A translator that turns blocks of 6502 code into Python functions, so that straight-line code runs without dispatching every instruction.
+A block starts at the address execution reaches it from, and runs until a branch, JMP, JSR, RTS or RTI (or an instruction that
+cannot be translated). The Python source for the block is generated with the registers held in local variables, and the zero and
+negative flags are only worked out when something looks at them (a branch, PHP, or the end of the block).
+The base cycles of the instructions are added up while translating, so only the extra cycle for an indexed read that crosses a page
+is counted while the block runs.
+When a block ends in a branch or jump back to its own start, the loop is run inside the function. If that loop is idle (see idle.py),
+the block leaves after going round once and tells the translator, which skips the rest of the budget instead of spinning through it,
+and sets waiting so that whoever is running the machine can decide whether to let the host sleep.
+The functions are cached by their start address, and thrown away when the processor writes to a page of memory they were translated from.
+Anything that is not translated is run by the handlers the translator was given, instructions.switch_table unless the machine has its own
+"""
+import random
+
+import instructions
+from alu import ADD_BINARY, ADD_DECIMAL, SUBTRACT_DECIMAL, ALU_MASK
+from cpu import CPU
+from idle import IsIdleLoop
+from instructions import (ACC, IMM, ZP, ZPX, ZPY, ABS, ABSX, ABSY, INDX, INDY, IND, PAGE_CROSSING,
+                          CARRY, ZERO, DECIMAL, OVERFLOW, NEGATIVE, BREAK, UNUSED, NZ_MASK, NZ_FLAGS, NZ_VALUES)
+
+MAX_BLOCK_LENGTH = 32 #The most instructions translated into one block
+
+#Instructions that end a block, because where they go next is not the following instruction
+BRANCHES = {"BPL": "not nzN", "BMI": "nzN", "BVC": "not P & 0x40", "BVS": "P & 0x40",
+            "BCC": "not P & 0x01", "BCS": "P & 0x01", "BNE": "nzZ", "BEQ": "not nzZ"}
+JUMPS = {"JMP", "JSR", "RTS", "RTI"}
+UNTRANSLATED = {"BRK"} #Left to the handler in instructions.py, since it stops the machine
+
+#Everything the generated functions use, apart from their own locals
+blockGlobals = {"ADD_BINARY": ADD_BINARY, "ADD_DECIMAL": ADD_DECIMAL, "SUBTRACT_DECIMAL": SUBTRACT_DECIMAL, "ALU_MASK": ALU_MASK,
+                "NZ_MASK": NZ_MASK, "NZ_FLAGS": NZ_FLAGS, "NZ_VALUES": NZ_VALUES}
+
+
+class BlockWriter:
+    """
+    Generates the source of a single block, one instruction at a time.
+    It keeps track of where the zero and negative flags currently are: nz is None when they are in P,
+    otherwise it is the name of the local variable holding the last result that set them, as in cpu.NZ_FLAGS.
+    A block starts with them in the local nz, the same as the machine keeps them, and the rest of the flags in P
+    """
+    def __init__(self, entry: int, idle: bool = False):
+        self.entry = entry
+        self.idle = idle #Whether the block is an idle loop, which leaves as soon as it has been round once
+        self.lines = []
+        self.indent = 2
+        self.nz = "nz"
+        self.count = 0 #Instructions so far in the block
+        self.cycles = 0 #Base cycles of those instructions, the extra cycles are added to the local cycles as they happen
+        self.temporaries = 0
+
+    def Emit(self, line: str):
+        self.lines.append("    " * self.indent + line)
+
+    def Temporary(self) -> str:
+        self.temporaries += 1
+        return f"t{self.temporaries}"
+
+    def Materialise(self) -> str:
+        """
+        Returns an expression for the full status register, with the zero and negative flags filled in
+        """
+        return "P" if self.nz is None else f"(P & {NZ_MASK}) | NZ_FLAGS[{self.nz}]"
+
+    def FlagTests(self):
+        """
+        Returns the conditions that are true when the zero flag is clear, and when the negative flag is set
+        """
+        if self.nz is None:
+            return "not P & 0x02", "P & 0x80"
+        return f"{self.nz} & 0xff", f"{self.nz} & 0x180"
+
+    def Exit(self, target: str):
+        """
+        Writes the registers back to the machine, and leaves the block with the program counter at target
+        """
+        self.Emit("machineState.A = A; machineState.X = X; machineState.Y = Y; machineState.SP = SP")
+        if self.nz is None:
+            self.Emit("machineState.P = P")
+        else: #Left for the machine to work out lazily too, the zero and negative bits of P are ignored
+            self.Emit(f"machineState.flags = P; machineState.nz = {self.nz}")
+        self.Emit(f"machineState.PC = {target}")
+        self.Emit(f"machineState.cycles = cycles + {self.cycles}")
+        self.Emit(f"return executed + {self.count}")
+
+    def Address(self, mode, operand: int) -> str:
+        """
+        Emits whatever is needed to work out the effective address, and returns an expression for it
+        """
+        if mode is ZP or mode is ABS:
+            return hex(operand)
+        if mode is ZPX:
+            return f"(({hex(operand)} + X) & 0xff)"
+        if mode is ZPY:
+            return f"(({hex(operand)} + Y) & 0xff)"
+        if mode is ABSX:
+            return f"(({hex(operand)} + X) & 0xffff)"
+        if mode is ABSY:
+            return f"(({hex(operand)} + Y) & 0xffff)"
+        address = self.Temporary()
+        if mode is INDX:
+            self.Emit(f"{address} = ({hex(operand)} + X) & 0xff")
+            self.Emit(f"{address} = memory[{address}] | memory[({address} + 1) & 0xff] << 8")
+        elif mode is INDY:
+            self.Emit(f"{address} = ((memory[{hex(operand)}] | memory[{hex((operand + 1) & 0xff)}] << 8) + Y) & 0xffff")
+        elif mode is IND:
+            self.Emit(f"{address} = memory[{hex(operand)}] | memory[{hex((operand & 0xff00) | ((operand + 1) & 0xff))}] << 8")
+        return address
+
+    def Value(self, mode, operand: int) -> str:
+        """
+        Emits a read of the operand of an instruction, returning the name of the local holding it (or a constant for immediates)
+        """
+        if mode is IMM:
+            return hex(operand)
+        if mode is INDY:
+            self.Emit(f"if memory[{hex(operand)}] + Y > 0xff: cycles += 1")
+        elif mode in PAGE_CROSSING:
+            self.Emit(f"if {'X' if mode is ABSX else 'Y'} > {hex(0xff - (operand & 0xff))}: cycles += 1")
+        value = self.Temporary()
+        self.Emit(f"{value} = memory[{self.Address(mode, operand)}]")
+        return value
+
+    def Store(self, address: str, value: str, nextPc: int):
+        """
+        Emits a write to memory, which tells the watchers of the page about it.
+        If that throws this block away (because the code it was translated from has changed), the block is left straight away
+        """
+        if not address.isidentifier():
+            target = self.Temporary()
+            self.Emit(f"{target} = {address}")
+            address = target
+        self.Emit(f"memory[{address}] = {value}")
+        self.Emit(f"if watchers[{address} >> 8]:")
+        self.indent += 1
+        self.Emit(f"for watcher in watchers[{address} >> 8]: watcher({address})")
+        self.Emit("if translator.invalidations != invalidations:")
+        self.indent += 1
+        self.Exit(hex(nextPc))
+        self.indent -= 2
+
+    def Push(self, value: str, nextPc: int = None):
+        """
+        Emits a push onto the stack, which tells the watchers of the stack page about it.
+        If that throws this block away, the block is left straight away at nextPc. Without a nextPc the block is not left,
+        for an instruction that pushes more than once and leaves the block itself (JSR), so that it is never left half done
+        """
+        self.Emit(f"memory[0x100 + SP] = {value}")
+        self.Emit("if watchers[0x01]:")
+        self.indent += 1
+        self.Emit(f"for watcher in watchers[0x01]: watcher(0x100 + SP)")
+        if nextPc is not None:
+            self.Emit("if translator.invalidations != invalidations:")
+            self.indent += 1
+            self.Emit("SP = (SP - 1) & 0xff")
+            self.Exit(hex(nextPc))
+            self.indent -= 1
+        self.indent -= 1
+        self.Emit("SP = (SP - 1) & 0xff")
+
+    def Pull(self, name: str):
+        self.Emit("SP = (SP + 1) & 0xff")
+        self.Emit(f"{name} = memory[0x100 + SP]")
+
+    def Instruction(self, mnemonic: str, mode, operand, nextPc: int, cycles: int):
+        """
+        Emits the code for one instruction that does not end the block
+        """
+        self.count += 1
+        self.cycles += cycles
+        if mnemonic in ("LDA", "LDX", "LDY"):
+            register = mnemonic[2]
+            self.Emit(f"{register} = {self.Value(mode, operand)}")
+            self.nz = register
+        elif mnemonic in ("STA", "STX", "STY"):
+            self.Store(self.Address(mode, operand), mnemonic[2], nextPc)
+        elif mnemonic in ("AND", "ORA", "EOR"):
+            operator = {"AND": "&", "ORA": "|", "EOR": "^"}[mnemonic]
+            self.Emit(f"A = A {operator} {self.Value(mode, operand)}")
+            self.nz = "A"
+        elif mnemonic == "BIT":
+            value = self.Value(mode, operand)
+            self.Emit(f"P = ({self.Materialise()}) & {~(ZERO | NEGATIVE | OVERFLOW) & 0xff} | ({value} & 0xc0) | (0 if A & {value} else 0x02)")
+            self.nz = None
+        elif mnemonic in ("ADC", "SBC"):
+            value = self.Value(mode, operand)
+            entry = self.Temporary()
+            if mnemonic == "ADC":
+                self.Emit(f"{entry} = (ADD_DECIMAL if P & {DECIMAL} else ADD_BINARY)[(P & 1) << 16 | A << 8 | {value}]")
+            else:
+                self.Emit(f"{entry} = SUBTRACT_DECIMAL[(P & 1) << 16 | A << 8 | {value}] if P & {DECIMAL} else ADD_BINARY[(P & 1) << 16 | A << 8 | ({value} ^ 0xff)]")
+            self.Emit(f"A = {entry} & 0xff")
+            self.Emit(f"P = (P & ALU_MASK) | ({entry} >> 8)")
+            self.nz = None
+        elif mnemonic in ("CMP", "CPX", "CPY"):
+            register = "A" if mnemonic == "CMP" else mnemonic[2]
+            value = self.Value(mode, operand)
+            self.Emit(f"P = (P & {~CARRY & 0xff}) | ({register} >= {value})")
+            self.Emit(f"nz = ({register} - {value}) & 0xff")
+            self.nz = "nz"
+        elif mnemonic in ("INX", "INY", "DEX", "DEY"):
+            register = mnemonic[2]
+            self.Emit(f"{register} = ({register} {'+' if mnemonic[0] == 'I' else '-'} 1) & 0xff")
+            self.nz = register
+        elif mnemonic in ("INC", "DEC"):
+            address = self.Address(mode, operand)
+            if not address.isidentifier():
+                target = self.Temporary()
+                self.Emit(f"{target} = {address}")
+                address = target
+            self.Emit(f"nz = (memory[{address}] {'+' if mnemonic == 'INC' else '-'} 1) & 0xff")
+            self.nz = "nz"
+            self.Store(address, "nz", nextPc)
+        elif mnemonic in ("ASL", "LSR", "ROL", "ROR"):
+            if mode is ACC:
+                value = "A"
+            else:
+                address = self.Address(mode, operand)
+                if not address.isidentifier():
+                    target = self.Temporary()
+                    self.Emit(f"{target} = {address}")
+                    address = target
+                value = self.Temporary()
+                self.Emit(f"{value} = memory[{address}]")
+            result = {"ASL": f"({value} << 1) & 0xff",
+                      "LSR": f"{value} >> 1",
+                      "ROL": f"(({value} << 1) | (P & 1)) & 0xff",
+                      "ROR": f"({value} >> 1) | ((P & 1) << 7)"}[mnemonic]
+            carry = f"{value} >> 7" if mnemonic in ("ASL", "ROL") else f"{value} & 1"
+            self.Emit(f"nz = {result}")
+            self.Emit(f"P = (P & {~CARRY & 0xff}) | ({carry})")
+            self.nz = "nz"
+            if mode is ACC:
+                self.Emit("A = nz")
+                self.nz = "A"
+            else:
+                self.Store(address, "nz", nextPc)
+        elif mnemonic in ("TAX", "TAY", "TXA", "TYA", "TSX"):
+            source = {"TAX": "A", "TAY": "A", "TXA": "X", "TYA": "Y", "TSX": "SP"}[mnemonic]
+            self.Emit(f"{mnemonic[2]} = {source}")
+            self.nz = mnemonic[2]
+        elif mnemonic == "TXS":
+            self.Emit("SP = X")
+        elif mnemonic == "PHA":
+            self.Push("A", nextPc)
+        elif mnemonic == "PHP":
+            self.Push(f"({self.Materialise()}) | {BREAK | UNUSED}", nextPc)
+        elif mnemonic == "PLA":
+            self.Pull("A")
+            self.nz = "A"
+        elif mnemonic == "PLP":
+            self.Pull("P")
+            self.Emit(f"P = P & {~(BREAK | UNUSED) & 0xff}")
+            self.nz = None
+        elif mnemonic in ("CLC", "SEC", "CLI", "SEI", "CLV", "CLD", "SED"):
+            bit = {"C": CARRY, "I": 0b00000100, "V": OVERFLOW, "D": DECIMAL}[mnemonic[2]]
+            if mnemonic[0] == "C":
+                self.Emit(f"P = P & {~bit & 0xff}")
+            else:
+                self.Emit(f"P = P | {bit}")
+        elif mnemonic == "NOP":
+            pass
+        else:
+            raise ValueError(f"{mnemonic} cannot be translated")
+
+    def End(self, mnemonic: str, mode, operand, nextPc: int, cycles: int):
+        """
+        Emits the code for the instruction that ends the block
+        """
+        self.count += 1
+        self.cycles += cycles
+        loops = operand == self.entry and (mnemonic in BRANCHES or (mnemonic == "JMP" and mode is ABS))
+        if mnemonic in BRANCHES:
+            notZero, negative = self.FlagTests()
+            condition = BRANCHES[mnemonic].replace("nzZ", f"({notZero})").replace("nzN", f"({negative})")
+            self.Emit(f"if {condition}:")
+            self.indent += 1
+            taken = 2 if (operand ^ nextPc) & 0xff00 else 1 #The extra cycles for taking the branch
+            self.cycles += taken
+            if loops:
+                self.BackEdge()
+            else:
+                self.Exit(hex(operand))
+            self.cycles -= taken
+            self.indent -= 1
+            self.Exit(hex(nextPc))
+        elif mnemonic == "JMP":
+            if loops:
+                self.BackEdge()
+            else:
+                self.Exit(self.Address(mode, operand))
+        elif mnemonic == "JSR":
+            returnAddress = (nextPc - 1) & 0xffff
+            self.Push(hex(returnAddress >> 8)) #Both bytes are pushed whatever the watchers do, and the block is left for the target either way
+            self.Push(hex(returnAddress & 0xff))
+            self.Exit(hex(operand))
+        elif mnemonic == "RTS":
+            self.Pull("t0")
+            self.Pull("pc")
+            self.Exit("((pc << 8 | t0) + 1) & 0xffff")
+        elif mnemonic == "RTI":
+            self.Pull("P")
+            self.Emit(f"P = P & {~(BREAK | UNUSED) & 0xff}")
+            self.nz = None
+            self.Pull("t0")
+            self.Pull("pc")
+            self.Exit("pc << 8 | t0")
+
+    def BackEdge(self):
+        """
+        Goes back round the loop to the start of the block, until the cycle count reaches the budget.
+        An idle loop leaves instead, since going round again would leave everything exactly as it is now
+        """
+        if self.idle:
+            self.Emit("translator.idle = True")
+            self.Exit(hex(self.entry))
+            return
+        self.Emit(f"executed += {self.count}")
+        self.Emit(f"cycles += {self.cycles}")
+        self.Emit("if cycles >= budget:")
+        self.indent += 1
+        count, self.count = self.count, 0
+        cycles, self.cycles = self.cycles, 0
+        self.Exit(hex(self.entry))
+        self.count, self.cycles = count, cycles
+        self.indent -= 1
+        if self.nz is None: #The top of the loop expects the zero and negative flags to be in nz
+            self.Emit("nz = NZ_VALUES[P]")
+        elif self.nz != "nz":
+            self.Emit(f"nz = {self.nz}")
+        self.Emit("continue")
+
+    def Source(self, name: str) -> str:
+        header = [f"def {name}(machineState, budget):",
+                  "    memory = machineState.MEMORY",
+                  "    watchers = machineState.pageWatchers",
+                  "    invalidations = translator.invalidations",
+                  "    A = machineState.A; X = machineState.X; Y = machineState.Y; SP = machineState.SP; P = machineState.flags; nz = machineState.nz",
+                  "    cycles = machineState.cycles",
+                  "    executed = 0",
+                  "    while True:"]
+        return "\n".join(header + self.lines) + "\n"
+
+
+class Translator:
+    """
+    Translates and caches the blocks of one machine, and runs them
+    """
+    def __init__(self, machineState: CPU, handlers: list = instructions.switch_table):
+        self.machineState = machineState
+        self.handlers = handlers #Run anything that is not translated
+        self.blocks = {} #The compiled function for each block, by its start address
+        self.pageBlocks = {} #The start addresses of the blocks translated from each page
+        self.invalidations = 0
+        self.translated = 0
+        self.fallbacks = 0 #Instructions run by handlers, because they could not be translated
+        self.idle = False #Set by a block that is an idle loop when it goes back round
+        self.idleSkipped = 0 #Instructions skipped over, instead of being run by idle loops
+        self.waiting = False #Whether the last Run ended by skipping over an idle loop, so the program is waiting on something outside of the processor
+
+    def Invalidate(self, address: int):
+        """
+        Throws away every block translated from the page of the given address. Called when that page is written to
+        """
+        page = address >> 8
+        for entry in self.pageBlocks.pop(page, ()):
+            self.blocks.pop(entry, None)
+        self.invalidations += 1
+        self.machineState.UnwatchPage(page, self.Invalidate)
+
+    def Translate(self, entry: int):
+        """
+        Translates the block starting at entry, returning its function.
+        Returns None if the first instruction cannot be translated
+        """
+        memory = self.machineState.MEMORY
+        writer = BlockWriter(entry, IsIdleLoop(memory, entry, MAX_BLOCK_LENGTH))
+        pages = set()
+        pc = entry
+        ended = False
+        while writer.count < MAX_BLOCK_LENGTH:
+            opcode = memory[pc]
+            if opcode not in instructions.opcode_table:
+                break
+            mnemonic, mode, cycles = instructions.opcode_table[opcode]
+            if mnemonic in UNTRANSLATED:
+                break
+            operand = mode.Decode(memory, pc)
+            nextPc = (pc + mode.length) & 0xffff
+            pages.update(((pc + offset) & 0xffff) >> 8 for offset in range(mode.length))
+            if mnemonic in BRANCHES or mnemonic in JUMPS:
+                writer.End(mnemonic, mode, operand, nextPc, cycles)
+                ended = True
+                break
+            writer.Instruction(mnemonic, mode, operand, nextPc, cycles)
+            pc = nextPc
+
+        if writer.count == 0:
+            return None
+        if not ended: #Ran out of room, or reached something that is not translated, so carry on from there next time
+            writer.Exit(hex(pc))
+
+        name = f"block_{entry:04x}"
+        namespace = dict(blockGlobals, translator=self)
+        exec(compile(writer.Source(name), f"<6502 block {entry:04x}>", "exec"), namespace)
+        block = namespace[name]
+
+        self.blocks[entry] = block
+        for page in pages:
+            self.pageBlocks.setdefault(page, []).append(entry)
+            self.machineState.WatchPage(page, self.Invalidate)
+        self.translated += 1
+        return block
+
+    def Run(self, cycles: int) -> int:
+        """
+        Runs for at least the given number of cycles (a block is always run to its end), returning how many instructions were run.
+        If the program reaches an idle loop, nothing can change until something outside of the processor does, so the rest of the
+        cycles are skipped over in whole times round the loop, and waiting is set. Nothing here sleeps, that is up to the caller
+        """
+        machineState = self.machineState
+        blocks = self.blocks
+        budget = machineState.cycles + cycles #The cycle count to stop at
+        executed = 0
+        self.waiting = False
+        while machineState.cycles < budget:
+            pc = machineState.PC
+            block = blocks.get(pc)
+            if block is None:
+                block = self.Translate(pc)
+                if block is None:
+                    self.handlers[machineState.MEMORY[pc]](machineState)
+                    self.fallbacks += 1
+                    executed += 1
+                    continue
+            start = machineState.cycles
+            ran = block(machineState, budget)
+            executed += ran
+            if self.idle: #The block has been round its loop once, and every other time round would take just as long
+                self.idle = False
+                if machineState.cycles < budget:
+                    loopCycles = machineState.cycles - start
+                    loops = -(-(budget - machineState.cycles) // loopCycles)
+                    self.idleSkipped += loops * ran
+                    executed += loops * ran
+                    machineState.cycles += loops * loopCycles
+                self.waiting = True
+        return executed
+
+    def Report(self) -> str:
+        return f"JIT: {self.translated} blocks translated, {len(self.blocks)} cached, {self.invalidations} page invalidations, {self.fallbacks} instructions run by the interpreter, {self.idleSkipped} skipped while idle"
+
+
+def Verify(trials: int = 300, cycles: int = 2000) -> bool:
+    """
+    Runs random programs with a Translator and with the handlers in instructions.switch_table, and checks that both leave
+    the machine in the same state, or stop in the same way. Every byte of memory is a legal opcode other than BRK, so that the
+    programs run for as long as they can, and they write all over memory (their own code and the stack included), so that
+    blocks are thrown away while they run. The zero and stack pages are watched to check every write the watchers are told about.
+    A translated block can run past the budget, so the handlers are run up to the cycle count the translator stopped at
+    (and then the instruction that stopped it, if it did not stop at the budget)
+    """
+    opcodes = [opcode for opcode, (mnemonic, mode, cycles) in instructions.opcode_table.items() if mnemonic not in UNTRANSLATED]
+    toOpcodes = bytes(opcodes[byte % len(opcodes)] for byte in range(0x100)) #Turns random bytes into legal opcodes
+
+    def MakeState(trial: int, writes: list) -> CPU:
+        rng = random.Random(trial)
+        machineState = CPU()
+        machineState.MEMORY[:] = rng.randbytes(0x10000).translate(toOpcodes)
+        for page in (0x00, 0x01):
+            machineState.WatchPage(page, lambda address: writes.append((address, machineState.MEMORY[address])))
+        machineState.PC = rng.randrange(0x8000, 0x10000)
+        machineState.A, machineState.X, machineState.Y, machineState.SP = (rng.randrange(0x100) for _ in range(4))
+        machineState.P = rng.randrange(0x100) & ~(BREAK | UNUSED)
+        return machineState
+
+    def Outcome(trial: int, run) -> tuple:
+        writes = []
+        machineState = MakeState(trial, writes)
+        try:
+            run(machineState)
+            stopped = None
+        except instructions.Halt as halt:
+            stopped = str(halt)
+        return (stopped, writes, machineState.PC, machineState.A, machineState.X, machineState.Y, machineState.SP, machineState.P,
+                machineState.cycles, bytes(machineState.MEMORY))
+
+    def Interpret(machineState: CPU, end: int, stopped: bool):
+        switch_table = instructions.switch_table
+        memory = machineState.MEMORY
+        while machineState.cycles < end:
+            switch_table[memory[machineState.PC]](machineState)
+        if stopped:
+            switch_table[memory[machineState.PC]](machineState)
+
+    failures = 0
+    for trial in range(trials):
+        translated = Outcome(trial, lambda machineState: Translator(machineState).Run(cycles))
+        failures += translated != Outcome(trial, lambda machineState: Interpret(machineState, translated[8], translated[0] is not None))
+    print(f"JIT checked on {trials} random programs, {failures} failures")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    Verify()
@@ -0,0 +1,273 @@
+"""
+An interpreter core that keeps the registers in local variables instead of in the CPU object.
+Run is a single generated function that loads A, X, Y, SP, PC, the flags and the cycle count into locals when it is called,
+runs instructions until the cycle count reaches the end it was given, and only then writes them back to the machine.
+Every instruction is written out inline, with the opcode picked by a tree of comparisons, so running one costs no function calls
+and no attribute lookups at all. The registers are also written back before anything outside of the core can look at them:
+when a watched page of memory is written to, and when an opcode is left to its handler (BRK and the illegal opcodes),
+which is also where the processor stops. The handlers are instructions.switch_table unless Run is given a table of its own.
+Run "python localcore.py" to check it against the handlers in instructions.switch_table on random programs
+"""
+import random
+
+import instructions
+from alu import ADD_BINARY, ADD_DECIMAL, SUBTRACT_DECIMAL, ALU_MASK
+from cpu import CPU, NZ_MASK, NZ_FLAGS, NZ_VALUES
+from instructions import (IMP, ACC, IMM, ZP, ZPX, ZPY, ABS, ABSX, ABSY, INDX, INDY, IND, REL, READ, MODIFY,
+                          CARRY, INTERRUPT, DECIMAL, OVERFLOW, BREAK, UNUSED)
+
+FALLBACK = {"BRK"} #Left to the handlers, since they stop the processor
+
+#The condition each branch is taken on, from the locals P and nz
+BRANCH_CONDITIONS = {"BPL": "not nz & 0x180", "BMI": "nz & 0x180", "BVC": f"not P & {OVERFLOW}", "BVS": f"P & {OVERFLOW}",
+                     "BCC": f"not P & {CARRY}", "BCS": f"P & {CARRY}", "BNE": "nz & 0xff", "BEQ": "not nz & 0xff"}
+
+FLAG_BITS = {"C": CARRY, "I": INTERRUPT, "D": DECIMAL, "V": OVERFLOW}
+
+WRITE_BACK = ("machineState.PC = PC; machineState.A = A; machineState.X = X; machineState.Y = Y; machineState.SP = SP; "
+              "machineState.flags = P; machineState.nz = nz; machineState.cycles = cycles")
+LOAD = ("PC = machineState.PC; A = machineState.A; X = machineState.X; Y = machineState.Y; SP = machineState.SP; "
+        "P = machineState.flags; nz = machineState.nz; cycles = machineState.cycles")
+
+OPERAND_BYTE = "memory[(PC + 1) & 0xffff]"
+OPERAND_WORD = "(memory[(PC + 1) & 0xffff] | memory[(PC + 2) & 0xffff] << 8)"
+
+#Everything the generated function uses, apart from its own locals
+coreGlobals = {"ADD_BINARY": ADD_BINARY, "ADD_DECIMAL": ADD_DECIMAL, "SUBTRACT_DECIMAL": SUBTRACT_DECIMAL, "ALU_MASK": ALU_MASK,
+               "NZ_MASK": NZ_MASK, "NZ_FLAGS": NZ_FLAGS, "NZ_VALUES": NZ_VALUES, "handlers": instructions.switch_table}
+
+
+def Address(mode, read: bool) -> list:
+    """
+    Returns the lines that put the effective address of an instruction into the local a, from the program counter of its opcode.
+    Indexed reads also count the extra cycle for crossing a page
+    """
+    if mode is ZP:
+        return [f"a = {OPERAND_BYTE}"]
+    if mode is ZPX or mode is ZPY:
+        return [f"a = ({OPERAND_BYTE} + {mode.name[-1]}) & 0xff"]
+    if mode is ABS:
+        return [f"a = {OPERAND_WORD}"]
+    if mode is ABSX or mode is ABSY:
+        register = mode.name[-1]
+        lines = [f"b = {OPERAND_WORD}"]
+        if read:
+            lines.append(f"if (b & 0xff) + {register} > 0xff: cycles += 1")
+        return lines + [f"a = (b + {register}) & 0xffff"]
+    if mode is INDX:
+        return [f"p = ({OPERAND_BYTE} + X) & 0xff",
+                "a = memory[p] | memory[(p + 1) & 0xff] << 8"]
+    if mode is INDY:
+        lines = [f"p = {OPERAND_BYTE}", "b = memory[p]"]
+        if read:
+            lines.append("if b + Y > 0xff: cycles += 1")
+        return lines + ["a = ((b | memory[(p + 1) & 0xff] << 8) + Y) & 0xffff"]
+    if mode is IND: #The high byte of the pointer is never carried into
+        return [f"p = {OPERAND_WORD}",
+                "a = memory[p] | memory[(p & 0xff00) | ((p + 1) & 0xff)] << 8"]
+    raise ValueError(f"{mode.name} has no address")
+
+def Store(address: str, value: str) -> list:
+    """
+    Returns the lines that write to memory, telling the watchers of the page about it with the registers written back
+    """
+    return [f"memory[{address}] = {value}",
+            f"if watchers[{address} >> 8]:",
+            f"    {WRITE_BACK}",
+            f"    for watcher in watchers[{address} >> 8]: watcher({address})"]
+
+def Push(value: str) -> list:
+    return Store("0x100 + SP", value) + ["SP = (SP - 1) & 0xff"]
+
+def Pull(name: str) -> list:
+    return ["SP = (SP + 1) & 0xff", f"{name} = memory[0x100 + SP]"]
+
+def Operation(mnemonic: str, mode) -> list:
+    """
+    Returns the lines that carry out an operation, once its operand has been read (into v for READ and MODIFY operations,
+    or the effective address into a) and the program counter moved past it
+    """
+    if mnemonic in ("LDA", "LDX", "LDY"):
+        return [f"{mnemonic[2]} = nz = v"]
+    if mnemonic in ("STA", "STX", "STY"):
+        return Store("a", mnemonic[2])
+    if mnemonic in ("AND", "ORA", "EOR"):
+        return [f"A = nz = A {({'AND': '&', 'ORA': '|', 'EOR': '^'})[mnemonic]} v"]
+    if mnemonic == "BIT":
+        return [f"P = (P & {~OVERFLOW & 0xff}) | (v & {OVERFLOW})",
+                "nz = (v & 0x80) << 1 | (A & v)"]
+    if mnemonic in ("ADC", "SBC"):
+        decimal = "ADD_DECIMAL" if mnemonic == "ADC" else "SUBTRACT_DECIMAL"
+        binary = "v" if mnemonic == "ADC" else "(v ^ 0xff)"
+        return [f"if P & {DECIMAL}:",
+                f"    e = {decimal}[(P & 1) << 16 | A << 8 | v]",
+                "    nz = NZ_VALUES[e >> 8]",
+                "else:",
+                f"    e = ADD_BINARY[(P & 1) << 16 | A << 8 | {binary}]",
+                "    nz = e & 0xff",
+                "A = e & 0xff",
+                "P = (P & ALU_MASK) | (e >> 8)"]
+    if mnemonic in ("CMP", "CPX", "CPY"):
+        register = "A" if mnemonic == "CMP" else mnemonic[2]
+        return [f"P = (P & {~CARRY & 0xff}) | ({register} >= v)",
+                f"nz = ({register} - v) & 0xff"]
+    if mnemonic in ("INC", "DEC"):
+        return [f"nz = (v {'+' if mnemonic == 'INC' else '-'} 1) & 0xff"] + Store("a", "nz")
+    if mnemonic in ("INX", "INY", "DEX", "DEY"):
+        register = mnemonic[2]
+        return [f"{register} = nz = ({register} {'+' if mnemonic[0] == 'I' else '-'} 1) & 0xff"]
+    if mnemonic in ("ASL", "LSR", "ROL", "ROR"):
+        result = {"ASL": "(v << 1) & 0xff", "LSR": "v >> 1", "ROL": "((v << 1) | (P & 1)) & 0xff", "ROR": "(v >> 1) | ((P & 1) << 7)"}[mnemonic]
+        carry = "v >> 7" if mnemonic in ("ASL", "ROL") else "v & 1"
+        lines = [f"nz = {result}", f"P = (P & {~CARRY & 0xff}) | ({carry})"]
+        return lines + (["A = nz"] if mode is ACC else Store("a", "nz"))
+    if mnemonic in ("TAX", "TAY", "TXA", "TYA", "TSX"):
+        source = {"TAX": "A", "TAY": "A", "TXA": "X", "TYA": "Y", "TSX": "SP"}[mnemonic]
+        return [f"{mnemonic[2]} = nz = {source}"]
+    if mnemonic == "TXS":
+        return ["SP = X"]
+    if mnemonic == "PHA":
+        return Push("A")
+    if mnemonic == "PHP":
+        return Push(f"(P & NZ_MASK) | NZ_FLAGS[nz] | {BREAK | UNUSED}")
+    if mnemonic == "PLA":
+        return Pull("A") + ["nz = A"]
+    if mnemonic == "PLP":
+        return Pull("P") + [f"P = P & {~(BREAK | UNUSED) & 0xff}", "nz = NZ_VALUES[P]"]
+    if mnemonic in ("CLC", "SEC", "CLI", "SEI", "CLV", "CLD", "SED"):
+        bit = FLAG_BITS[mnemonic[2]]
+        return [f"P = P & {~bit & 0xff}" if mnemonic[0] == "C" else f"P = P | {bit}"]
+    if mnemonic == "JMP":
+        return ["PC = a"]
+    if mnemonic == "JSR":
+        return ["r = (PC - 1) & 0xffff"] + Push("r >> 8") + Push("r & 0xff") + ["PC = a"]
+    if mnemonic == "RTS":
+        return Pull("l") + Pull("h") + ["PC = ((h << 8 | l) + 1) & 0xffff"]
+    if mnemonic == "RTI":
+        return Pull("P") + [f"P = P & {~(BREAK | UNUSED) & 0xff}", "nz = NZ_VALUES[P]"] + Pull("l") + Pull("h") + ["PC = h << 8 | l"]
+    if mnemonic in BRANCH_CONDITIONS:
+        return [f"if {BRANCH_CONDITIONS[mnemonic]}:",
+                "    a = (PC + o - ((o & 0x80) << 1)) & 0xffff",
+                "    cycles += 2 if (a ^ PC) & 0xff00 else 1",
+                "    PC = a"]
+    if mnemonic == "NOP":
+        return []
+    raise ValueError(f"{mnemonic} cannot be written inline")
+
+def Fallback() -> list:
+    """
+    Returns the lines that run an opcode with its handler, with the registers written back first
+    """
+    return [WRITE_BACK, "handlers[opcode](machineState)", LOAD]
+
+def Inline(opcode: int) -> bool:
+    return opcode in instructions.opcode_table and instructions.opcode_table[opcode][0] not in FALLBACK
+
+def Instruction(opcode: int) -> list:
+    """
+    Returns the lines that run one opcode, starting with the program counter at the opcode
+    """
+    if not Inline(opcode):
+        return Fallback()
+    mnemonic, mode, cycles = instructions.opcode_table[opcode]
+    operation, kind = instructions.operations[mnemonic]
+    if mode is REL:
+        lines = [f"o = {OPERAND_BYTE}"]
+    elif mode is IMM:
+        lines = [f"v = {OPERAND_BYTE}"]
+    elif mode is ACC:
+        lines = ["v = A"]
+    elif mode is IMP:
+        lines = []
+    elif kind == READ or kind == MODIFY:
+        lines = Address(mode, kind == READ) + ["v = memory[a]"]
+    else:
+        lines = Address(mode, False)
+    if mnemonic != "JMP": #A jump sets the program counter itself
+        lines.append(f"PC = (PC + {mode.length}) & 0xffff")
+    lines.append(f"cycles += {cycles}")
+    return lines + Operation(mnemonic, mode)
+
+def Dispatch(low: int, high: int) -> list:
+    """
+    Returns a tree of comparisons on the local opcode, that runs the right instruction for every opcode from low up to high
+    """
+    inline = [opcode for opcode in range(low, high) if Inline(opcode)]
+    if not inline:
+        return Fallback()
+    if high - low == 1:
+        return Instruction(low)
+    middle = max(low + 1, inline[len(inline) // 2]) #Splits the opcodes written inline in half, rather than the whole range
+    return ([f"if opcode < {hex(middle)}:"] + ["    " + line for line in Dispatch(low, middle)] +
+            ["else:"] + ["    " + line for line in Dispatch(middle, high)])
+
+def Source() -> str:
+    header = ["def Run(machineState, end, handlers=handlers):",
+              "    memory = machineState.MEMORY",
+              "    watchers = machineState.pageWatchers",
+              f"    {LOAD}",
+              "    executed = 0",
+              "    while cycles < end:",
+              "        opcode = memory[PC]",
+              "        executed += 1"]
+    footer = [f"    {WRITE_BACK}",
+              "    return executed"]
+    return "\n".join(header + ["        " + line for line in Dispatch(0x00, 0x100)] + footer) + "\n"
+
+namespace = dict(coreGlobals)
+exec(compile(Source(), "<6502 local core>", "exec"), namespace)
+Run = namespace["Run"]
+Run.__doc__ = """
+    Runs instructions until the cycle count of machineState reaches end, returning how many were run.
+    BRK and the illegal opcodes are run by handlers, instructions.switch_table unless a table is given.
+    Like the other engines it always finishes the instruction it is in, so it can run a few cycles past end
+    """
+
+
+def Verify(trials: int = 1000, cycles: int = 2000) -> bool:
+    """
+    Runs random programs with Run and with the handlers in instructions.switch_table, and checks that both leave
+    the machine in the same state, or stop in the same way. Every byte of memory is a legal opcode, so that the programs
+    run for as long as they can, and the zero and stack pages are watched to check the registers written back for watchers
+    """
+    opcodes = [opcode for opcode, (mnemonic, mode, cycles) in instructions.opcode_table.items() if mnemonic not in FALLBACK]
+    toOpcodes = bytes(opcodes[byte % len(opcodes)] for byte in range(0x100)) #Turns random bytes into legal opcodes
+
+    def MakeState(trial: int, writes: list) -> CPU:
+        rng = random.Random(trial)
+        machineState = CPU()
+        machineState.MEMORY[:] = rng.randbytes(0x10000).translate(toOpcodes)
+        for page in (0x00, 0x01):
+            machineState.WatchPage(page, lambda address: writes.append((address, machineState.PC, machineState.A, machineState.X,
+                                                                        machineState.Y, machineState.SP, machineState.P, machineState.cycles)))
+        machineState.PC = rng.randrange(0x8000, 0x10000)
+        machineState.A, machineState.X, machineState.Y, machineState.SP = (rng.randrange(0x100) for _ in range(4))
+        machineState.P = rng.randrange(0x100) & ~(BREAK | UNUSED)
+        return machineState
+
+    def Outcome(trial: int, run) -> tuple:
+        writes = []
+        machineState = MakeState(trial, writes)
+        try:
+            run(machineState)
+            stopped = None
+        except instructions.Halt as halt:
+            stopped = str(halt)
+        return (stopped, writes, machineState.PC, machineState.A, machineState.X, machineState.Y, machineState.SP, machineState.P,
+                machineState.cycles, bytes(machineState.MEMORY))
+
+    def Interpret(machineState: CPU):
+        switch_table = instructions.switch_table
+        memory = machineState.MEMORY
+        while machineState.cycles < cycles:
+            switch_table[memory[machineState.PC]](machineState)
+
+    failures = 0
+    for trial in range(trials):
+        failures += Outcome(trial, lambda machineState: Run(machineState, cycles)) != Outcome(trial, Interpret)
+    print(f"Local core checked on {trials} random programs, {failures} failures")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    Verify()
@@ -0,0 +1,220 @@
+"""
+A whole 6502 machine that can be embedded in another program: it owns the processor state, the memory and anything attached
+to it (the devices), and runs code in batches for as many cycles as it is asked to.
+Nothing here prints, reads input or exits the program. Running stops with a reason, and it is up to the caller what to do about it.
+Devices (such as a display) keep time by scheduling events, callbacks that are run once the machine reaches a given cycle,
+so a batch always stops at the next event. That is also how far an idle loop is skipped over, with the PREDECODE and JIT engines.
+Skipping an idle loop never sleeps: it sets waiting, and it is up to the caller whether the host sleeps
+"""
+import heapq
+
+import instructions
+import jit
+import localcore
+import predecode
+import ringtrace
+import threaded
+from cpu import CPU, ReadWord
+from instructions import Halt, STOP_BRK, STOP_ILLEGAL_OPCODE
+
+NMI_VECTOR = 0xfffa #Position of the non-maskable interrupt vector in memory
+RESET_VECTOR = 0xfffc #Position of the reset vector in memory, which is where execution will start when the processor is powered on
+IRQ_VECTOR = 0xfffe #Position of the IRQ vector in memory
+ROM_ADDRESS = 0x8000 #Position the rom is loaded into, see the memory map in the README
+
+#Why running stopped, along with STOP_BRK and STOP_ILLEGAL_OPCODE from instructions.py
+STOP_BUDGET = "budget exhausted"
+STOP_BREAKPOINT = "breakpoint"
+STOP_CONDITION = "condition met"
+
+#The ways of running code
+INTERPRETER = "interpreter" #instructions.switch_table (or a traced copy of it), one instruction at a time
+PREDECODE = "predecode" #predecode.PredecodeCache, only decoding each instruction once
+JIT = "jit" #jit.Translator, which runs translated blocks of code
+LOCALS = "locals" #localcore.Run, an interpreter with the registers kept in local variables for a whole batch
+THREADED = "threaded" #threaded.ThreadedCode, which runs blocks of closures with their operands already bound in
+
+
+class Machine:
+    """
+    The processor, its memory and its devices. engine picks the way code is run (INTERPRETER, PREDECODE, JIT, LOCALS or THREADED).
+    If trace is given, every instruction is run by a traced copy of the handlers, which calls trace(record) with an
+    instructions.TraceRecord after each one. That is decided here, once, so a machine that is not traced has no tracing code
+    in the way at all. If history is given, the last history instructions are kept in a ringtrace.RingTrace, which is dumped
+    into the stop message when the processor crashes. recorders are any other objects with a MakeTable(handlers) method
+    that wraps the handlers to record every instruction, such as a tracefile.TraceWriter.
+    A traced machine, or one keeping a history or with recorders, always runs one instruction at a time, whatever the engine.
+    If illegalHandler is given, this machine runs it for every opcode that is not implemented, instead of instructions.opcode_illegal
+    """
+    def __init__(self, engine: str = PREDECODE, trace=None, history: int = 0, recorders: tuple = (), illegalHandler=None):
+        if engine not in (INTERPRETER, PREDECODE, JIT, LOCALS, THREADED):
+            raise ValueError(f"Unknown engine {engine}")
+        if trace is not None or history or recorders:
+            engine = INTERPRETER
+        self.state = CPU()
+        self.memory = self.state.MEMORY
+        self.engine = engine
+        self.handlers = instructions.switch_table if trace is None else instructions.MakeTracedTable(trace)
+        if illegalHandler is not None:
+            self.handlers = instructions.WithIllegalOpcodeHandler(self.handlers, illegalHandler)
+        self.history = None
+        if history:
+            self.history = self.state.history = ringtrace.RingTrace(history)
+            self.handlers = self.history.MakeTable(self.handlers)
+        for recorder in recorders:
+            self.handlers = recorder.MakeTable(self.handlers)
+        self.cache = predecode.PredecodeCache(self.state, handlers=self.handlers) if engine == PREDECODE else None
+        self.translator = jit.Translator(self.state, self.handlers) if engine == JIT else None
+        self.threaded = threaded.ThreadedCode(self.state, self.handlers) if engine == THREADED else None
+        self.devices = [] #Anything attached to the machine, such as a display
+        self.events = [] #A heap of (cycle, order, callback) for the events scheduled to happen
+        self.eventCount = 0 #Keeps events at the same cycle in the order they were scheduled
+        self.breakpoints = set() #Addresses that running stops at, before the instruction there is run
+        self.stopReason = None
+        self.stopMessage = "" #A description of the state of the processor, when an instruction stopped it
+        self.waiting = False #Whether the last Run ended in an idle loop, with the program waiting on something outside of the processor
+
+    def LoadRom(self, rom: bytes, address: int = ROM_ADDRESS):
+        self.state.Load(rom, address)
+
+    def AddDevice(self, device):
+        self.devices.append(device)
+
+    def Schedule(self, delay: int, callback):
+        """
+        Makes callback(machine) get called once the machine has run for delay more cycles
+        """
+        heapq.heappush(self.events, (self.state.cycles + delay, self.eventCount, callback))
+        self.eventCount += 1
+
+    def Reset(self):
+        """
+        Puts the registers back to how they are when the processor is powered on, and starts from the reset vector.
+        Memory is left as it is
+        """
+        state = self.state
+        state.A = state.X = state.Y = 0x00
+        state.SP = 0xFF
+        state.P = 0b00000000
+        state.PC = ReadWord(self.memory, RESET_VECTOR)
+        self.stopReason = None
+        self.stopMessage = ""
+
+    def Stopped(self, reason: str, message: str = "") -> str:
+        self.stopReason = reason
+        self.stopMessage = message
+        return reason
+
+    def RunEvents(self):
+        """
+        Runs every event that is due
+        """
+        events = self.events
+        while events and events[0][0] <= self.state.cycles:
+            cycle, order, callback = heapq.heappop(events)
+            callback(self)
+
+    def Execute(self):
+        """
+        Runs the instruction at the program counter
+        """
+        if self.cache is not None:
+            self.cache.Step(self.state)
+        else:
+            self.handlers[self.memory[self.state.PC]](self.state)
+
+    def Step(self) -> str:
+        """
+        Runs one instruction (and any events that are due after it), returning the reason it stopped, or None if it did not
+        """
+        try:
+            self.Execute()
+        except Halt as halt:
+            return self.Stopped(halt.reason, str(halt))
+        self.RunEvents()
+        return None
+
+    def RunSlice(self, end: int, resuming: bool) -> str:
+        """
+        Runs until the cycle count reaches end, returning STOP_BREAKPOINT if it stopped at a breakpoint first, otherwise None.
+        When resuming, the instruction at the program counter is run even if it has a breakpoint, so that running again
+        carries on from the breakpoint it stopped at
+        """
+        state = self.state
+        if self.breakpoints: #Checked before every instruction, so translated blocks cannot be used
+            breakpoints = self.breakpoints
+            while state.cycles < end:
+                if state.PC in breakpoints and not resuming:
+                    return STOP_BREAKPOINT
+                resuming = False
+                self.Execute()
+        elif self.translator is not None:
+            self.translator.Run(end - state.cycles)
+            self.waiting = self.translator.waiting
+        elif self.engine == LOCALS:
+            localcore.Run(state, end, self.handlers)
+        elif self.threaded is not None:
+            self.threaded.Run(end)
+        elif self.cache is not None:
+            self.cache.Run(end)
+            self.waiting = self.cache.waiting
+        else:
+            handlers = self.handlers
+            memory = self.memory
+            while state.cycles < end:
+                handlers[memory[state.PC]](state)
+        return None
+
+    def Run(self, maxCycles: int) -> str:
+        """
+        Runs for (at least) maxCycles cycles, returning why it stopped: STOP_BUDGET once the cycles have run,
+        STOP_BREAKPOINT, or the reason an instruction stopped the processor (STOP_BRK or STOP_ILLEGAL_OPCODE)
+        """
+        state = self.state
+        target = state.cycles + maxCycles
+        resuming = True
+        self.waiting = False
+        try:
+            while True:
+                self.RunEvents()
+                if state.cycles >= target:
+                    return self.Stopped(STOP_BUDGET)
+                end = min(target, self.events[0][0]) if self.events else target
+                if self.RunSlice(end, resuming) == STOP_BREAKPOINT:
+                    return self.Stopped(STOP_BREAKPOINT)
+                resuming = False
+        except Halt as halt:
+            return self.Stopped(halt.reason, str(halt))
+
+    def RunUntil(self, predicate, maxCycles: int = None) -> str:
+        """
+        Runs one instruction at a time until predicate(machine) is true, returning STOP_CONDITION,
+        or until it stops for any of the reasons Run can stop for (STOP_BUDGET only if maxCycles is given)
+        """
+        state = self.state
+        target = None if maxCycles is None else state.cycles + maxCycles
+        breakpoints = self.breakpoints
+        first = True
+        while not predicate(self):
+            if target is not None and state.cycles >= target:
+                return self.Stopped(STOP_BUDGET)
+            if state.PC in breakpoints and not first:
+                return self.Stopped(STOP_BREAKPOINT)
+            first = False
+            reason = self.Step()
+            if reason is not None:
+                return reason
+        return self.Stopped(STOP_CONDITION)
+
+    def Report(self) -> str:
+        if self.cache is not None:
+            report = self.cache.Report()
+        elif self.translator is not None:
+            report = self.translator.Report()
+        elif self.engine == LOCALS:
+            report = "Local core"
+        elif self.threaded is not None:
+            report = self.threaded.Report()
+        else:
+            report = "Interpreter"
+        return f"{report}. Ran for {self.state.cycles} cycles"
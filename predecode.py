@@ -0,0 +1,364 @@
+"""
+A cache of decoded instructions, so that code which runs over and over (like a loop) is only decoded once.
+For each address that an instruction was run from, the cache holds (Execute, operand, length, cycles, fused), where the operand has
+already been read from the bytes after the opcode. The cache is split up by page, and a page of it is thrown away as soon as the
+processor (or a rom load) writes to that page of memory, so that self modifying code still runs correctly.
+When running many instructions with Run, common sequences of instructions (see SUPERINSTRUCTIONS) are fused into a single
+superinstruction, which is run as one entry with exactly the same effect as running each of its instructions in turn.
+Step always runs a single instruction, so that breakpoints and single stepping still see every instruction.
+Run also marks the start of every idle loop (see idle.py) in place of a superinstruction. When it reaches one, it goes round the loop
+once, times one more time round, and skips the rest of the cycles in whole times round the loop, the same as the JIT does.
+Run "python predecode.py rom.bin" to see which superinstructions a rom uses, and how often
+"""
+import argparse
+from collections import namedtuple
+
+import instructions
+from alu import ADD_BINARY, ADD_DECIMAL, ALU_MASK
+from cpu import CPU, PAGE_COUNT, NZ_VALUES
+from idle import IdleLoopLength, EndsLoop, MAX_LOOP_LENGTH
+from instructions import IMP, IMM, ZP, REL, CARRY, DECIMAL, WRITE, MODIFY, JUMP, Branch, Store
+
+
+"""
+Superinstructions.
+A pattern is a tuple of (mnemonic, mode, operand) for each instruction in the sequence, where an operand of None matches any operand.
+Fuse is given the decoded operands of the instructions and returns (Execute, operand) for the whole sequence, which is run after the
+program counter has been moved past the last instruction and the base cycles of all of them have been counted, like any other entry.
+A pattern with no Fuse function runs the Execute function of each instruction in turn, so any sequence can be added without writing
+a handler for it, as long as only its last instruction writes to memory or jumps
+"""
+Superinstruction = namedtuple("Superinstruction", ["name", "pattern", "Fuse"])
+
+IDLE_LOOP = -1 #Marks the entry at the start of an idle loop, in place of the index of a superinstruction
+
+def FuseCountLoop(register: str):
+    """
+    DEX or DEY followed by BNE (or counting up with INX or INY): step the register, and go round again until it reaches 0
+    """
+    step = 1 if register[0] == "I" else -1
+    register = register[1]
+
+    def Fuse(operands: list) -> tuple:
+        if register == "X":
+            def Execute(machineState: CPU, target: int):
+                machineState.X = machineState.nz = value = (machineState.X + step) & 0xff
+                if value:
+                    Branch(machineState, target)
+        else:
+            def Execute(machineState: CPU, target: int):
+                machineState.Y = machineState.nz = value = (machineState.Y + step) & 0xff
+                if value:
+                    Branch(machineState, target)
+        return Execute, operands[-1]
+    return Fuse
+
+def FuseCompareLoop(register: str):
+    """
+    INX, CPX # and BNE (or the same with Y, or decrementing): step the register, and go round again until it reaches the limit
+    """
+    step = 1 if register[0] == "I" else -1
+    register = register[1]
+
+    def Fuse(operands: list) -> tuple:
+        if register == "X":
+            def Execute(machineState: CPU, operand: tuple):
+                limit, target = operand
+                machineState.X = value = (machineState.X + step) & 0xff
+                machineState.flags = (machineState.flags & ~CARRY) | (value >= limit)
+                machineState.nz = difference = (value - limit) & 0xff
+                if difference:
+                    Branch(machineState, target)
+        else:
+            def Execute(machineState: CPU, operand: tuple):
+                limit, target = operand
+                machineState.Y = value = (machineState.Y + step) & 0xff
+                machineState.flags = (machineState.flags & ~CARRY) | (value >= limit)
+                machineState.nz = difference = (value - limit) & 0xff
+                if difference:
+                    Branch(machineState, target)
+        return Execute, (operands[1], operands[2])
+    return Fuse
+
+def FuseAddToZeroPage(operands: list) -> tuple:
+    """
+    LDA zp, CLC, ADC # and STA zp: add a constant to a byte in the zero page (or copy the sum to another)
+    """
+    def Execute(machineState: CPU, operand: tuple):
+        source, value, destination = operand
+        flags = machineState.flags & ~CARRY
+        if flags & DECIMAL:
+            entry = ADD_DECIMAL[machineState.MEMORY[source] << 8 | value]
+            machineState.nz = NZ_VALUES[entry >> 8]
+        else:
+            entry = ADD_BINARY[machineState.MEMORY[source] << 8 | value]
+            machineState.nz = entry & 0xff
+        machineState.A = result = entry & 0xff
+        machineState.flags = (flags & ALU_MASK) | (entry >> 8)
+        Store(machineState, destination, result)
+    return Execute, (operands[0], operands[2], operands[3])
+
+SUPERINSTRUCTIONS = (
+    Superinstruction("DEY; CPY #$00; BNE", (("DEY", IMP, None), ("CPY", IMM, 0x00), ("BNE", REL, None)), FuseCompareLoop("DY")),
+    Superinstruction("INX; CPX #; BNE", (("INX", IMP, None), ("CPX", IMM, None), ("BNE", REL, None)), FuseCompareLoop("IX")),
+    Superinstruction("INY; CPY #; BNE", (("INY", IMP, None), ("CPY", IMM, None), ("BNE", REL, None)), FuseCompareLoop("IY")),
+    Superinstruction("DEX; BNE", (("DEX", IMP, None), ("BNE", REL, None)), FuseCountLoop("DX")),
+    Superinstruction("DEY; BNE", (("DEY", IMP, None), ("BNE", REL, None)), FuseCountLoop("DY")),
+    Superinstruction("INX; BNE", (("INX", IMP, None), ("BNE", REL, None)), FuseCountLoop("IX")),
+    Superinstruction("INY; BNE", (("INY", IMP, None), ("BNE", REL, None)), FuseCountLoop("IY")),
+    Superinstruction("LDA zp; CLC; ADC #; STA zp", (("LDA", ZP, None), ("CLC", IMP, None), ("ADC", IMM, None), ("STA", ZP, None)),
+                     FuseAddToZeroPage),
+)
+
+def CheckPattern(pattern: tuple):
+    """
+    Raises a ValueError if a pattern cannot be run as one entry: only the last instruction can write to memory or jump,
+    since a write could change the code of the rest of the sequence, and a jump would leave it
+    """
+    for mnemonic, mode, operand in pattern[:-1]:
+        operation, kind = instructions.operations[mnemonic]
+        if kind in (WRITE, JUMP) or (kind == MODIFY and mode.Address is not None) or mnemonic in ("PHA", "PHP", "RTS", "RTI", "BRK"):
+            raise ValueError(f"{mnemonic} can only be the last instruction of a superinstruction")
+
+def Chain(entries: list) -> tuple:
+    """
+    Returns (Execute, operand) for a sequence of decoded entries with no handler of its own, which runs each of them in turn
+    """
+    parts = []
+    length = 0 #Where each instruction ends, from the start of the sequence
+    for PartExecute, partOperand, partLength, cycles, fused in entries:
+        length += partLength
+        parts.append((PartExecute, partOperand, length))
+
+    def Execute(machineState: CPU, operand):
+        start = (machineState.PC - length) & 0xffff
+        for PartExecute, partOperand, end in parts:
+            machineState.PC = (start + end) & 0xffff #Each instruction sees the program counter it would have on its own
+            PartExecute(machineState, partOperand)
+    return Execute, None
+
+
+class PredecodeCache:
+    def __init__(self, machineState: CPU, superinstructions: tuple = SUPERINSTRUCTIONS, handlers: list = instructions.switch_table):
+        for superinstruction in superinstructions:
+            CheckPattern(superinstruction.pattern)
+        self.machineState = machineState
+        self.handlers = handlers #Run the opcodes that are not decoded, which is how the illegal opcode handler is reached
+        self.superinstructions = superinstructions
+        self.pages = [None] * PAGE_COUNT #For each page, None if nothing is cached, otherwise a list of 256 entries
+        self.fusedPages = [None] * PAGE_COUNT #The same, with a superinstruction in place of the entry wherever one starts
+        self.fusedCounts = [0] * len(superinstructions) #How many times each superinstruction has run
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.idleSkipped = 0 #Instructions skipped over, instead of being run by idle loops
+        self.waiting = False #Whether the last Run ended by skipping over an idle loop, so the program is waiting on something outside of the processor
+
+    def Invalidate(self, address: int):
+        """
+        Throws away every cached instruction in the page of the given address. Called when that page is written to
+        """
+        page = address >> 8
+        if self.pages[page] is not None:
+            self.pages[page] = None
+            self.fusedPages[page] = None
+            self.invalidations += 1
+        self.machineState.UnwatchPage(page, self.Invalidate)
+
+    def DecodeOne(self, pc: int):
+        memory = self.machineState.MEMORY
+        decoded = instructions.decode_table[memory[pc]]
+        if decoded is None:
+            return None
+        Execute, Decode, length, cycles = decoded
+        return (Execute, Decode(memory, pc), length, cycles, None)
+
+    def Fuse(self, pc: int, entry: tuple):
+        """
+        Returns the superinstruction entry for the first pattern that matches the code at pc, or None if none of them do.
+        The whole sequence has to be in one page, so that writing to that page throws it away
+        """
+        memory = self.machineState.MEMORY
+        for index, (name, pattern, Fuse) in enumerate(self.superinstructions):
+            entries = []
+            address = pc
+            for mnemonic, mode, operand in pattern:
+                if address >> 8 != pc >> 8:
+                    break
+                opcode = memory[address]
+                if opcode not in instructions.opcode_table or instructions.opcode_table[opcode][:2] != (mnemonic, mode):
+                    break
+                decoded = entry if address == pc else self.DecodeOne(address)
+                if operand is not None and decoded[1] != operand:
+                    break
+                entries.append(decoded)
+                address += decoded[2]
+            else:
+                if (address - 1) >> 8 != pc >> 8:
+                    continue
+                Execute, operand = Fuse([decoded[1] for decoded in entries]) if Fuse is not None else Chain(entries)
+                return (Execute, operand, address - pc, sum(decoded[3] for decoded in entries), index)
+        return None
+
+    def Decode(self, pc: int, fused: bool = False):
+        """
+        Decodes the instruction at pc and caches it, returning the new entry, or the superinstruction starting there if fused.
+        Returns None for illegal opcodes, and instructions that cross into the next page are decoded but not cached,
+        since a write to the second page would not throw them away
+        """
+        entry = self.DecodeOne(pc)
+        if entry is None:
+            return None
+
+        if (pc & 0xff) + entry[2] <= 0x100:
+            page = pc >> 8
+            if self.pages[page] is None:
+                self.pages[page] = [None] * 0x100
+                self.fusedPages[page] = [None] * 0x100
+                self.machineState.WatchPage(page, self.Invalidate)
+            self.pages[page][pc & 0xff] = entry
+            loopLength = IdleLoopLength(self.machineState.MEMORY, pc)
+            if loopLength and (pc & 0xff) + loopLength <= 0x100: #Only when the whole loop is in this page, so that writing to it throws the mark away
+                self.fusedPages[page][pc & 0xff] = entry[:4] + (IDLE_LOOP,)
+            else:
+                self.fusedPages[page][pc & 0xff] = self.Fuse(pc, entry) or entry
+            if fused:
+                return self.fusedPages[page][pc & 0xff]
+        return entry
+
+    def Step(self, machineState: CPU):
+        """
+        Runs one instruction, using the cached decode of it if there is one
+        """
+        pc = machineState.PC
+        page = self.pages[pc >> 8]
+        entry = None if page is None else page[pc & 0xff]
+        if entry is None:
+            self.misses += 1
+            entry = self.Decode(pc)
+            if entry is None:
+                self.handlers[machineState.MEMORY[pc]](machineState) #Let the illegal opcode handler deal with it
+                return
+        else:
+            self.hits += 1
+
+        Execute, operand, length, cycles, fused = entry
+        machineState.PC = (pc + length) & 0xffff
+        machineState.cycles += cycles
+        Execute(machineState, operand)
+
+    def Run(self, end: int) -> int:
+        """
+        Runs until the cycle count reaches end, running superinstructions wherever they match, and returns how many
+        instructions were run (counting each instruction of a superinstruction, and the ones skipped in idle loops).
+        If the program reaches an idle loop, the rest of the cycles are skipped over and waiting is set. Nothing here sleeps
+        """
+        machineState = self.machineState
+        fusedPages = self.fusedPages
+        fusedCounts = self.fusedCounts
+        sizes = [len(superinstruction.pattern) - 1 for superinstruction in self.superinstructions]
+        executed = 0
+        self.waiting = False
+        while machineState.cycles < end:
+            pc = machineState.PC
+            page = fusedPages[pc >> 8]
+            entry = None if page is None else page[pc & 0xff]
+            if entry is None:
+                self.misses += 1
+                entry = self.Decode(pc, True)
+                if entry is None:
+                    self.handlers[machineState.MEMORY[pc]](machineState)
+                    executed += 1
+                    continue
+            else:
+                self.hits += 1
+
+            Execute, operand, length, cycles, fused = entry
+            machineState.PC = (pc + length) & 0xffff
+            machineState.cycles += cycles
+            Execute(machineState, operand)
+            executed += 1
+            if fused is not None:
+                if fused == IDLE_LOOP:
+                    executed += self.SkipIdle(pc, end)
+                    continue
+                fusedCounts[fused] += 1
+                executed += sizes[fused]
+        return executed
+
+    def StepLoop(self) -> int:
+        """
+        Steps through an idle loop until the instruction that goes back round it (or does not) has run, returning how many instructions ran
+        """
+        machineState = self.machineState
+        for count in range(1, MAX_LOOP_LENGTH + 1):
+            ending = EndsLoop(machineState.MEMORY, machineState.PC)
+            self.Step(machineState)
+            if ending:
+                break
+        return count
+
+    def SkipIdle(self, entry: int, end: int) -> int:
+        """
+        Called once the first instruction of the idle loop at entry has run. Finishes that time round the loop, goes round once more
+        to time it, and then skips the rest of the cycles up to end in whole times round, returning how many instructions that was
+        """
+        machineState = self.machineState
+        executed = 0
+        if not EndsLoop(machineState.MEMORY, entry): #A loop of more than one instruction, which is not round yet
+            executed += self.StepLoop()
+        if machineState.PC != entry or machineState.cycles >= end:
+            return executed
+
+        start = machineState.cycles
+        count = self.StepLoop()
+        executed += count
+        if machineState.PC != entry: #Left the loop after all
+            return executed
+        if machineState.cycles < end: #Every other time round would leave everything exactly as it is, apart from the cycle count
+            loopCycles = machineState.cycles - start
+            loops = -(-(end - machineState.cycles) // loopCycles)
+            machineState.cycles += loops * loopCycles
+            self.idleSkipped += loops * count
+            executed += loops * count
+        self.waiting = True
+        return executed
+
+    def HitRate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def FusedReport(self) -> str:
+        """
+        Lists each superinstruction that has run, with how many times it ran
+        """
+        fired = [(count, superinstruction.name) for superinstruction, count in zip(self.superinstructions, self.fusedCounts) if count]
+        if not fired:
+            return "no superinstructions run"
+        return ", ".join(f"{name}: {count:,}" for count, name in sorted(fired, reverse=True))
+
+    def Report(self) -> str:
+        return (f"Predecode cache: {self.hits} hits, {self.misses} misses ({self.HitRate():.2%} hit rate), {self.invalidations} page invalidations, "
+                f"{self.idleSkipped} skipped while idle, {self.FusedReport()}")
+
+
+def Main(arguments: list = None):
+    from machine import Machine, PREDECODE, ROM_ADDRESS #Imported here, since machine.py imports this module
+
+    parser = argparse.ArgumentParser(description="Runs a rom, and reports which superinstructions it used and how often")
+    parser.add_argument("rom", help="the rom file, loaded at the start of the rom section")
+    parser.add_argument("--cycles", type=int, default=10000000, help="the most cycles to run for")
+    options = parser.parse_args(arguments)
+
+    with open(options.rom, "rb") as romFile:
+        rom = romFile.read()
+    machine = Machine(PREDECODE)
+    machine.LoadRom(rom, ROM_ADDRESS)
+    machine.Reset()
+    reason = machine.Run(options.cycles)
+    print(f"Stopped: {reason}, after {machine.state.cycles:,} cycles")
+    print(machine.cache.Report())
+
+
+if __name__ == "__main__":
+    Main()
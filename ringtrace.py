@@ -0,0 +1,100 @@
+"""
+A ring buffer holding the last instructions the processor ran, for working out what led up to a crash.
+Each instruction is recorded as a single struct.pack_into into one bytearray that is allocated once, at the start, so keeping the
+history costs much less than tracing every instruction. Once the buffer is full the oldest instructions are overwritten.
+It is dumped by instructions.Crash when the processor hits an illegal opcode, or by calling Dump at any time
+"""
+import struct
+
+import instructions
+from cpu import CPU, NZ_MASK, NZ_FLAGS
+from instructions import REL, TraceRecord, FormatTrace
+
+HISTORY_SIZE = 1024 #How many instructions are kept by default
+
+#One recorded instruction: PC, opcode, the operand bytes (as much of the two bytes following the opcode as the instruction uses),
+#A, X, Y, SP, and the status register as it is kept, flags and nz (see cpu.NZ_FLAGS), then the cycle count
+RECORD = struct.Struct("<HBHBBBBBHQ")
+
+
+class RingTrace:
+    """
+    The last size instructions run, packed one after another into a preallocated bytearray.
+    size is rounded up to a power of two, so that the position in the ring is found with a mask
+    """
+    def __init__(self, size: int = HISTORY_SIZE):
+        self.size = 1 << (size - 1).bit_length()
+        self.count = 0 #How many instructions have been recorded altogether
+        self.buffer = bytearray(RECORD.size * self.size)
+
+    def Wrap(self, handler, opcode: int):
+        """
+        Returns a handler that runs the given one, and then records the instruction and the registers it left behind.
+        Only the operand bytes the instruction has are read, and the status register is stored as it is, without putting it together
+        """
+        ring = self
+        mask = self.size - 1
+        size = RECORD.size
+        buffer = self.buffer
+        pack_into = RECORD.pack_into
+        length = instructions.opcode_table[opcode][1].length if opcode in instructions.opcode_table else 1
+
+        if length == 1:
+            def recorded(machineState: CPU):
+                pc = machineState.PC
+                handler(machineState)
+                count = ring.count
+                ring.count = count + 1
+                pack_into(buffer, (count & mask) * size, pc, opcode, 0, machineState.A, machineState.X, machineState.Y,
+                          machineState.SP, machineState.flags, machineState.nz, machineState.cycles)
+        elif length == 2:
+            def recorded(machineState: CPU):
+                pc = machineState.PC
+                operand = machineState.MEMORY[(pc + 1) & 0xffff]
+                handler(machineState)
+                count = ring.count
+                ring.count = count + 1
+                pack_into(buffer, (count & mask) * size, pc, opcode, operand, machineState.A, machineState.X, machineState.Y,
+                          machineState.SP, machineState.flags, machineState.nz, machineState.cycles)
+        else:
+            def recorded(machineState: CPU):
+                pc = machineState.PC
+                memory = machineState.MEMORY
+                operand = memory[(pc + 1) & 0xffff] | memory[(pc + 2) & 0xffff] << 8
+                handler(machineState)
+                count = ring.count
+                ring.count = count + 1
+                pack_into(buffer, (count & mask) * size, pc, opcode, operand, machineState.A, machineState.X, machineState.Y,
+                          machineState.SP, machineState.flags, machineState.nz, machineState.cycles)
+
+        recorded.__name__ = f"recorded_{handler.__name__}"
+        return recorded
+
+    def MakeTable(self, table: list) -> list:
+        """
+        Returns a copy of a table of handlers (such as instructions.switch_table) that records every instruction it runs
+        """
+        return [self.Wrap(handler, opcode) for opcode, handler in enumerate(table)]
+
+    def Records(self) -> list:
+        """
+        Returns the recorded instructions as TraceRecords, oldest first
+        """
+        records = []
+        for count in range(max(0, self.count - self.size), self.count):
+            pc, opcode, operand, A, X, Y, SP, flags, nz, cycles = RECORD.unpack_from(self.buffer, (count & (self.size - 1)) * RECORD.size)
+            mnemonic, mode, baseCycles = instructions.opcode_table.get(opcode, ("???", instructions.IMP, 0))
+            if mode.length == 1:
+                operand = None
+            elif mode is REL: #The target of the branch, like REL.Decode gives
+                operand = (pc + 2 + (operand & 0xff) - ((operand & 0b10000000) << 1)) & 0xffff
+            elif mode.length == 2:
+                operand = operand & 0xff
+            records.append(TraceRecord(pc, opcode, mnemonic, mode.name, operand, A, X, Y, SP, (flags & NZ_MASK) | NZ_FLAGS[nz], cycles))
+        return records
+
+    def Dump(self) -> str:
+        records = self.Records()
+        lines = [f"Last {len(records)} instructions:"]
+        lines.extend(f"{record.cycles}: {FormatTrace(record)}" for record in records)
+        return "\n".join(lines)
@@ -0,0 +1,155 @@
+"""
+The part of a display that does not depend on how it is drawn: where the screen and the character rom are in memory, keeping track
+of which characters on the screen have to be drawn again, and caching the pixels of each character.
+The screen memory is watched, and the processor adds the address of every write to it to a set of dirty characters. The watcher is
+the set's own add method, so a write costs the processor next to nothing. Only the dirty characters are drawn, and a frame with
+nothing dirty costs nothing.
+The pixels of each character are worked out from the character rom once, and kept until the processor writes to that character.
+display.Display draws into a window with Tk, headless.HeadlessDisplay into an array in memory
+"""
+import abc
+
+from cpu import CPU
+
+#32 x 32 screen = 1024 bytes of screen ram
+#256 bytes of character rom
+SCREEN_START = 0x200 #Position of the screen memory, see the memory map in the README
+SCREEN_END = 0x600
+CHARACTER_ROM = 0x8000 #Position of the character rom, 8 bytes for each character, one for each line of pixels
+CHARACTER_ROM_END = 0x8800
+COLUMNS = 32
+ROWS = 32
+CHARACTER_SIZE = 8 #Width and height of a character in pixels
+WIDTH = COLUMNS * CHARACTER_SIZE
+HEIGHT = ROWS * CHARACTER_SIZE
+
+
+class Screen(abc.ABC):
+    """
+    Keeps track of what has to be drawn. Displays must fill in RenderGlyph and DrawCharacters, and can fill in Present,
+    PumpEvents and Quit, which do nothing here
+    """
+    name = "Display" #What the display is called in its report
+
+    def __init__(self):
+        self.dirty = set(range(SCREEN_START, SCREEN_END)) #The address of every character written to since it was last drawn, so that i dont redraw things that havent changed
+        self.machineState = None #The machine the screen was last drawn from, whose screen memory and character rom are being watched
+        self.glyphs = [None] * 0x100 #The pixels of each character, or None if they have not been worked out since it last changed
+        self.changedGlyphs = set() #Characters whose pixels changed since the last frame, so everywhere they are shown has to be redrawn
+        self.glyphsRendered = 0
+        self.frames = 0
+        self.idleFrames = 0 #Frames skipped since nothing on the screen changed
+        self.cellsDrawn = 0
+
+    def UpdateScreen(self, machineState: CPU):
+        """
+        Draws every dirty character, then shows the frame. Does nothing at all if nothing is dirty
+        """
+        if machineState is not self.machineState:
+            self.Attach(machineState)
+        if self.changedGlyphs:
+            self.GlyphsChanged()
+        if not self.dirty:
+            self.idleFrames += 1
+            return
+
+        spans = {} #The first and last dirty column of each row with anything dirty in it
+        for address in sorted(self.dirty):
+            y, x = divmod(address - SCREEN_START, COLUMNS)
+            span = spans.get(y)
+            if span is None:
+                spans[y] = [x, x]
+            else:
+                span[1] = x
+        self.dirty.clear() #Not replaced, since its add method is the watcher
+
+        memory = machineState["MEMORY"]
+        for y, (first, last) in spans.items(): #Only draw from the first dirty character of each row to the last one
+            start = SCREEN_START + y * COLUMNS
+            characters = bytes(memory[start + first:start + last + 1])
+            self.DrawCharacters(first, y, characters)
+            self.cellsDrawn += len(characters)
+        self.Present()
+        self.frames += 1
+
+    def Attach(self, machineState: CPU):
+        """
+        Starts drawing from a different machine: watches its screen memory and character rom, and draws the whole screen on the next frame
+        """
+        if self.machineState is not None:
+            for page in range(SCREEN_START >> 8, SCREEN_END >> 8):
+                self.machineState.UnwatchPage(page, self.dirty.add)
+            for page in range(CHARACTER_ROM >> 8, CHARACTER_ROM_END >> 8):
+                self.machineState.UnwatchPage(page, self.CharacterWritten)
+        for page in range(SCREEN_START >> 8, SCREEN_END >> 8):
+            machineState.WatchPage(page, self.dirty.add)
+        for page in range(CHARACTER_ROM >> 8, CHARACTER_ROM_END >> 8):
+            machineState.WatchPage(page, self.CharacterWritten)
+        self.machineState = machineState
+        self.glyphs = [None] * 0x100
+        self.changedGlyphs.clear()
+        self.Redraw()
+
+    def Redraw(self):
+        """
+        Marks the whole screen as dirty. Needed after changing the screen memory without going through the processor
+        (other than with CPU.Load, which lets the watchers know)
+        """
+        self.dirty.update(range(SCREEN_START, SCREEN_END))
+
+    def CharacterWritten(self, address: int):
+        """
+        Called when the processor writes to the character rom, throwing away the pixels of the character written to
+        """
+        character = (address - CHARACTER_ROM) // CHARACTER_SIZE
+        self.glyphs[character] = None
+        self.changedGlyphs.add(character)
+
+    def Glyph(self, character: int):
+        """
+        Returns the pixels of a character, working them out from the character rom if they are not cached
+        """
+        glyph = self.glyphs[character]
+        if glyph is None:
+            offset = CHARACTER_ROM + character * CHARACTER_SIZE
+            glyph = self.glyphs[character] = self.RenderGlyph(bytes(self.machineState["MEMORY"][offset:offset + CHARACTER_SIZE]))
+            self.glyphsRendered += 1
+        return glyph
+
+    def GlyphsChanged(self):
+        """
+        Marks everywhere a character whose pixels changed is shown as dirty
+        """
+        changedGlyphs = self.changedGlyphs
+        for offset, character in enumerate(self.machineState["MEMORY"][SCREEN_START:SCREEN_END]):
+            if character in changedGlyphs:
+                self.dirty.add(SCREEN_START + offset)
+        changedGlyphs.clear()
+
+    @abc.abstractmethod
+    def RenderGlyph(self, lines: bytes):
+        """
+        Returns the pixels of a character, in whatever form DrawCharacters uses, from its 8 bytes of character rom
+        """
+
+    @abc.abstractmethod
+    def DrawCharacters(self, x: int, y: int, characters: bytes):
+        """
+        Draws a run of characters, starting at column x of row y
+        """
+
+    def Present(self):
+        """
+        Shows the frame that has been drawn
+        """
+
+    def PumpEvents(self):
+        """
+        Handles the window's events, such as it being moved or closed, without drawing a frame
+        """
+
+    def Quit(self):
+        pass
+
+    def Report(self) -> str:
+        return f"{self.name}: {self.frames} frames ({self.idleFrames} skipped), {self.cellsDrawn} characters drawn, {self.glyphsRendered} glyphs rendered"
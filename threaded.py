@@ -0,0 +1,192 @@
+"""
+Threaded code: each instruction is turned into a closure with everything that does not change while the code stays the same
+already worked out and bound into it, such as the immediate value, the effective address of a zero page or absolute operand,
+the address of the next instruction and the target of a branch. Running a closure then only does the work that depends on the
+registers and memory.
+Straight-line code is threaded into a block, a list of those closures from the address execution reached it from up to the
+first instruction that jumps (a branch, JMP, JSR, RTS, RTI or BRK), and a block is run by calling its closures in order.
+This is a middle ground between the predecode cache, which still goes through the general Execute function of every opcode,
+and the JIT, which generates whole functions, and each closure is easy to check against the handler for its opcode.
+Blocks are cached by their start address, and thrown away as soon as the processor writes to a page they were threaded from.
+A block that is thrown away while it is running is emptied, which stops the loop running it after the instruction that wrote to it
+"""
+import instructions
+from cpu import CPU
+from instructions import ACC, IMM, ABS, ABSX, ABSY, INDY, READ, WRITE, MODIFY, IMPLIED, PAGE_CROSSING, Store
+
+MAX_BLOCK_LENGTH = 32 #The most instructions threaded into one block
+
+ENDS_BLOCK = {"JMP", "JSR", "RTS", "RTI", "BRK", "BPL", "BMI", "BVC", "BVS", "BCC", "BCS", "BNE", "BEQ"}
+
+
+def Bind(mnemonic: str, mode, operand, nextPc: int, cycles: int, memory: memoryview):
+    """
+    Returns a closure that runs one instruction, given its decoded operand and the address of the instruction after it
+    """
+    operation, kind = instructions.operations[mnemonic]
+    Address = mode.Address
+
+    if kind == IMPLIED:
+        def threaded(machineState: CPU):
+            machineState.PC = nextPc
+            machineState.cycles += cycles
+            operation(machineState)
+    elif kind == READ and mode is IMM:
+        def threaded(machineState: CPU):
+            machineState.PC = nextPc
+            machineState.cycles += cycles
+            operation(machineState, operand)
+    elif kind == READ and Address is None:
+        def threaded(machineState: CPU):
+            machineState.PC = nextPc
+            machineState.cycles += cycles
+            operation(machineState, memory[operand])
+    elif kind == READ and (mode is ABSX or mode is ABSY):
+        limit = 0xff - (operand & 0xff) #The largest index that stays in the page
+        if mode is ABSX:
+            def threaded(machineState: CPU):
+                machineState.PC = nextPc
+                index = machineState.X
+                machineState.cycles += cycles + 1 if index > limit else cycles
+                operation(machineState, memory[(operand + index) & 0xffff])
+        else:
+            def threaded(machineState: CPU):
+                machineState.PC = nextPc
+                index = machineState.Y
+                machineState.cycles += cycles + 1 if index > limit else cycles
+                operation(machineState, memory[(operand + index) & 0xffff])
+    elif kind == READ and mode is INDY:
+        CrossesPage = PAGE_CROSSING[mode]
+        def threaded(machineState: CPU):
+            machineState.PC = nextPc
+            machineState.cycles += cycles + 1 if CrossesPage(machineState, operand) else cycles
+            operation(machineState, memory[Address(machineState, operand)])
+    elif kind == READ:
+        def threaded(machineState: CPU):
+            machineState.PC = nextPc
+            machineState.cycles += cycles
+            operation(machineState, memory[Address(machineState, operand)])
+    elif kind == WRITE and Address is None:
+        def threaded(machineState: CPU):
+            machineState.PC = nextPc
+            machineState.cycles += cycles
+            Store(machineState, operand, operation(machineState))
+    elif kind == WRITE:
+        def threaded(machineState: CPU):
+            machineState.PC = nextPc
+            machineState.cycles += cycles
+            Store(machineState, Address(machineState, operand), operation(machineState))
+    elif kind == MODIFY and mode is ACC:
+        def threaded(machineState: CPU):
+            machineState.PC = nextPc
+            machineState.cycles += cycles
+            machineState.A = operation(machineState, machineState.A)
+    elif kind == MODIFY and Address is None:
+        def threaded(machineState: CPU):
+            machineState.PC = nextPc
+            machineState.cycles += cycles
+            Store(machineState, operand, operation(machineState, memory[operand]))
+    elif kind == MODIFY:
+        def threaded(machineState: CPU):
+            machineState.PC = nextPc
+            machineState.cycles += cycles
+            address = Address(machineState, operand)
+            Store(machineState, address, operation(machineState, memory[address]))
+    elif mnemonic == "JMP" and mode is ABS: #Nothing to do but go there
+        def threaded(machineState: CPU):
+            machineState.PC = operand
+            machineState.cycles += cycles
+    elif Address is None: #JUMP, including the branches, whose target is already worked out by REL.Decode
+        def threaded(machineState: CPU):
+            machineState.PC = nextPc
+            machineState.cycles += cycles
+            operation(machineState, operand)
+    else: #JMP (IND), which reads its target from memory every time
+        def threaded(machineState: CPU):
+            machineState.PC = nextPc
+            machineState.cycles += cycles
+            operation(machineState, Address(machineState, operand))
+
+    threaded.__name__ = f"threaded_{mnemonic}_{mode.name}"
+    return threaded
+
+
+class ThreadedCode:
+    """
+    Threads and caches the blocks of one machine, and runs them
+    """
+    def __init__(self, machineState: CPU, handlers: list = instructions.switch_table):
+        self.machineState = machineState
+        self.handlers = handlers #Run anything that is not threaded
+        self.blocks = {} #The list of closures for each block, by its start address
+        self.pageBlocks = {} #The start addresses of the blocks threaded from each page
+        self.threaded = 0
+        self.invalidations = 0
+        self.fallbacks = 0 #Instructions run by handlers, because they could not be threaded
+
+    def Invalidate(self, address: int):
+        """
+        Throws away every block threaded from the page of the given address. Called when that page is written to
+        """
+        page = address >> 8
+        for entry in self.pageBlocks.pop(page, ()):
+            block = self.blocks.pop(entry, None)
+            if block is not None:
+                block.clear() #In case it is being run, so that nothing after the write is run from the old code
+        self.invalidations += 1
+        self.machineState.UnwatchPage(page, self.Invalidate)
+
+    def Thread(self, entry: int):
+        """
+        Threads the block starting at entry, returning its list of closures.
+        Returns None if the first instruction is an illegal opcode
+        """
+        memory = self.machineState.MEMORY
+        block = []
+        pages = set()
+        pc = entry
+        while len(block) < MAX_BLOCK_LENGTH:
+            opcode = memory[pc]
+            if opcode not in instructions.opcode_table:
+                break
+            mnemonic, mode, cycles = instructions.opcode_table[opcode]
+            nextPc = (pc + mode.length) & 0xffff
+            block.append(Bind(mnemonic, mode, mode.Decode(memory, pc), nextPc, cycles, memory))
+            pages.update(((pc + offset) & 0xffff) >> 8 for offset in range(mode.length))
+            if mnemonic in ENDS_BLOCK:
+                break
+            pc = nextPc
+
+        if not block:
+            return None
+        self.blocks[entry] = block
+        for page in pages:
+            self.pageBlocks.setdefault(page, []).append(entry)
+            self.machineState.WatchPage(page, self.Invalidate)
+        self.threaded += 1
+        return block
+
+    def Run(self, end: int) -> int:
+        """
+        Runs blocks until the cycle count reaches end (a block is always run to its end), returning how many instructions were run
+        """
+        machineState = self.machineState
+        blocks = self.blocks
+        executed = 0
+        while machineState.cycles < end:
+            pc = machineState.PC
+            block = blocks.get(pc)
+            if block is None:
+                block = self.Thread(pc)
+                if block is None:
+                    self.handlers[machineState.MEMORY[pc]](machineState) #Let the illegal opcode handler deal with it
+                    self.fallbacks += 1
+                    executed += 1
+                    continue
+            for threaded in block:
+                threaded(machineState)
+                executed += 1
+        return executed
+
+    def Report(self) -> str:
+        return f"Threaded code: {self.threaded} blocks threaded, {len(self.blocks)} cached, {self.invalidations} page invalidations, {self.fallbacks} instructions run by the interpreter"
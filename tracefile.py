@@ -0,0 +1,333 @@
+"""
+A compact binary format for full execution traces, and a streaming decoder for reading them back.
+A trace file starts with MAGIC, followed by one fixed size RECORD for every instruction run, holding the program counter,
+opcode, the two bytes after the opcode, the address read through the pointer for (IND,X) and (IND),Y instructions,
+the registers after it ran (with the status register in the two parts the processor keeps it in), and the cycle count. The memory address every other instruction used can be worked out from those
+when the trace is read, so it is not worked out while tracing.
+Records are packed into a large preallocated chunk, which is written out each time it fills up,
+so the processor never waits on a write for a single instruction.
+A BackgroundTraceWriter hands each full chunk to a thread that does the writing, so the processor does not wait on the disk at all.
+Run "python tracefile.py trace.bin" to disassemble a trace, see --help for filtering it by PC range, opcode or memory address.
+The file is read a chunk at a time, so traces larger than memory can be filtered
+"""
+import argparse
+import queue
+import struct
+import sys
+import threading
+
+import instructions
+from cpu import CPU, NZ_MASK, NZ_FLAGS
+from instructions import IMP, ACC, IMM, ZP, ZPX, ZPY, ABS, ABSX, ABSY, INDX, INDY, IND, REL, JUMP
+
+MAGIC = b"6502TRC2"
+#pc, opcode, low and high bytes of the operand (0 for bytes the instruction does not have), pointer address, A, X, Y, SP,
+#the status register as it is kept, flags and nz (see cpu.NZ_FLAGS), then the cycle count
+RECORD = struct.Struct("<HBBBHBBBBBHQ")
+CHUNK_RECORDS = 65536 #Records written (or read) at a time
+QUEUE_CHUNKS = 8 #Full chunks that can be waiting for the background writer, before it falls behind
+
+#What a BackgroundTraceWriter does with a full chunk when the writer thread has fallen behind
+BLOCK = "block" #Wait for the writer to catch up, so nothing is lost but the processor runs at the speed of the disk
+DROP = "drop" #Throw the chunk away, so the processor never waits but the trace has gaps
+SAMPLE = "sample" #Wait for every sampleEvery-th chunk and throw the rest away, so the trace keeps a regular sample
+SAMPLE_EVERY = 8
+
+#How each addressing mode is written in assembly, given its operand
+OPERAND_FORMATS = {IMP: "", ACC: "A", IMM: "#${:02x}", ZP: "${:02x}", ZPX: "${:02x},X", ZPY: "${:02x},Y",
+                   ABS: "${:04x}", ABSX: "${:04x},X", ABSY: "${:04x},Y", INDX: "(${:02x},X)", INDY: "(${:02x}),Y",
+                   IND: "(${:04x})", REL: "${:04x}"}
+
+
+class TraceWriter:
+    """
+    Records every instruction run by a table of handlers into a trace file.
+    The chunk is handed to Output when it is full, which writes it to the file unless it is replaced
+    """
+    def __init__(self, file, chunkRecords: int = CHUNK_RECORDS):
+        self.file = file
+        self.chunkRecords = chunkRecords
+        self.buffer = bytearray(RECORD.size * chunkRecords)
+        self.offset = 0 #Where the next record goes in the buffer
+        self.records = 0
+        self.bytesWritten = 0
+        file.write(MAGIC)
+        self.bytesWritten += len(MAGIC)
+
+    def Output(self, chunk: memoryview):
+        self.file.write(chunk)
+        self.bytesWritten += len(chunk)
+
+    def Flush(self):
+        """
+        Writes out the records in the chunk so far
+        """
+        if self.offset:
+            self.Output(memoryview(self.buffer)[:self.offset])
+            self.records += self.offset // RECORD.size
+            self.offset = 0
+
+    def Close(self):
+        self.Flush()
+        self.file.flush()
+
+    def Wrap(self, handler, opcode: int):
+        """
+        Returns a handler that runs the given one, and then packs a record of it into the chunk
+        """
+        writer = self
+        pack_into = RECORD.pack_into
+        size = RECORD.size
+        end = len(self.buffer)
+        mode = instructions.opcode_table[opcode][1] if opcode in instructions.opcode_table else IMP
+
+        if mode is INDX or mode is INDY: #The pointer could be changed by the instruction, so it is followed first
+            Address = mode.Address
+            def recorded(machineState: CPU):
+                pc = machineState.PC
+                low = machineState.MEMORY[(pc + 1) & 0xffff]
+                address = Address(machineState, low)
+                handler(machineState)
+                offset = writer.offset
+                pack_into(writer.buffer, offset, pc, opcode, low, 0, address, machineState.A, machineState.X, machineState.Y,
+                          machineState.SP, machineState.flags, machineState.nz, machineState.cycles)
+                offset += size
+                writer.offset = offset
+                if offset == end:
+                    writer.Flush()
+        elif mode.length == 1:
+            def recorded(machineState: CPU):
+                pc = machineState.PC
+                handler(machineState)
+                offset = writer.offset
+                pack_into(writer.buffer, offset, pc, opcode, 0, 0, 0, machineState.A, machineState.X, machineState.Y,
+                          machineState.SP, machineState.flags, machineState.nz, machineState.cycles)
+                offset += size
+                writer.offset = offset
+                if offset == end:
+                    writer.Flush()
+        elif mode.length == 2:
+            def recorded(machineState: CPU):
+                pc = machineState.PC
+                low = machineState.MEMORY[(pc + 1) & 0xffff]
+                handler(machineState)
+                offset = writer.offset
+                pack_into(writer.buffer, offset, pc, opcode, low, 0, 0, machineState.A, machineState.X, machineState.Y,
+                          machineState.SP, machineState.flags, machineState.nz, machineState.cycles)
+                offset += size
+                writer.offset = offset
+                if offset == end:
+                    writer.Flush()
+        else:
+            def recorded(machineState: CPU):
+                pc = machineState.PC
+                memory = machineState.MEMORY
+                low = memory[(pc + 1) & 0xffff]
+                high = memory[(pc + 2) & 0xffff]
+                handler(machineState)
+                offset = writer.offset
+                pack_into(writer.buffer, offset, pc, opcode, low, high, 0, machineState.A, machineState.X, machineState.Y,
+                          machineState.SP, machineState.flags, machineState.nz, machineState.cycles)
+                offset += size
+                writer.offset = offset
+                if offset == end:
+                    writer.Flush()
+
+        recorded.__name__ = f"written_{handler.__name__}"
+        return recorded
+
+    def MakeTable(self, table: list) -> list:
+        """
+        Returns a copy of a table of handlers (such as instructions.switch_table) that records every instruction it runs
+        """
+        return [self.Wrap(handler, opcode) for opcode, handler in enumerate(table)]
+
+    def Report(self) -> str:
+        return f"Trace: {self.records:,} records, {self.bytesWritten:,} bytes written"
+
+
+class BackgroundTraceWriter(TraceWriter):
+    """
+    A TraceWriter that writes chunks to the file from a thread of its own. Full chunks are passed to the thread through
+    a queue of at most queueChunks, and the processor carries on recording into a spare chunk. All the chunks are allocated
+    at the start and passed back once they are written, so none are allocated while running.
+    If every chunk is waiting to be written, policy decides what happens (BLOCK, DROP or SAMPLE).
+    Close must be called to write out the last chunk and stop the thread
+    """
+    def __init__(self, file, chunkRecords: int = CHUNK_RECORDS, queueChunks: int = QUEUE_CHUNKS, policy: str = BLOCK,
+                 sampleEvery: int = SAMPLE_EVERY):
+        if policy not in (BLOCK, DROP, SAMPLE):
+            raise ValueError(f"Unknown policy {policy}")
+        super().__init__(file, chunkRecords)
+        self.policy = policy
+        self.sampleEvery = sampleEvery
+        self.recordsDropped = 0
+        self.chunksDropped = 0
+        self.backedUp = 0 #How many chunks have found the writer behind
+        self.spares = queue.Queue() #Chunks that have been written, ready to be recorded into again
+        for _ in range(queueChunks):
+            self.spares.put(bytearray(len(self.buffer)))
+        self.chunks = queue.Queue(queueChunks) #(chunk, length) waiting to be written, then None once closed
+        self.thread = threading.Thread(target=self.WriteChunks, name="trace writer", daemon=True)
+        self.thread.start()
+
+    def WriteChunks(self):
+        """
+        Writes chunks from the queue until it is closed, run by the writer thread
+        """
+        while True:
+            item = self.chunks.get()
+            if item is None:
+                return
+            chunk, length = item
+            self.Output(memoryview(chunk)[:length])
+            self.records += length // RECORD.size
+            self.spares.put(chunk)
+
+    def Hand(self, wait: bool):
+        """
+        Passes the chunk to the writer thread and carries on in a spare one. If there is no spare, and not wait,
+        the records in the chunk are dropped instead
+        """
+        try:
+            spare = self.spares.get(wait)
+        except queue.Empty:
+            self.recordsDropped += self.offset // RECORD.size
+            self.chunksDropped += 1
+            self.offset = 0
+            return
+        self.chunks.put((self.buffer, self.offset)) #Never waits, as there is one fewer chunk out than there is room for
+        self.buffer = spare
+        self.offset = 0
+
+    def Flush(self):
+        """
+        Passes the records in the chunk so far to the writer thread, following the policy if it is behind
+        """
+        if not self.offset:
+            return
+        if self.policy == BLOCK or not self.spares.empty():
+            self.Hand(True)
+            return
+        self.backedUp += 1
+        self.Hand(self.policy == SAMPLE and self.backedUp % self.sampleEvery == 0)
+
+    def Close(self):
+        """
+        Waits for every chunk to be written, including the last one whatever the policy, and stops the writer thread
+        """
+        if self.offset:
+            self.Hand(True)
+        self.chunks.put(None)
+        self.thread.join()
+        self.file.flush()
+
+    def Report(self) -> str:
+        return (f"Trace: {self.records:,} records, {self.bytesWritten:,} bytes written, "
+                f"{self.recordsDropped:,} records dropped in {self.chunksDropped:,} chunks ({self.policy})")
+
+
+def ReadRecords(file, chunkRecords: int = CHUNK_RECORDS):
+    """
+    Yields the records of a trace file as tuples of pc, opcode, low, high, pointer address, A, X, Y, SP, P and cycles,
+    reading a chunk at a time
+    """
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a 6502 trace file")
+    while True:
+        chunk = file.read(RECORD.size * chunkRecords)
+        if not chunk:
+            return
+        whole = len(chunk) - len(chunk) % RECORD.size #A trace cut off part way through a record ends at the last whole one
+        for pc, opcode, low, high, pointed, A, X, Y, SP, flags, nz, cycles in RECORD.iter_unpack(chunk[:whole]):
+            yield pc, opcode, low, high, pointed, A, X, Y, SP, (flags & NZ_MASK) | NZ_FLAGS[nz], cycles
+        if whole != len(chunk):
+            return
+
+def MemoryAddress(record: tuple):
+    """
+    Returns the address of memory the instruction in a record read or wrote, or None if it did not use one.
+    The index registers are the same after an instruction as before it for every mode that uses them
+    """
+    pc, opcode, low, high, pointed, A, X, Y, SP, P, cycles = record
+    if opcode not in instructions.opcode_table:
+        return None
+    mnemonic, mode, baseCycles = instructions.opcode_table[opcode]
+    if instructions.operations[mnemonic][1] == JUMP:
+        return None
+    if mode is ZP:
+        return low
+    if mode is ZPX:
+        return (low + X) & 0xff
+    if mode is ZPY:
+        return (low + Y) & 0xff
+    if mode is ABS:
+        return low | high << 8
+    if mode is ABSX:
+        return ((low | high << 8) + X) & 0xffff
+    if mode is ABSY:
+        return ((low | high << 8) + Y) & 0xffff
+    if mode is INDX or mode is INDY:
+        return pointed
+    return None
+
+def Disassemble(record: tuple) -> str:
+    pc, opcode, low, high, pointed, A, X, Y, SP, P, cycles = record
+    if opcode not in instructions.opcode_table:
+        return f"{cycles:>12} {pc:04x}: {opcode:02x}        ???"
+    mnemonic, mode, baseCycles = instructions.opcode_table[opcode]
+    code = [opcode, low, high][:mode.length]
+    if mode is REL:
+        value = (pc + 2 + low - ((low & 0b10000000) << 1)) & 0xffff
+    else:
+        value = low if mode.length == 2 else low | high << 8
+    text = f"{mnemonic} {OPERAND_FORMATS[mode].format(value)}"
+    address = MemoryAddress(record)
+    if address is not None and mode.Address is not None:
+        text = f"{text} [${address:04x}]"
+    return (f"{cycles:>12} {pc:04x}: {' '.join(f'{byte:02x}' for byte in code):<8}  {text:<22} "
+            f"A:{A:02x} X:{X:02x} Y:{Y:02x} SP:{SP:02x} P:{P:08b}")
+
+def ParseRange(text: str) -> tuple:
+    """
+    Turns "8800-88ff" (or a single address) into an inclusive range of hexadecimal addresses
+    """
+    start, _, end = text.partition("-")
+    return int(start, 16), int(end or start, 16)
+
+def Filter(records, pcRange: tuple = None, opcodes: set = None, addressRange: tuple = None):
+    for record in records:
+        if pcRange is not None and not pcRange[0] <= record[0] <= pcRange[1]:
+            continue
+        if opcodes and record[1] not in opcodes:
+            continue
+        if addressRange is not None:
+            address = MemoryAddress(record)
+            if address is None or not addressRange[0] <= address <= addressRange[1]:
+                continue
+        yield record
+
+
+def Main(arguments: list = None):
+    parser = argparse.ArgumentParser(description="Disassembles a binary 6502 trace file")
+    parser.add_argument("trace", help="the trace file")
+    parser.add_argument("--pc", type=ParseRange, help="only instructions at these addresses, such as 8800-88ff")
+    parser.add_argument("--opcode", action="append", type=lambda text: int(text, 16), help="only this opcode (in hex), can be given more than once")
+    parser.add_argument("--address", type=ParseRange, help="only instructions that read or write memory in this range, such as 0200-05ff")
+    parser.add_argument("--limit", type=int, help="stop after this many instructions")
+    options = parser.parse_args(arguments)
+
+    with open(options.trace, "rb") as file:
+        shown = 0
+        for record in Filter(ReadRecords(file), options.pc, set(options.opcode or ()), options.address):
+            print(Disassemble(record))
+            shown += 1
+            if options.limit is not None and shown >= options.limit:
+                break
+
+
+if __name__ == "__main__":
+    try:
+        Main()
+    except BrokenPipeError: #The output was piped into something like head, which has stopped reading
+        sys.stderr.close()